@@ -0,0 +1,289 @@
+"""Drive `/analyze` at controlled rate and report what the service sustained.
+
+Log Detective is replaced by a stub server in a separate process, fedora-messaging
+by a stub publisher. The service runs in this process, so that its tasks and memory
+can be observed. Results are written as JSON baseline, which can be compared
+with baseline of another release:
+
+    python -m benchmarks.run --rate 50 --duration 30 --output baseline.json
+    python -m benchmarks.run --rate 50 --duration 30 --compare baseline.json
+"""
+
+import argparse
+import asyncio
+from importlib.metadata import version
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import socket
+import sys
+import time
+
+import httpx
+
+from benchmarks.stubs import StubPublisher, serve_log_detective
+
+TOKEN = "benchmark"
+# How often are tasks of the service counted, in seconds
+SAMPLING_INTERVAL = 0.05
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=20, help="Submissions per second")
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Seconds of submitting"
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=120,
+        help="Seconds to wait for pending analyses after the last submission",
+    )
+    parser.add_argument(
+        "--inline-ratio",
+        type=float,
+        default=0.2,
+        help="Share of submissions with inline artifact instead of URL",
+    )
+    parser.add_argument(
+        "--inline-size",
+        type=int,
+        default=1024**2,
+        help="Size of inline artifacts in bytes",
+    )
+    parser.add_argument(
+        "--ld-latency", type=float, default=1.0, help="Median latency of stub LD"
+    )
+    parser.add_argument(
+        "--ld-latency-sigma",
+        type=float,
+        default=0.5,
+        help="Sigma of log-normal latency of stub LD",
+    )
+    parser.add_argument(
+        "--ld-failure-rate",
+        type=float,
+        default=0.0,
+        help="Share of stub LD requests failing with 503",
+    )
+    parser.add_argument(
+        "--ld-response-size",
+        type=int,
+        default=2048,
+        help="Size of explanations of stub LD",
+    )
+    parser.add_argument(
+        "--publish-latency",
+        type=float,
+        default=0.01,
+        help="Seconds the stub publisher waits for confirmation",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare results with this JSON baseline")
+    return parser.parse_args(argv)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """Nearest-rank percentiles of given values, in seconds."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+    return {
+        f"p{percent}": ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+        for percent in (50, 95, 99)
+    }
+
+
+def build_info(index: int, rng: random.Random, args: argparse.Namespace) -> dict:
+    """Submission of a unique build, so that analyses aren't coalesced."""
+    if rng.random() < args.inline_ratio:
+        artifact = f"build {index}\n".ljust(args.inline_size, "x")
+    else:
+        artifact = f"https://example.com/builds/{index}/builder-live.log"
+    return {
+        "artifacts": {"builder-live.log": artifact},
+        "target_build": str(index),
+        "build_system": "copr",
+        "project_url": "https://example.com/benchmark",
+    }
+
+
+async def run_load(args: argparse.Namespace, publisher: StubPublisher) -> dict:
+    from logdetective_packit import main
+
+    main.publish = publisher
+    rng = random.Random(args.seed)
+    submitted: dict[str, float] = {}
+    accept_latencies = []
+    responses: dict[int, int] = {}
+    peaks = {"tasks": 0, "pending_analyses": 0}
+
+    async def sample():
+        while True:
+            peaks["tasks"] = max(peaks["tasks"], len(asyncio.all_tasks()))
+            peaks["pending_analyses"] = max(
+                peaks["pending_analyses"], len(main._log_detective_call_tasks)
+            )
+            await asyncio.sleep(SAMPLING_INTERVAL)
+
+    async def submit(client: httpx.AsyncClient, index: int):
+        body = build_info(index, rng, args)
+        start = time.monotonic()
+        response = await client.post(
+            "/analyze", json=body, headers={"Authorization": f"Bearer {TOKEN}"}
+        )
+        accept_latencies.append(time.monotonic() - start)
+        responses[response.status_code] = responses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            submitted[response.json()["log_detective_analysis_id"]] = start
+
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark"
+        ) as client:
+            sampler = asyncio.ensure_future(sample())
+            submissions = []
+            begin = time.monotonic()
+            # Open loop, submissions don't wait for previous ones
+            for index in range(int(args.rate * args.duration)):
+                await asyncio.sleep(
+                    max(0, begin + index / args.rate - time.monotonic())
+                )
+                submissions.append(asyncio.ensure_future(submit(client, index)))
+            await asyncio.gather(*submissions)
+
+            deadline = time.monotonic() + args.drain_timeout
+            while main._log_detective_call_tasks and time.monotonic() < deadline:
+                await asyncio.sleep(SAMPLING_INTERVAL)
+            elapsed = time.monotonic() - begin
+            sampler.cancel()
+
+    published = dict(publisher.published)
+    end_to_end = [
+        published[analysis_id][0] - start
+        for analysis_id, start in submitted.items()
+        if analysis_id in published
+    ]
+    statuses = [status for _, status in published.values()]
+    return {
+        "submitted": len(accept_latencies),
+        "responses": {str(code): count for code, count in sorted(responses.items())},
+        "completed": statuses.count("complete"),
+        "failed": statuses.count("error"),
+        "unfinished": len(submitted) - len(end_to_end),
+        "throughput": len(end_to_end) / elapsed,
+        "accept_latency": percentiles(accept_latencies),
+        "end_to_end_latency": percentiles(end_to_end),
+        # Linux reports maximum resident set size in KiB
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "peak_tasks": peaks["tasks"],
+        "peak_pending_analyses": peaks["pending_analyses"],
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline: dict, results: dict) -> None:
+    """Print relative change of every result against the baseline."""
+    before = flatten(baseline["results"])
+    after = flatten(results["results"])
+    print(f"{'metric':<32}{'baseline':>14}{'current':>14}{'change':>10}")
+    for metric, value in after.items():
+        previous = before.get(metric)
+        change = (
+            f"{(value - previous) / previous:+.1%}"
+            if previous
+            else ("" if previous is None else "n/a")
+        )
+        print(
+            f"{metric:<32}{'' if previous is None else f'{previous:.4g}':>14}"
+            f"{value:>14.4g}{change:>10}"
+        )
+
+
+def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+    port = free_port()
+    log_detective = multiprocessing.Process(
+        target=serve_log_detective,
+        args=(port,),
+        kwargs={
+            "latency": args.ld_latency,
+            "latency_sigma": args.ld_latency_sigma,
+            "failure_rate": args.ld_failure_rate,
+            "response_size": args.ld_response_size,
+            "seed": args.seed,
+        },
+        daemon=True,
+    )
+    log_detective.start()
+    try:
+        wait_for_server(f"http://127.0.0.1:{port}/")
+        # Configuration of the service is read on import
+        os.environ["LD_URL"] = f"http://127.0.0.1:{port}/analyze"
+        os.environ["LD_PACKIT_TOKEN"] = TOKEN
+        results = asyncio.run(run_load(args, StubPublisher(args.publish_latency)))
+    finally:
+        log_detective.terminate()
+        log_detective.join()
+
+    report = {
+        "config": vars(args) | {"output": None, "compare": None},
+        "environment": {
+            "logdetective_packit": version("logdetective-packit"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                name: value
+                for name, value in sorted(os.environ.items())
+                if name.startswith(("LD_", "PUBLISH_"))
+                and name not in ("LD_TOKEN", "LD_PACKIT_TOKEN")
+            },
+        },
+        "results": results,
+    }
+    print(json.dumps(report["results"], indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+            output.write("\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            compare(json.load(baseline), report)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,75 @@
+"""Local stand-ins for Log Detective server and the message broker."""
+
+import asyncio
+import random
+import threading
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+
+def create_log_detective_app(
+    latency: float,
+    latency_sigma: float,
+    failure_rate: float,
+    response_size: int,
+    seed: int,
+) -> FastAPI:
+    """Create server answering every POST like Log Detective API would.
+
+    Latency follows log-normal distribution with median `latency` seconds,
+    `failure_rate` of requests fails with 503, and explanations are padded
+    to `response_size` characters."""
+    app = FastAPI()
+    rng = random.Random(seed)
+    explanation = "x" * response_size
+
+    @app.get("/")
+    async def health():
+        return {}
+
+    @app.post("/{path:path}")
+    async def analyze(path: str, request: Request):
+        await request.body()
+        if latency:
+            await asyncio.sleep(rng.lognormvariate(0, latency_sigma) * latency)
+        if rng.random() < failure_rate:
+            return JSONResponse({"detail": "Stub failure"}, status_code=503)
+        return {
+            "explanation": {"text": explanation, "logprobs": None},
+            "response_certainty": 42.0,
+            "snippets": [],
+        }
+
+    return app
+
+
+def serve_log_detective(port: int, **options) -> None:
+    """Run stub Log Detective server, meant as a target of separate process."""
+    uvicorn.run(
+        create_log_detective_app(**options),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+    )
+
+
+class StubPublisher:
+    """Replacement of `fedora_messaging.api.publish`, recording when results
+    of analyses were published instead of sending them to a broker."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.published: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, message, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.published[message.body["log_detective_analysis_id"]] = (
+                time.monotonic(),
+                message.body["status"],
+            )
@@ -0,0 +1,99 @@
+"""Compare cost of validating messages, generic and with compiled schemas.
+
+Messages built by typed constructors are validated with compiled schemas, and again
+with the generic validation as they are published. Consumers validating messages
+themselves can use compiled validation alone:
+
+    python -m benchmarks.validation --response-size 65536
+"""
+
+import argparse
+import sys
+import timeit
+
+from logdetective_packit_message import (
+    LogDetectiveMessage,
+    LogDetectiveResult,
+    validate_message,
+)
+
+FIELDS = {
+    "target_build": "12345",
+    "build_system": "copr",
+    "log_detective_analysis_id": "e8a5b0a6-5f4b-4c1e-9a57-1d0c0f3a1e2b",
+    "log_detective_analysis_start": "2025-01-01 00:00:00+00:00",
+    "project_url": "https://example.com/benchmark",
+    "pr_id": 1,
+    "commit_sha": "0" * 40,
+}
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--response-size",
+        type=int,
+        default=4096,
+        help="Size of explanation in Log Detective response",
+    )
+    parser.add_argument(
+        "--snippets", type=int, default=20, help="Number of snippets in the response"
+    )
+    parser.add_argument("--number", type=int, default=2000, help="Messages per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs, the best is kept")
+    return parser.parse_args(argv)
+
+
+def log_detective_response(args: argparse.Namespace) -> dict:
+    return {
+        "explanation": {"text": "x" * args.response_size, "logprobs": None},
+        "response_certainty": 0.9,
+        "snippets": [
+            {
+                "explanation": {"text": f"Snippet {index}", "logprobs": None},
+                "text": "error: x" * 10,
+                "line_number": index,
+            }
+            for index in range(args.snippets)
+        ],
+    }
+
+
+def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+    response = log_detective_response(args)
+    body = {"status": LogDetectiveResult.complete, "log_detective_response": response}
+
+    def generic():
+        message = LogDetectiveMessage(body=body | FIELDS)
+        message.validate()
+
+    def typed():
+        message = LogDetectiveMessage.complete(
+            log_detective_response=response, **FIELDS
+        )
+        # Validation of fedora-messaging as the message is published
+        message.validate()
+
+    def compiled():
+        message = LogDetectiveMessage(body=body | FIELDS)
+        validate_message(message)
+
+    results = {
+        name: min(timeit.repeat(function, number=args.number, repeat=args.repeat))
+        / args.number
+        for name, function in (
+            ("generic", generic),
+            ("typed", typed),
+            ("compiled", compiled),
+        )
+    }
+    print(f"{'validation':<12}{'per message':>14}{'speedup':>10}")
+    for name, seconds in results.items():
+        print(
+            f"{name:<12}{seconds * 1e6:>11.1f} us{results['generic'] / seconds:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
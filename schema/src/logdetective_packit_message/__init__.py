@@ -1 +1,9 @@
 from .models import LogDetectiveMessage, LogDetectiveResult
+from .validation import compiled_validators, validate_message
+
+__all__ = [
+    "LogDetectiveMessage",
+    "LogDetectiveResult",
+    "compiled_validators",
+    "validate_message",
+]
@@ -1,7 +1,10 @@
 import enum
+from typing import Optional
 
 from fedora_messaging import message
 
+from .validation import check, compiled_validators
+
 
 class LogDetectiveMessage(message.Message):
     """Message schema for Log Detective response for Packit Service"""
@@ -28,12 +31,87 @@ class LogDetectiveMessage(message.Message):
             "pr_id": {"type": ["integer", "null"]},
             "commit_sha": {"type": ["string", "null"]},
             "log_detective_response": {"type": "object"},
+            "log_detective_response_ref": {
+                "type": "object",
+                "required": ["digest", "size", "url"],
+                "properties": {
+                    "digest": {"type": "string"},
+                    "size": {"type": "integer"},
+                    "url": {"type": "string"},
+                },
+            },
+            "log_detective_response_summary": {"type": "object"},
             "error_msg": {"type": "string"},
+            "queue_wait_seconds": {"type": "number"},
+            "elapsed_seconds": {"type": "number"},
         },
     }
 
     topic = "logdetective.analysis"
 
+    @classmethod
+    def _from_body(cls, body: dict) -> "LogDetectiveMessage":
+        check(compiled_validators(cls)[1], body)
+        return cls(body=body)
+
+    @classmethod
+    def complete(
+        cls,
+        *,
+        target_build: str,
+        build_system: str,
+        log_detective_analysis_id: str,
+        log_detective_analysis_start: str,
+        log_detective_response: dict,
+        project_url: Optional[str] = None,
+        pr_id: Optional[int] = None,
+        commit_sha: Optional[str] = None,
+    ) -> "LogDetectiveMessage":
+        """Build message with response of Log Detective to finished analysis.
+        Raises `jsonschema.ValidationError` if any of the fields is invalid."""
+        return cls._from_body(
+            {
+                "status": LogDetectiveResult.complete,
+                "log_detective_response": log_detective_response,
+                "target_build": target_build,
+                "build_system": build_system,
+                "log_detective_analysis_id": log_detective_analysis_id,
+                "log_detective_analysis_start": log_detective_analysis_start,
+                "project_url": project_url,
+                "pr_id": pr_id,
+                "commit_sha": commit_sha,
+            }
+        )
+
+    @classmethod
+    def error(
+        cls,
+        *,
+        target_build: str,
+        build_system: str,
+        log_detective_analysis_id: str,
+        log_detective_analysis_start: str,
+        error_msg: str = "",
+        project_url: Optional[str] = None,
+        pr_id: Optional[int] = None,
+        commit_sha: Optional[str] = None,
+    ) -> "LogDetectiveMessage":
+        """Build message reporting failed analysis.
+        Raises `jsonschema.ValidationError` if any of the fields is invalid."""
+        return cls._from_body(
+            {
+                "status": LogDetectiveResult.error,
+                "target_build": target_build,
+                "build_system": build_system,
+                "log_detective_analysis_id": log_detective_analysis_id,
+                "log_detective_analysis_start": log_detective_analysis_start,
+                "project_url": project_url,
+                "pr_id": pr_id,
+                "commit_sha": commit_sha,
+                "error_msg": error_msg,
+            }
+        )
+
     def __str__(self):
         return (
             f"Log Detective analysis {self.body['log_detective_analysis_id']}: "
@@ -43,9 +121,7 @@ class LogDetectiveMessage(message.Message):
 
     @property
     def summary(self):
-        return (
-            f"Log Detective {self.body['status']} for {self.body['target_build']}"
-        )
+        return f"Log Detective {self.body['status']} for {self.body['target_build']}"
 
     @property
     def app_name(self):
@@ -0,0 +1,53 @@
+import functools
+
+import jsonschema
+from fedora_messaging import message
+
+
+def _compile(schema: dict) -> jsonschema.protocols.Validator:
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+@functools.cache
+def compiled_validators(
+    message_class: type[message.Message],
+) -> tuple[
+    tuple[jsonschema.protocols.Validator, ...],
+    tuple[jsonschema.protocols.Validator, ...],
+]:
+    """Return validators of headers and of body of messages of given class.
+
+    Schemas of the class are checked and compiled only once per process,
+    together with the base schemas every message is validated against."""
+    return (
+        (
+            _compile(message_class.headers_schema),
+            _compile(message.Message.headers_schema),
+        ),
+        (
+            _compile(message_class.body_schema),
+            _compile(message.Message.body_schema),
+        ),
+    )
+
+
+def check(
+    validators: tuple[jsonschema.protocols.Validator, ...], instance: dict
+) -> None:
+    """Raise the most relevant `jsonschema.ValidationError` of the instance,
+    just like `jsonschema.validate`."""
+    for validator in validators:
+        error = jsonschema.exceptions.best_match(validator.iter_errors(instance))
+        if error is not None:
+            raise error
+
+
+def validate_message(msg: message.Message) -> None:
+    """Validate headers and body of the message just like `Message.validate()`,
+    with the schemas compiled by `compiled_validators`, for consumers validating
+    many messages themselves."""
+    headers_validators, body_validators = compiled_validators(type(msg))
+    check(headers_validators, msg._headers)
+    check(body_validators, msg.body)
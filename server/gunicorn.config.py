@@ -1,4 +1,11 @@
 import os
+import shutil
+
+# Metrics of all workers are aggregated in this directory, workers inherit it.
+# It has to be set before prometheus_client is imported.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/logdetective-packit-metrics")
+
+from prometheus_client import multiprocess  # noqa: E402
 
 bind = f"0.0.0.0:{os.environ.get('PACKIT_INTERFACE_PORT', 8090)}"
 worker_class = "uvicorn.workers.UvicornWorker"
@@ -6,5 +13,23 @@ workers = os.environ.get("LOG_DETECTIVE_PACKIT_WORKERS", 4)
 # timeout set to 600 seconds; with 32 clusters and several runs in parallel, it
 # can take even 10 minutes for a query to complete
 timeout = 600
+# Workers are given time to drain pending analyses, see LD_DRAIN_DELAY
+# and LD_DRAIN_TIMEOUT, the timeout starts when workers are terminated
+graceful_timeout = (
+    int(os.environ.get("LD_DRAIN_DELAY", 10))
+    + int(os.environ.get("LD_DRAIN_TIMEOUT", 60))
+    + 10
+)
 # write to stdout
 accesslog = "-"
+
+
+def on_starting(server):
+    """Remove metrics left by the previous run."""
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def child_exit(server, worker):
+    """Stop reporting live gauges of the exited worker."""
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,198 @@
+import asyncio
+import enum
+import logging
+import time
+from typing import Optional
+from urllib.parse import urljoin
+
+from httpx import AsyncClient, Response
+
+from logdetective_packit.metrics import (
+    BACKEND_EJECTED,
+    BACKEND_OUTSTANDING,
+    LD_CONNECT_DURATION,
+    LD_POOL_WAIT_DURATION,
+    LD_REQUEST_DURATION,
+)
+from logdetective_packit.retry import CircuitBreaker, CircuitOpenError, CircuitState
+
+LOG = logging.getLogger("LogDetectivePackit")
+
+# Weight of the latest observation in exponentially weighted moving average of latency
+EWMA_ALPHA = 0.3
+
+
+class BalancingStrategy(str, enum.Enum):
+    least_outstanding = "least_outstanding"
+    ewma = "ewma"
+
+
+class ConnectionTrace:
+    """Callback of httpx `trace` extension, timing how long the request waited
+    for a connection from the pool, and how long it took to open a new one."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.pool_wait: Optional[float] = None
+        self.connect: Optional[float] = None
+        self._connect_start: Optional[float] = None
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        now = time.monotonic()
+        # Request leaves the pool once it either opens connection, or sends over one
+        if self.pool_wait is None and event_name.endswith(
+            (".connect_tcp.started", ".send_request_headers.started")
+        ):
+            self.pool_wait = now - self.start
+        if event_name.endswith(".connect_tcp.started"):
+            self._connect_start = now
+        elif self._connect_start is not None and event_name.endswith(
+            (".connect_tcp.complete", ".start_tls.complete")
+        ):
+            self.connect = now - self._connect_start
+
+
+class Backend:
+    """Log Detective server, with statistics of requests sent to it.
+    Backend is ejected from balancing by its circuit breaker, after repeated failures."""
+
+    def __init__(self, url: str, failure_threshold: int, reset_timeout: float):
+        self.url = url
+        self.breaker = CircuitBreaker(url, failure_threshold, reset_timeout)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.ewma_latency = 0.0
+
+    def score(self, strategy: BalancingStrategy) -> tuple:
+        """Lower score means the backend is preferred."""
+        if strategy == BalancingStrategy.ewma:
+            return (self.ewma_latency * (self.outstanding + 1), self.outstanding)
+        return (self.outstanding, self.ewma_latency)
+
+    def observe_latency(self, latency: float) -> None:
+        if self.ewma_latency:
+            self.ewma_latency = (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+            )
+        else:
+            self.ewma_latency = latency
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+        BACKEND_EJECTED.labels(self.url).set(self.breaker.state != CircuitState.closed)
+
+    def record_failure(self, ex: Exception) -> None:
+        self.breaker.record_failure(ex)
+        BACKEND_EJECTED.labels(self.url).set(self.breaker.state != CircuitState.closed)
+
+    async def post(self, http_client: AsyncClient, **kwargs) -> Response:
+        """Send request to the backend and record its outcome."""
+        self.outstanding += 1
+        self.requests += 1
+        BACKEND_OUTSTANDING.labels(self.url).inc()
+        start = time.monotonic()
+        trace = ConnectionTrace()
+        try:
+            response = await http_client.post(
+                url=self.url, extensions={"trace": trace}, **kwargs
+            )
+            response.raise_for_status()
+        except Exception as ex:
+            self.failures += 1
+            self.record_failure(ex)
+            raise ex
+        finally:
+            self.outstanding -= 1
+            BACKEND_OUTSTANDING.labels(self.url).dec()
+            LD_REQUEST_DURATION.labels(self.url).observe(time.monotonic() - start)
+            if trace.pool_wait is not None:
+                LD_POOL_WAIT_DURATION.labels(self.url).observe(trace.pool_wait)
+            if trace.connect is not None:
+                LD_CONNECT_DURATION.labels(self.url).observe(trace.connect)
+        self.record_success()
+        self.observe_latency(time.monotonic() - start)
+        return response
+
+
+class BackendPool:
+    """Balance requests among Log Detective servers, skipping ejected ones."""
+
+    def __init__(
+        self,
+        urls: list[str],
+        strategy: BalancingStrategy = BalancingStrategy.least_outstanding,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60,
+    ):
+        self.strategy = strategy
+        self.backends = [Backend(url, failure_threshold, reset_timeout) for url in urls]
+
+    def select(self) -> Backend:
+        """Return the best available backend.
+        Raises `CircuitOpenError` if all backends are ejected."""
+        for backend in sorted(
+            self.backends, key=lambda backend: backend.score(self.strategy)
+        ):
+            try:
+                backend.breaker.check()
+            except CircuitOpenError:
+                continue
+            return backend
+        raise CircuitOpenError("All Log Detective servers are unavailable")
+
+    async def check_health(self, http_client: AsyncClient, path: str) -> None:
+        """Probe every backend, reinstating recovered ones and ejecting failing ones.
+        Any response other than server error means the backend is healthy."""
+
+        async def check_backend(backend: Backend):
+            try:
+                response = await http_client.get(urljoin(backend.url, path))
+                if response.is_server_error:
+                    response.raise_for_status()
+            except Exception as ex:
+                backend.record_failure(ex)
+                LOG.warning("Health check of %s failed with %s", backend.url, ex)
+            else:
+                if backend.breaker.state != CircuitState.closed:
+                    backend.record_success()
+
+        await asyncio.gather(*(check_backend(backend) for backend in self.backends))
+
+    async def prewarm(
+        self, http_client: AsyncClient, path: str, connections: int, timeout: float
+    ) -> None:
+        """Open `connections` connections to every backend, with concurrent requests
+        on `path`, so that the first analyses don't wait for them to be established.
+        Failures are only logged, the backends aren't judged by them."""
+
+        async def warm(backend: Backend):
+            try:
+                await http_client.get(urljoin(backend.url, path))
+            except Exception as ex:
+                LOG.warning("Opening connection to %s failed with %s", backend.url, ex)
+
+        try:
+            async with asyncio.timeout(timeout):
+                await asyncio.gather(
+                    *(
+                        warm(backend)
+                        for backend in self.backends
+                        for _ in range(connections)
+                    )
+                )
+        except TimeoutError:
+            LOG.warning("Opening connections to Log Detective timed out")
+
+    async def run_health_checks(
+        self, http_client: AsyncClient, path: str, interval: float
+    ) -> None:
+        """Check health of backends every `interval` seconds, until cancelled."""
+        while True:
+            await self.check_health(http_client, path)
+            await asyncio.sleep(interval)
+
+
+def parse_backend_urls(urls: Optional[str]) -> list[str]:
+    """Split comma or whitespace separated list of Log Detective URLs."""
+    return (urls or "").replace(",", " ").split()
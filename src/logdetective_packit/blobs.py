@@ -0,0 +1,78 @@
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import time
+from typing import Optional
+
+# Number of stored blobs between removals of expired ones
+PRUNE_INTERVAL = 100
+
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class BlobStore:
+    """Content-addressed store of Log Detective responses, compressed with gzip.
+
+    Blobs are named by SHA-256 digest of their content, so identical responses
+    are stored once, and storing them is safe from any worker. Blobs not stored
+    again for `retention` seconds are removed."""
+
+    def __init__(self, directory: str, retention: int):
+        self.directory = directory
+        self.retention = retention
+        self._stored = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.json.gz")
+
+    def put(self, data: bytes) -> str:
+        """Store data, returning its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            # Identical blob stored again, retain it for longer
+            os.utime(path)
+        except FileNotFoundError:
+            # Not stored yet, or pruned meanwhile
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Other workers never see partially written blob
+            with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(path), delete=False
+            ) as blob_file:
+                try:
+                    blob_file.write(gzip.compress(data, compresslevel=6, mtime=0))
+                except OSError:
+                    os.remove(blob_file.name)
+                    raise
+            os.replace(blob_file.name, path)
+
+        self._stored += 1
+        if self._stored % PRUNE_INTERVAL == 0:
+            self.prune()
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Return compressed blob with given digest, or None if it isn't stored."""
+        if not DIGEST_PATTERN.fullmatch(digest):
+            return None
+        try:
+            with open(self._path(digest), "rb") as blob_file:
+                return blob_file.read()
+        except FileNotFoundError:
+            return None
+
+    def prune(self) -> None:
+        expired = time.time() - self.retention
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for blob in os.scandir(entry.path):
+                try:
+                    if blob.stat().st_mtime < expired:
+                        os.remove(blob.path)
+                except FileNotFoundError:
+                    # Removed by another worker meanwhile
+                    pass
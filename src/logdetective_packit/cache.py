@@ -0,0 +1,140 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from logdetective_packit.utils import open_sqlite
+
+
+class ResultCache(ABC):
+    """Cache of Log Detective responses, keyed by digest of the analysis request.
+    Entries expire after `ttl` seconds, least recently used entries are evicted
+    once there are more than `max_size` of them."""
+
+    # Whether other workers see the entries
+    shared = False
+
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return cached response, or None if there is no valid entry."""
+        value = self._get(key, time.time())
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        """Store response in the cache."""
+        self._set(key, value, time.time() + self.ttl)
+
+    @abstractmethod
+    def _get(self, key: str, now: float) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    def _set(self, key: str, value: dict, expires: float) -> None:
+        pass
+
+
+class MemoryResultCache(ResultCache):
+    """Result cache private to the worker process."""
+
+    def __init__(self, ttl: int, max_size: int):
+        super().__init__(ttl, max_size)
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: str, now: float) -> Optional[dict]:
+        if key not in self._entries:
+            return None
+        expires, value = self._entries[key]
+        if expires <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: dict, expires: float) -> None:
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class DiskResultCache(ResultCache):
+    """Result cache stored in SQLite database, shared by worker processes
+    and preserved across their restarts."""
+
+    shared = True
+
+    def __init__(self, path: str, ttl: int, max_size: int):
+        super().__init__(ttl, max_size)
+        self._lock = threading.Lock()
+        self._connection = open_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            count = self._connection.execute("SELECT COUNT(*) FROM results")
+            return count.fetchone()[0]
+
+    def _get(self, key: str, now: float) -> Optional[dict]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM results WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE results SET last_access = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: dict, expires: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires, now),
+            )
+            self._connection.execute(
+                "DELETE FROM results WHERE expires <= ? OR key IN ("
+                "SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (now, self.max_size),
+            )
+
+
+def create_result_cache(
+    backend: str, state_dir: str, ttl: int, max_size: int
+) -> Optional[ResultCache]:
+    """Create result cache with selected backend, or None if caching is disabled."""
+    if not backend:
+        return None
+    if backend == "memory":
+        return MemoryResultCache(ttl, max_size)
+    if backend == "disk":
+        if not state_dir:
+            raise ValueError("Disk result cache requires LD_PACKIT_STATE_DIR to be set")
+        return DiskResultCache(os.path.join(state_dir, "cache.sqlite"), ttl, max_size)
+    raise ValueError(f"Unknown result cache backend: {backend}")
@@ -0,0 +1,67 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class RequestCoalescer:
+    """Share a single in-flight call among all callers requesting the same key.
+
+    The first caller performs the call, callers arriving while it is in progress
+    wait for its result, or exception. Nothing is retained once the call finishes.
+    The call can report it has actually started with `started`, for example once
+    it has waited for a free slot, callers are then notified with `on_start`."""
+
+    def __init__(self):
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._on_start: dict[str, list[Callable[[], None]]] = {}
+        self._started: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._in_flight
+
+    def started(self, key: str) -> None:
+        """Notify callers waiting for the call with given key that it has started."""
+        self._started.add(key)
+        for on_start in self._on_start.pop(key, []):
+            on_start()
+
+    async def run(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[T]],
+        on_start: Optional[Callable[[], None]] = None,
+    ) -> T:
+        """Return result of `call`, or of the identical call already in progress."""
+        if on_start is not None:
+            if key in self._started:
+                on_start()
+            else:
+                self._on_start.setdefault(key, []).append(on_start)
+
+        if (future := self._in_flight.get(key)) is not None:
+            # Cancelling one of the waiting callers must not cancel the others
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as ex:
+            future.set_exception(ex)
+            # Exception is re-raised here, don't report it as never retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+            self._on_start.pop(key, None)
+            self._started.discard(key)
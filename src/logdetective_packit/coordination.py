@@ -0,0 +1,171 @@
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from logdetective_packit.models import Response
+from logdetective_packit.utils import open_sqlite, pid_alive
+
+
+class SharedState:
+    """State shared by worker processes through SQLite database in WAL mode.
+
+    Every pending analysis holds a lease, owned by the worker which runs it,
+    so that limits apply to analyses of all workers together. Leases of workers
+    which are no longer running are dropped. Idempotency keys map to analyses
+    holding a lease, regardless of the worker which accepted them. Requests
+    to Log Detective in progress are claimed by their key, so that other workers
+    can wait for the result of an identical request instead of repeating it."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = open_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS leases (
+                analysis_id TEXT PRIMARY KEY,
+                owner INTEGER NOT NULL
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS leases_owner ON leases (owner)"
+        )
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                analysis_id TEXT NOT NULL,
+                response TEXT NOT NULL
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idempotency_keys_analysis "
+            "ON idempotency_keys (analysis_id)"
+        )
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS requests (
+                key TEXT PRIMARY KEY,
+                owner INTEGER NOT NULL
+            )"""
+        )
+
+    def _transaction(self, function, *args):
+        with self._lock:
+            try:
+                self._connection.execute("BEGIN IMMEDIATE")
+                result = function(*args)
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+        return result
+
+    def _drop_dead_owners(self) -> None:
+        pid = os.getpid()
+        dead_owners = [
+            owner
+            for (owner,) in self._connection.execute(
+                "SELECT owner FROM leases UNION SELECT owner FROM requests"
+            ).fetchall()
+            if owner != pid and not pid_alive(owner)
+        ]
+        if not dead_owners:
+            return
+        self._connection.executemany(
+            "DELETE FROM leases WHERE owner = ?", [(owner,) for owner in dead_owners]
+        )
+        self._connection.executemany(
+            "DELETE FROM requests WHERE owner = ?", [(owner,) for owner in dead_owners]
+        )
+        self._connection.execute(
+            "DELETE FROM idempotency_keys WHERE analysis_id NOT IN "
+            "(SELECT analysis_id FROM leases)"
+        )
+
+    def admit(self, analysis_ids: list[str], limit: Optional[int] = None) -> bool:
+        """Take leases for given analyses, unless that would exceed `limit`
+        analyses pending in all workers. Either all or none are admitted."""
+
+        def admit():
+            self._drop_dead_owners()
+            if limit is not None:
+                (pending,) = self._connection.execute(
+                    "SELECT COUNT(*) FROM leases"
+                ).fetchone()
+                if pending + len(analysis_ids) > limit:
+                    return False
+            pid = os.getpid()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO leases VALUES (?, ?)",
+                [(analysis_id, pid) for analysis_id in analysis_ids],
+            )
+            return True
+
+        return self._transaction(admit)
+
+    def release(self, analysis_id: str) -> None:
+        """Release lease of finished analysis, with its idempotency key."""
+
+        def release():
+            self._connection.execute(
+                "DELETE FROM leases WHERE analysis_id = ?", (analysis_id,)
+            )
+            self._connection.execute(
+                "DELETE FROM idempotency_keys WHERE analysis_id = ?", (analysis_id,)
+            )
+
+        self._transaction(release)
+
+    def __len__(self) -> int:
+        """Number of analyses pending in all workers."""
+
+        def count():
+            self._drop_dead_owners()
+            return self._connection.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+
+        return self._transaction(count)
+
+    def find_idempotency_key(self, key: str) -> Optional[Response]:
+        """Return response of pending analysis submitted with given idempotency key."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response FROM idempotency_keys WHERE key = ?", (key,)
+            ).fetchone()
+        return None if row is None else Response.model_validate_json(row[0])
+
+    def claim_idempotency_key(self, key: str, response: Response) -> Response:
+        """Associate idempotency key with given admitted analysis, unless it already
+        belongs to another one. Return response of the analysis owning the key."""
+
+        def claim():
+            self._connection.execute(
+                "INSERT OR IGNORE INTO idempotency_keys VALUES (?, ?, ?)",
+                (key, response.log_detective_analysis_id, response.model_dump_json()),
+            )
+            return self._connection.execute(
+                "SELECT response FROM idempotency_keys WHERE key = ?", (key,)
+            ).fetchone()[0]
+
+        return Response.model_validate_json(self._transaction(claim))
+
+    def claim_request(self, key: str) -> bool:
+        """Claim request with given key for the current worker. Return False
+        if identical request is in progress in another worker."""
+
+        def claim():
+            self._drop_dead_owners()
+            pid = os.getpid()
+            self._connection.execute(
+                "INSERT OR IGNORE INTO requests VALUES (?, ?)", (key, pid)
+            )
+            (owner,) = self._connection.execute(
+                "SELECT owner FROM requests WHERE key = ?", (key,)
+            ).fetchone()
+            return owner == pid
+
+        return self._transaction(claim)
+
+    def release_request(self, key: str) -> None:
+        """Release request claimed by the current worker, once its result is stored."""
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM requests WHERE key = ? AND owner = ?", (key, os.getpid())
+            )
@@ -0,0 +1,176 @@
+from collections import deque
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    # Available in standard library since Python 3.14
+    from compression import zstd
+
+    ZSTD_STDLIB = True
+except ImportError:
+    ZSTD_STDLIB = False
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+# Most bytes a single block of zstd frame decompresses to, and fewest bytes it takes
+ZSTD_BLOCK_SIZE_MAX = 128 * 1024
+ZSTD_BLOCK_MIN_SIZE = 4
+
+
+class ZlibDecoder:
+    """Incremental decoder of `gzip` and `deflate` content."""
+
+    error = zlib.error
+
+    def __init__(self, wbits: int):
+        self._decompressor = zlib.decompressobj(wbits)
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        return self._decompressor.decompress(data, max_length)
+
+    @property
+    def eof(self) -> bool:
+        return self._decompressor.eof
+
+
+class ZstdDecoder:
+    """Incremental decoder of `zstd` content."""
+
+    def __init__(self):
+        self.error = zstd.ZstdError
+        if ZSTD_STDLIB:
+            self._decompressor = zstd.ZstdDecompressor()
+        else:
+            self._decompressor = zstd.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        if ZSTD_STDLIB:
+            return self._decompressor.decompress(data, max_length)
+        # Output of `zstandard` decompressor can't be limited, input is fed to it
+        # in slices holding only as many blocks as fit within the limit
+        view = memoryview(data)
+        output = []
+        size = 0
+        while view and size < max_length:
+            blocks = max(1, (max_length - size) // ZSTD_BLOCK_SIZE_MAX)
+            output.append(
+                self._decompressor.decompress(view[: blocks * ZSTD_BLOCK_MIN_SIZE])
+            )
+            size += len(output[-1])
+            view = view[blocks * ZSTD_BLOCK_MIN_SIZE :]
+        return b"".join(output)
+
+    @property
+    def eof(self) -> bool:
+        return self._decompressor.eof
+
+
+def create_decoder(encoding: str) -> Optional[ZlibDecoder | ZstdDecoder]:
+    """Return decoder for given content encoding, or None if it isn't supported."""
+    if encoding in ("gzip", "x-gzip"):
+        return ZlibDecoder(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return ZlibDecoder(zlib.MAX_WBITS)
+    if encoding == "zstd" and zstd is not None:
+        return ZstdDecoder()
+    return None
+
+
+class RequestDecompressionMiddleware:
+    """Decompress request bodies sent with `Content-Encoding` header as they are received.
+
+    Requests with body larger than `max_size` bytes, after decompression,
+    are rejected with 413 as soon as the limit is exceeded, uncompressed ones
+    too, even if they are sent without `Content-Length`."""
+
+    def __init__(self, app: ASGIApp, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def reject(
+        self, scope: Scope, receive: Receive, send: Send, status_code: int, detail: str
+    ) -> None:
+        response = JSONResponse({"detail": detail}, status_code=status_code)
+        await response(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = headers.get("content-encoding", "identity").strip().lower()
+        too_large = f"Request body exceeds {self.max_size} bytes."
+
+        if encoding == "identity":
+            content_length = headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > self.max_size:
+                await self.reject(scope, receive, send, 413, too_large)
+                return
+            decoder = None
+            decoder_error = ()
+        else:
+            decoder = create_decoder(encoding)
+            if decoder is None:
+                await self.reject(
+                    scope,
+                    receive,
+                    send,
+                    415,
+                    f"Unsupported content encoding: {encoding}",
+                )
+                return
+            decoder_error = decoder.error
+
+        # Chunks are passed on as they are, without joining them into another copy
+        chunks: deque[bytes] = deque()
+        size = 0
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                more_body = message.get("more_body", False)
+                chunk = message.get("body", b"")
+                if chunk and decoder is not None:
+                    chunk = decoder.decompress(chunk, self.max_size - size + 1)
+                if chunk:
+                    chunks.append(chunk)
+                    size += len(chunk)
+                # Bodies without `Content-Length` are counted as they are received too
+                if size > self.max_size:
+                    await self.reject(scope, receive, send, 413, too_large)
+                    return
+        except decoder_error as ex:
+            await self.reject(
+                scope, receive, send, 400, f"Decompressing request body failed: {ex}"
+            )
+            return
+        if decoder is not None and not decoder.eof:
+            await self.reject(scope, receive, send, 400, "Request body is truncated.")
+            return
+
+        scope = dict(scope)
+        decoded_headers = MutableHeaders(scope=scope)
+        if decoder is not None:
+            del decoded_headers["content-encoding"]
+        decoded_headers["content-length"] = str(size)
+
+        body_sent = False
+
+        async def receive_decoded() -> Message:
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body = chunks.popleft() if chunks else b""
+            body_sent = not chunks
+            return {"type": "http.request", "body": body, "more_body": not body_sent}
+
+        await self.app(scope, receive_decoded, send)
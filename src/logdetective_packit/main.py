@@ -1,18 +1,30 @@
 import asyncio
+from collections import Counter
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from functools import partial
+import gzip
 from json import JSONDecodeError
 import logging
+import math
 import os
+import signal
+import tempfile
+import threading
+import time
 from importlib.metadata import version
-from typing import Annotated
+from typing import Annotated, Any, Callable, Optional
 import uuid
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import Body, FastAPI, Depends, Header, HTTPException, Query, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response as HTTPResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+import jsonschema
+import pydantic
 import sentry_sdk
 
-from httpx import AsyncClient, HTTPStatusError
+from httpx import AsyncClient, HTTPError, HTTPStatusError, Limits, Timeout
 from fedora_messaging.api import publish
 from fedora_messaging.config import conf
 from fedora_messaging.exceptions import (
@@ -23,38 +35,384 @@ from fedora_messaging.exceptions import (
 )
 from logdetective_packit_message import LogDetectiveResult, LogDetectiveMessage
 
-from logdetective_packit.models import BuildInfo, Response
-from logdetective_packit.utils import is_url
+from logdetective_packit.backends import (
+    BackendPool,
+    BalancingStrategy,
+    parse_backend_urls,
+)
+from logdetective_packit.blobs import BlobStore
+from logdetective_packit.cache import create_result_cache
+from logdetective_packit.coalescing import RequestCoalescer
+from logdetective_packit.coordination import SharedState
+from logdetective_packit.decompression import RequestDecompressionMiddleware
+from logdetective_packit import metrics
+from logdetective_packit.models import (
+    AnalysisStatusResponse,
+    BatchItemResponse,
+    BuildInfo,
+    Response,
+)
+from logdetective_packit.outbox import Outbox
+from logdetective_packit.preflight import ArtifactUnreachableError, URLPreflight
+from logdetective_packit.profiling import (
+    TailSampler,
+    sample_stacks,
+    stage,
+    traced_analysis,
+)
+from logdetective_packit.publisher import MessagePublisher
+from logdetective_packit.rate_limit import (
+    BurstExceededError,
+    RateLimiter,
+    RateLimitKey,
+)
+from logdetective_packit.retry import is_retryable, retry_delay
+from logdetective_packit.scheduler import FairScheduler, parse_class_settings
+from logdetective_packit.spool import ArtifactMissingError, ArtifactSpool
+from logdetective_packit.status import AnalysisStatusStore
+from logdetective_packit.serialization import (
+    THREAD_ENCODING_SIZE,
+    RequestEncoding,
+    encode_analysis_request,
+    encode_json,
+    request_encoding,
+)
+from logdetective_packit.utils import inline_artifacts_size, is_url
+from logdetective_packit.work_queue import AnalysisQueue
 
+# Comma separated list of Log Detective servers
 LD_URL = os.environ.get("LD_URL")
 LD_TOKEN = os.environ.get("LD_TOKEN", "")
+# Seconds to wait for data from Log Detective, for opening connection to it,
+# and for a free connection from the pool
 LD_TIMEOUT = int(os.environ.get("LD_TIMEOUT", 107))
+LD_CONNECT_TIMEOUT = float(os.environ.get("LD_CONNECT_TIMEOUT", 10))
+LD_POOL_TIMEOUT = float(os.environ.get("LD_POOL_TIMEOUT", 30))
+# Connections to Log Detective kept in the pool, and seconds idle ones are kept open
+LD_MAX_CONNECTIONS = int(os.environ.get("LD_MAX_CONNECTIONS", 100))
+LD_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LD_MAX_KEEPALIVE_CONNECTIONS", 20))
+LD_KEEPALIVE_EXPIRY = float(os.environ.get("LD_KEEPALIVE_EXPIRY", 30))
+# Multiplex requests to Log Detective over HTTP/2, requires the `h2` package
+LD_HTTP2 = os.environ.get("LD_HTTP2", "").lower() in ("1", "true", "yes")
+# Connections opened to every Log Detective server on startup
+LD_PREWARM_CONNECTIONS = int(os.environ.get("LD_PREWARM_CONNECTIONS", 1))
 PUBLISH_TIMEOUT = int(os.environ.get("PUBLISH_TIMEOUT", 30))
+# Number of messages waiting for confirmation by the broker at the same time
+PUBLISH_CONCURRENCY = int(os.environ.get("PUBLISH_CONCURRENCY", 4))
+# Seconds between publishing of results left in the outbox, and backoff
+# of results which failed to be published again
+PUBLISH_FLUSH_INTERVAL = float(os.environ.get("PUBLISH_FLUSH_INTERVAL", 5))
+PUBLISH_RETRY_BACKOFF = float(os.environ.get("PUBLISH_RETRY_BACKOFF", 1))
+PUBLISH_RETRY_BACKOFF_MAX = float(os.environ.get("PUBLISH_RETRY_BACKOFF_MAX", 300))
 LD_PACKIT_TOKEN = os.environ.get("LD_PACKIT_TOKEN", "")
+# Maximum size of `/analyze` request body in bytes, after decompression
+LD_PACKIT_MAX_BODY_SIZE = int(os.environ.get("LD_PACKIT_MAX_BODY_SIZE", 100 * 1024**2))
+# Compression of requests to Log Detective, `gzip` or `zstd`, disabled when not set
+LD_REQUEST_ENCODING = request_encoding(os.environ.get("LD_REQUEST_ENCODING", ""))
+# Number of concurrent requests to Log Detective API per worker
+LD_MAX_CONCURRENT_CALLS = int(os.environ.get("LD_MAX_CONCURRENT_CALLS", 8))
+# Fair queuing of requests to Log Detective, by comma separated `build_system`,
+# `project_url` and `pr_id`, with `class=value` pairs of weights and concurrency caps
+LD_SCHEDULING_KEYS = os.environ.get("LD_SCHEDULING_KEYS", "build_system")
+LD_SCHEDULING_WEIGHTS = os.environ.get("LD_SCHEDULING_WEIGHTS", "")
+LD_SCHEDULING_CAPS = os.environ.get("LD_SCHEDULING_CAPS", "")
+# Number of accepted analyses allowed to wait for a free slot per worker
+LD_MAX_QUEUED_CALLS = int(os.environ.get("LD_MAX_QUEUED_CALLS", 100))
+# Most builds submitted in a single request to `/analyze/batch`
+LD_MAX_BATCH_SIZE = int(os.environ.get("LD_MAX_BATCH_SIZE", 100))
+# Seconds pending analyses are given to finish when the worker is shutting down
+LD_DRAIN_TIMEOUT = int(os.environ.get("LD_DRAIN_TIMEOUT", 60))
+# Seconds a terminated worker keeps serving requests, reporting it is draining,
+# before it closes its listener, so that load balancers stop sending requests to it
+LD_DRAIN_DELAY = int(os.environ.get("LD_DRAIN_DELAY", 10))
+# Number of accepted analyses pending in all workers together, 0 disables the limit
+LD_MAX_PENDING_ANALYSES = int(os.environ.get("LD_MAX_PENDING_ANALYSES", 0))
+# Seconds clients are asked to wait before retrying a rejected submission
+LD_RETRY_AFTER = int(os.environ.get("LD_RETRY_AFTER", 30))
+# Number of times a failed request to Log Detective API is repeated
+LD_MAX_RETRIES = int(os.environ.get("LD_MAX_RETRIES", 3))
+# Base and maximum of exponential backoff between retries, in seconds
+LD_RETRY_BACKOFF = float(os.environ.get("LD_RETRY_BACKOFF", 1))
+LD_RETRY_BACKOFF_MAX = float(os.environ.get("LD_RETRY_BACKOFF_MAX", 30))
+# Consecutive failures after which a server is ejected, for given number of seconds
+LD_BREAKER_THRESHOLD = int(os.environ.get("LD_BREAKER_THRESHOLD", 5))
+LD_BREAKER_RESET_TIMEOUT = float(os.environ.get("LD_BREAKER_RESET_TIMEOUT", 60))
+# Either `least_outstanding` or `ewma`, for lowest latency weighted by outstanding requests
+LD_BALANCING = os.environ.get("LD_BALANCING", "least_outstanding")
+# Seconds between active health checks of Log Detective servers, 0 disables them
+LD_HEALTH_CHECK_INTERVAL = float(os.environ.get("LD_HEALTH_CHECK_INTERVAL", 30))
+LD_HEALTH_CHECK_PATH = os.environ.get("LD_HEALTH_CHECK_PATH", "/")
+# Directory for state shared by workers and preserved across their restarts,
+# durable features are disabled when not set
+LD_PACKIT_STATE_DIR = os.environ.get("LD_PACKIT_STATE_DIR", "")
+# Inline artifacts larger than this many characters are kept on disk until they are sent,
+# smaller ones too, once those kept in memory exceed the budget of the worker
+LD_SPOOL_THRESHOLD = int(os.environ.get("LD_SPOOL_THRESHOLD", 1024**2))
+LD_MEMORY_BUDGET = int(os.environ.get("LD_MEMORY_BUDGET", 256 * 1024**2))
+LD_SPOOL_DIR = os.environ.get(
+    "LD_SPOOL_DIR",
+    os.path.join(LD_PACKIT_STATE_DIR or tempfile.gettempdir(), "spool"),
+)
+# Cache of Log Detective responses, either `memory` or `disk`, disabled when not set
+LD_CACHE_BACKEND = os.environ.get("LD_CACHE_BACKEND", "")
+LD_CACHE_TTL = int(os.environ.get("LD_CACHE_TTL", 3600))
+LD_CACHE_SIZE = int(os.environ.get("LD_CACHE_SIZE", 1000))
+# Seconds between checks for response of identical request made by another worker
+SHARED_REQUEST_POLL_INTERVAL = 1
+# Submissions per second allowed for each `project_url`, `build_system` or bearer `token`,
+# with bursts of up to `LD_RATE_LIMIT_BURST` submissions, 0 disables the limit
+LD_RATE_LIMIT = float(os.environ.get("LD_RATE_LIMIT", 0))
+LD_RATE_LIMIT_BURST = int(os.environ.get("LD_RATE_LIMIT_BURST", 10))
+LD_RATE_LIMIT_KEY = os.environ.get("LD_RATE_LIMIT_KEY", "project_url")
+# Publish `running` message once request to Log Detective starts, and repeat it
+# every `LD_HEARTBEAT_INTERVAL` seconds until the analysis finishes, 0 disables repeating
+LD_PUBLISH_RUNNING = os.environ.get("LD_PUBLISH_RUNNING", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+LD_HEARTBEAT_INTERVAL = float(os.environ.get("LD_HEARTBEAT_INTERVAL", 0))
+# Responses of Log Detective larger than this many bytes are published only as reference
+# to `GET /results/{digest}`, prefixed by `LD_PACKIT_PUBLIC_URL`, 0 disables it
+LD_BLOB_THRESHOLD = int(os.environ.get("LD_BLOB_THRESHOLD", 0))
+LD_BLOB_DIR = os.environ.get(
+    "LD_BLOB_DIR",
+    os.path.join(LD_PACKIT_STATE_DIR or tempfile.gettempdir(), "results"),
+)
+LD_BLOB_RETENTION = int(os.environ.get("LD_BLOB_RETENTION", 7 * 24 * 3600))
+LD_PACKIT_PUBLIC_URL = os.environ.get("LD_PACKIT_PUBLIC_URL", "")
+# Consumers of messages can't resolve references relative to this server
+if LD_BLOB_THRESHOLD > 0 and not LD_PACKIT_PUBLIC_URL:
+    raise ValueError("LD_BLOB_THRESHOLD requires LD_PACKIT_PUBLIC_URL to be set")
+# Longest text of explanation included in summary of referenced response
+LD_BLOB_SUMMARY_LENGTH = int(os.environ.get("LD_BLOB_SUMMARY_LENGTH", 500))
+# Check that artifact URLs are reachable before the request to Log Detective,
+# with given timeout, remembering the outcome for `LD_PREFLIGHT_TTL` seconds
+LD_PREFLIGHT = os.environ.get("LD_PREFLIGHT", "").lower() in ("1", "true", "yes")
+LD_PREFLIGHT_TIMEOUT = float(os.environ.get("LD_PREFLIGHT_TIMEOUT", 5))
+LD_PREFLIGHT_TTL = float(os.environ.get("LD_PREFLIGHT_TTL", 300))
+# Seconds for which state of finished analyses can be looked up, and their maximum number
+LD_STATUS_RETENTION = int(os.environ.get("LD_STATUS_RETENTION", 7 * 24 * 3600))
+LD_STATUS_MAX_ENTRIES = int(os.environ.get("LD_STATUS_MAX_ENTRIES", 100000))
+# Share of traces sent to Sentry, those of analyses failing or taking
+# at least `LD_TRACE_SLOW_THRESHOLD` seconds are always sent
+LD_TRACES_SAMPLE_RATE = float(os.environ.get("LD_TRACES_SAMPLE_RATE", 1.0))
+LD_TRACE_SLOW_THRESHOLD = float(os.environ.get("LD_TRACE_SLOW_THRESHOLD", 60))
+# Longest profile of the worker which can be requested, in seconds
+LD_PROFILE_MAX_SECONDS = float(os.environ.get("LD_PROFILE_MAX_SECONDS", 60))
 
 LOG = logging.getLogger("LogDetectivePackit")
 
 http_bearer = HTTPBearer()
 
 # Set the LD_PACKIT_INTERFACE_SENTRY_DSN env variable beforehand
+trace_sampler = TailSampler(LD_TRACES_SAMPLE_RATE, LD_TRACE_SLOW_THRESHOLD)
 sentry_sdk.init(
-    dsn=os.environ.get("LD_PACKIT_INTERFACE_SENTRY_DSN"), traces_sample_rate=1.0
+    dsn=os.environ.get("LD_PACKIT_INTERFACE_SENTRY_DSN"),
+    traces_sampler=trace_sampler.traces_sampler,
+    before_send_transaction=trace_sampler.before_send_transaction,
 )
 
 # Setup logging for fedora-messaging
 conf.setup_logging()
 
-http_client = AsyncClient(timeout=LD_TIMEOUT)
+http_client = AsyncClient(
+    timeout=Timeout(LD_TIMEOUT, connect=LD_CONNECT_TIMEOUT, pool=LD_POOL_TIMEOUT),
+    limits=Limits(
+        max_connections=LD_MAX_CONNECTIONS,
+        max_keepalive_connections=LD_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LD_KEEPALIVE_EXPIRY,
+    ),
+    http2=LD_HTTP2,
+)
+publisher = MessagePublisher(PUBLISH_CONCURRENCY)
 
 _log_detective_call_tasks: set[asyncio.Task] = set()
+# Tasks publishing `running` messages of analyses, with events stopping them
+_heartbeats: dict[str, tuple[asyncio.Event, asyncio.Task]] = {}
+# Set when the worker is shutting down and no longer accepts analyses
+draining = False
+# Pending analyses being drained, started once the worker is asked to terminate
+_drain_task: Optional[asyncio.Future] = None
+# Held while the worker is being profiled, only one profile is taken at a time
+_profiling = asyncio.Lock()
+log_detective_scheduler = FairScheduler(
+    LD_MAX_CONCURRENT_CALLS,
+    [key.strip() for key in LD_SCHEDULING_KEYS.split(",") if key.strip()],
+    parse_class_settings(LD_SCHEDULING_WEIGHTS, float),
+    parse_class_settings(LD_SCHEDULING_CAPS, int),
+)
+log_detective_backends = BackendPool(
+    parse_backend_urls(LD_URL),
+    BalancingStrategy(LD_BALANCING),
+    LD_BREAKER_THRESHOLD,
+    LD_BREAKER_RESET_TIMEOUT,
+)
+# Identical requests to Log Detective in progress, shared by their analyses
+_log_detective_requests = RequestCoalescer()
+artifact_spool = ArtifactSpool(LD_SPOOL_DIR, LD_SPOOL_THRESHOLD, LD_MEMORY_BUDGET)
+result_cache = create_result_cache(
+    LD_CACHE_BACKEND, LD_PACKIT_STATE_DIR, LD_CACHE_TTL, LD_CACHE_SIZE
+)
+url_preflight = URLPreflight(LD_PREFLIGHT_TTL) if LD_PREFLIGHT else None
+# Artifacts are served by other hosts than Log Detective, don't share its pool
+preflight_client = AsyncClient(timeout=LD_PREFLIGHT_TIMEOUT, follow_redirects=True)
+
+result_blobs = (
+    BlobStore(LD_BLOB_DIR, LD_BLOB_RETENTION) if LD_BLOB_THRESHOLD > 0 else None
+)
+
+# Pending analyses and idempotency keys of all workers,
+# without shared state directory they are private to each worker
+shared_state = SharedState(
+    os.path.join(LD_PACKIT_STATE_DIR, "shared.sqlite")
+    if LD_PACKIT_STATE_DIR
+    else ":memory:"
+)
+
+analysis_queue = (
+    AnalysisQueue(os.path.join(LD_PACKIT_STATE_DIR, "queue.sqlite"))
+    if LD_PACKIT_STATE_DIR
+    else None
+)
+
+# Results are kept until the broker confirms them, without shared state directory
+# they survive failed publishing, but not restart of the worker
+result_outbox = Outbox(
+    os.path.join(LD_PACKIT_STATE_DIR, "outbox.sqlite")
+    if LD_PACKIT_STATE_DIR
+    else ":memory:"
+)
+
+# Without shared state directory, each worker has its own buckets
+rate_limiter = (
+    RateLimiter(
+        os.path.join(LD_PACKIT_STATE_DIR, "rate_limit.sqlite")
+        if LD_PACKIT_STATE_DIR
+        else ":memory:",
+        RateLimitKey(LD_RATE_LIMIT_KEY),
+        LD_RATE_LIMIT,
+        LD_RATE_LIMIT_BURST,
+    )
+    if LD_RATE_LIMIT
+    else None
+)
+
+# Without shared state directory, each worker knows only analyses it has accepted
+status_store = AnalysisStatusStore(
+    os.path.join(LD_PACKIT_STATE_DIR, "status.sqlite")
+    if LD_PACKIT_STATE_DIR
+    else ":memory:",
+    LD_STATUS_RETENTION,
+    LD_STATUS_MAX_ENTRIES,
+)
+
+
+async def drain():
+    """Give pending analyses `LD_DRAIN_TIMEOUT` seconds to finish.
+    Analyses which didn't finish by then are cancelled, they remain
+    in the durable queue and are replayed by the next worker."""
+    if not _log_detective_call_tasks:
+        return
+    LOG.info(
+        "Draining %d pending analyses, for up to %d seconds",
+        len(_log_detective_call_tasks),
+        LD_DRAIN_TIMEOUT,
+    )
+    _, unfinished = await asyncio.wait(
+        set(_log_detective_call_tasks), timeout=LD_DRAIN_TIMEOUT
+    )
+    if unfinished:
+        LOG.warning(
+            "Interrupting %d analyses which didn't finish in time", len(unfinished)
+        )
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+
+
+def start_draining() -> asyncio.Future:
+    """Stop accepting analyses and start draining pending ones, unless it started already."""
+    global draining, _drain_task
+    draining = True
+    if _drain_task is None:
+        _drain_task = asyncio.ensure_future(drain())
+    return _drain_task
+
+
+def handle_termination() -> Callable[[], None]:
+    """Start draining as soon as the worker receives `SIGTERM`, and pass the signal
+    to the server only `LD_DRAIN_DELAY` seconds later. Until the server closes
+    its listener, readiness checks tell load balancers the worker is draining.
+    Another `SIGTERM` is passed to the server right away.
+
+    Return a function restoring the previous handler."""
+    # Signals can only be handled in the main thread
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+    loop = asyncio.get_running_loop()
+    previous_handler = signal.getsignal(signal.SIGTERM)
+    terminations: list[asyncio.TimerHandle] = []
+
+    def terminate(signum: int):
+        if callable(previous_handler):
+            previous_handler(signum, None)
+        else:
+            signal.signal(signum, previous_handler or signal.SIG_DFL)
+            signal.raise_signal(signum)
+
+    def start_termination(signum: int):
+        if draining:
+            terminate(signum)
+            return
+        LOG.info("Terminating in %d seconds, draining meanwhile", LD_DRAIN_DELAY)
+        start_draining()
+        terminations.append(loop.call_later(LD_DRAIN_DELAY, terminate, signum))
+
+    def handler(signum, frame):
+        loop.call_soon_threadsafe(start_termination, signum)
+
+    def restore():
+        for termination in terminations:
+            termination.cancel()
+        if signal.getsignal(signal.SIGTERM) is handler:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    signal.signal(signal.SIGTERM, handler)
+    return restore
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Handler running tasks when the server is being shut down."""
+    """Handler opening connections to Log Detective and replaying analyses
+    left behind by previous workers on startup, and draining pending analyses
+    from the moment the worker is asked to terminate until the server is shut down."""
+    if LD_PREWARM_CONNECTIONS > 0:
+        await log_detective_backends.prewarm(
+            http_client,
+            LD_HEALTH_CHECK_PATH,
+            LD_PREWARM_CONNECTIONS,
+            LD_CONNECT_TIMEOUT,
+        )
+    health_checks = None
+    if LD_HEALTH_CHECK_INTERVAL > 0:
+        health_checks = asyncio.create_task(
+            log_detective_backends.run_health_checks(
+                http_client, LD_HEALTH_CHECK_PATH, LD_HEALTH_CHECK_INTERVAL
+            )
+        )
+    await claim_orphans(include_own=True)
+    outbox_flusher = asyncio.ensure_future(run_outbox_flusher())
+    restore_termination_handler = handle_termination()
     yield
-    if _log_detective_call_tasks:
-        await asyncio.gather(*_log_detective_call_tasks, return_exceptions=True)
+    restore_termination_handler()
+    await start_draining()
+    if health_checks:
+        health_checks.cancel()
+    outbox_flusher.cancel()
+    # Last attempt, results which are still not confirmed wait in the outbox
+    await flush_outbox()
+    await publisher.close()
 
 
 app = FastAPI(
@@ -62,26 +420,208 @@ app = FastAPI(
     version=version("logdetective-packit"),
     lifespan=lifespan,
 )
+app.add_middleware(RequestDecompressionMiddleware, max_size=LD_PACKIT_MAX_BODY_SIZE)
+
+# Submitted builds are validated by the endpoints, so that validation is timed
+# and items of batches are reported one by one, their schema is documented
+# as if FastAPI validated them
+BUILD_INFO_SCHEMA = {"$ref": "#/components/schemas/BuildInfo"}
+
+
+def openapi() -> dict[str, Any]:
+    """OpenAPI schema of the app, with schema of submitted builds among its components."""
+    if app.openapi_schema:
+        return app.openapi_schema
+    schema = FastAPI.openapi(app)
+    build_info = BuildInfo.model_json_schema(
+        ref_template="#/components/schemas/{model}"
+    )
+    components = schema["components"]["schemas"]
+    components.update(build_info.pop("$defs", {}))
+    components["BuildInfo"] = build_info
+    return schema
+
+
+app.openapi = openapi
 
 
 async def publish_message(message: LogDetectiveMessage):
+    start = time.monotonic()
+    metrics.PUBLISH_PENDING.inc()
     try:
-        await asyncio.to_thread(publish, message=message, timeout=PUBLISH_TIMEOUT)
+        with stage("publish"):
+            await publisher.submit(
+                partial(publish, message=message, timeout=PUBLISH_TIMEOUT)
+            )
     except (PublishReturned, PublishForbidden, PublishTimeout, ValidationError) as ex:
         LOG.error("Publishing result")
         raise ex
+    finally:
+        metrics.PUBLISH_PENDING.dec()
+        metrics.PUBLISH_DURATION.observe(time.monotonic() - start)
 
 
-def build_error_message(
+async def deliver_message(seq: int, message: LogDetectiveMessage, attempts: int):
+    """Publish message from the outbox, removing it once it is confirmed,
+    or scheduling another attempt with backoff if publishing failed."""
+    try:
+        await publish_message(message)
+    except ValidationError as ex:
+        # Publishing it again can't succeed
+        LOG.error("Dropping invalid result %s: %s", message.body, ex)
+        sentry_sdk.capture_exception(ex)
+        result_outbox.remove(seq)
+    except Exception as ex:
+        delay = retry_delay(
+            attempts, ex, PUBLISH_RETRY_BACKOFF, PUBLISH_RETRY_BACKOFF_MAX
+        )
+        LOG.warning(
+            "Publishing result of analysis %s failed with %r, retrying in %.1f s",
+            message.body["log_detective_analysis_id"],
+            ex,
+            delay,
+        )
+        result_outbox.retry(seq, delay)
+    else:
+        result_outbox.remove(seq)
+
+
+def stored_message(message_id: str, headers: dict, body: dict) -> LogDetectiveMessage:
+    """Rebuild message from the outbox with its original ID and headers,
+    so that consumers recognize it if it was published already."""
+    message = LogDetectiveMessage(body=body)
+    message._headers = headers
+    message.id = message_id
+    return message
+
+
+async def flush_outbox():
+    """Publish results in the outbox which are due, the oldest first."""
+    await asyncio.gather(
+        *(
+            deliver_message(seq, stored_message(message_id, headers, body), attempts)
+            for seq, message_id, headers, body, attempts in result_outbox.hold_due()
+        )
+    )
+    depth, age = result_outbox.stats()
+    metrics.OUTBOX_MESSAGES.set(depth)
+    metrics.OUTBOX_AGE.set(age)
+
+
+async def claim_orphans(include_own: bool):
+    """Take over results and analyses left behind by workers which are no longer running.
+    Results are published by the outbox flusher, unfinished analyses are replayed."""
+    orphaned_messages = result_outbox.claim_orphaned(include_own)
+    if orphaned_messages:
+        LOG.warning("Publishing %d results left in the outbox", orphaned_messages)
+    if analysis_queue is None:
+        return
+    orphaned_analyses = analysis_queue.claim_orphaned(include_own)
+    # Analyses with results in the outbox finished already
+    finished_analyses = result_outbox.analysis_ids()
+    for analysis_id, _, _ in orphaned_analyses:
+        if analysis_id in finished_analyses:
+            analysis_queue.remove(analysis_id)
+    orphaned_analyses = [
+        analysis
+        for analysis in orphaned_analyses
+        if analysis[0] not in finished_analyses
+    ]
+    if orphaned_analyses:
+        LOG.warning("Replaying %d unfinished analyses", len(orphaned_analyses))
+    # Replayed analyses were accepted already, they aren't limited again
+    shared_state.admit([analysis_id for analysis_id, _, _ in orphaned_analyses])
+    for analysis_id, analysis_start, build_info in orphaned_analyses:
+        await submit_analysis(build_info, analysis_id, analysis_start)
+
+
+async def run_outbox_flusher():
+    while True:
+        # Workers which exited since startup of this one, while it was running,
+        # left their analyses and results behind too
+        if not draining:
+            try:
+                await claim_orphans(include_own=False)
+            except Exception as ex:
+                LOG.error("Claiming orphaned analyses failed with %r", ex)
+        try:
+            await flush_outbox()
+        except Exception as ex:
+            LOG.error("Flushing the outbox failed with %r", ex)
+        await asyncio.sleep(PUBLISH_FLUSH_INTERVAL)
+
+
+async def finish_analysis(message: LogDetectiveMessage):
+    """Record result of analysis and publish it, after its last `running` message.
+    Result is stored in the outbox first, so it isn't lost if publishing fails."""
+    heartbeat = stop_heartbeat(message.body["log_detective_analysis_id"])
+    if heartbeat is not None:
+        await heartbeat
+    status_store.finished(message.body)
+    if result_blobs is not None and "log_detective_response" in message.body:
+        message = await offload_response(message)
+    seq = result_outbox.append(message.id, message._headers, message.body)
+    # Earlier result of the same analysis is published first, by the flusher
+    if seq is not None:
+        await deliver_message(seq, message, attempts=0)
+
+
+def summarize_response(response: dict) -> dict:
+    """Keep only scalar fields of Log Detective response, and beginning of its explanation."""
+    summary = {
+        key: value
+        for key, value in response.items()
+        if not isinstance(value, (dict, list))
+    }
+    explanation = response.get("explanation")
+    if isinstance(explanation, dict) and isinstance(explanation.get("text"), str):
+        summary["explanation"] = explanation["text"][:LD_BLOB_SUMMARY_LENGTH]
+    return summary
+
+
+async def offload_response(message: LogDetectiveMessage) -> LogDetectiveMessage:
+    """Replace response larger than `LD_BLOB_THRESHOLD` in the message with reference
+    to the stored response, and its summary. Response which can't be stored
+    is kept in the message, rather than losing the result."""
+    response = message.body["log_detective_response"]
+    data = encode_json(response)
+    if len(data) <= LD_BLOB_THRESHOLD:
+        return message
+    try:
+        digest = await asyncio.to_thread(result_blobs.put, data)
+    except OSError as ex:
+        LOG.error(
+            "Storing response of analysis %s failed, publishing it inline: %r",
+            message.body["log_detective_analysis_id"],
+            ex,
+        )
+        sentry_sdk.capture_exception(ex)
+        return message
+    body = {
+        key: value
+        for key, value in message.body.items()
+        if key != "log_detective_response"
+    }
+    body["log_detective_response_ref"] = {
+        "digest": digest,
+        "size": len(data),
+        "url": f"{LD_PACKIT_PUBLIC_URL.rstrip('/')}/results/{digest}",
+    }
+    body["log_detective_response_summary"] = summarize_response(response)
+    return LogDetectiveMessage(body=body)
+
+
+def build_running_message(
     log_detective_analysis_id: str,
     log_detective_analysis_start: datetime,
     build_info: BuildInfo,
-    error_msg: str = "",
+    queue_wait: float,
+    elapsed: float,
 ) -> LogDetectiveMessage:
-    """Build and return standard error message"""
+    """Build message reporting analysis in progress at Log Detective."""
     return LogDetectiveMessage(
         body={
-            "status": LogDetectiveResult.error,
+            "status": LogDetectiveResult.running,
             "target_build": build_info.target_build,
             "build_system": build_info.build_system,
             "log_detective_analysis_id": log_detective_analysis_id,
@@ -89,11 +629,178 @@ def build_error_message(
             "project_url": build_info.project_url,
             "pr_id": build_info.pr_id,
             "commit_sha": build_info.commit_sha,
-            "error_msg": error_msg,
+            "queue_wait_seconds": queue_wait,
+            "elapsed_seconds": elapsed,
         },
     )
 
 
+async def publish_heartbeats(
+    build_info: BuildInfo,
+    log_detective_analysis_id: str,
+    log_detective_analysis_start: datetime,
+    stop: asyncio.Event,
+):
+    """Publish `running` message, and repeat it every `LD_HEARTBEAT_INTERVAL` seconds
+    until `stop` is set. Failures to publish don't affect the analysis."""
+    started = datetime.now(timezone.utc)
+    queue_wait = (started - log_detective_analysis_start).total_seconds()
+    while True:
+        elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+        try:
+            await publish_message(
+                build_running_message(
+                    log_detective_analysis_id,
+                    log_detective_analysis_start,
+                    build_info,
+                    queue_wait,
+                    elapsed,
+                )
+            )
+        except Exception as ex:
+            LOG.warning(
+                "Publishing progress of analysis %s failed with %s",
+                log_detective_analysis_id,
+                ex,
+            )
+        if LD_HEARTBEAT_INTERVAL <= 0:
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), LD_HEARTBEAT_INTERVAL)
+            return
+        except TimeoutError:
+            pass
+
+
+def stop_heartbeat(log_detective_analysis_id: str) -> Optional[asyncio.Task]:
+    """Stop publishing `running` messages of the analysis.
+    Return the task publishing them, finishing its last message."""
+    heartbeat = _heartbeats.pop(log_detective_analysis_id, None)
+    if heartbeat is None:
+        return None
+    stop, task = heartbeat
+    stop.set()
+    return task
+
+
+def analysis_started(
+    build_info: BuildInfo,
+    log_detective_analysis_id: str,
+    log_detective_analysis_start: datetime,
+):
+    """Record that request to Log Detective has started, and report it
+    with `running` messages if enabled."""
+    status_store.running(log_detective_analysis_id)
+    if not LD_PUBLISH_RUNNING:
+        return
+    stop = asyncio.Event()
+    _heartbeats[log_detective_analysis_id] = (
+        stop,
+        asyncio.ensure_future(
+            publish_heartbeats(
+                build_info,
+                log_detective_analysis_id,
+                log_detective_analysis_start,
+                stop,
+            )
+        ),
+    )
+
+
+def build_error_message(
+    log_detective_analysis_id: str,
+    log_detective_analysis_start: datetime,
+    build_info: BuildInfo,
+    error_msg: str = "",
+) -> LogDetectiveMessage:
+    """Build and return standard error message"""
+    return LogDetectiveMessage.error(
+        target_build=build_info.target_build,
+        build_system=build_info.build_system,
+        log_detective_analysis_id=log_detective_analysis_id,
+        log_detective_analysis_start=str(log_detective_analysis_start),
+        project_url=build_info.project_url,
+        pr_id=build_info.pr_id,
+        commit_sha=build_info.commit_sha,
+        error_msg=error_msg,
+    )
+
+
+async def request_shared(
+    body: bytes, headers: dict, scheduling_class: str, request_key: str
+) -> dict:
+    """Request analysis from Log Detective, unless the identical request is in progress
+    in another worker. Its response is then taken from the shared result cache,
+    the request is made only if the other worker fails to store it."""
+    on_start = partial(_log_detective_requests.started, request_key)
+    if result_cache is None or not result_cache.shared:
+        return await request_log_detective(body, headers, scheduling_class, on_start)
+    while not shared_state.claim_request(request_key):
+        await asyncio.sleep(SHARED_REQUEST_POLL_INTERVAL)
+        response = result_cache.get(request_key)
+        if response is not None:
+            return response
+    # Response may have been stored just before the claim was released
+    response = result_cache.get(request_key)
+    if response is not None:
+        return response
+    return await request_log_detective(body, headers, scheduling_class, on_start)
+
+
+def failed_server(ex: Exception) -> str:
+    """Describe Log Detective server the failed request was sent to, if it is known,
+    rather than all the configured servers."""
+    if isinstance(ex, HTTPError):
+        try:
+            return f" at {ex.request.url}"
+        except RuntimeError:
+            pass
+    return ""
+
+
+async def request_log_detective(
+    body: bytes,
+    headers: dict,
+    scheduling_class: str,
+    on_start: Callable[[], None],
+) -> dict:
+    """Send encoded analysis request to Log Detective API and decode the response.
+    Only `LD_MAX_CONCURRENT_CALLS` requests are in progress at the same time,
+    free slots are shared fairly by scheduling classes of the analyses.
+    `on_start` is called once the request has a free slot.
+    Requests failing for transient reasons are repeated after a backoff,
+    possibly on another server."""
+    attempt = 0
+    while True:
+        try:
+            async with log_detective_scheduler.slot(scheduling_class):
+                if attempt == 0:
+                    on_start()
+                backend = log_detective_backends.select()
+                with stage("ld_response"):
+                    response = await backend.post(
+                        http_client,
+                        headers=headers,
+                        content=body,
+                    )
+        except Exception as ex:
+            if attempt >= LD_MAX_RETRIES or not is_retryable(ex):
+                raise ex
+            delay = retry_delay(attempt, ex, LD_RETRY_BACKOFF, LD_RETRY_BACKOFF_MAX)
+            LOG.warning(
+                "Request to Log Detective API%s failed with %s, retrying in %.1f s",
+                failed_server(ex),
+                ex,
+                delay,
+            )
+            attempt += 1
+            await asyncio.sleep(delay)
+        else:
+            metrics.LD_RESPONSE_SIZE.observe(len(response.content))
+            with metrics.LD_RESPONSE_DECODE_DURATION.time(), stage("decode"):
+                return response.json()
+
+
 async def call_log_detective(
     build_info: BuildInfo,
     log_detective_analysis_id: str,
@@ -104,35 +811,123 @@ async def call_log_detective(
     headers = {}
     files = []
     analysis_request = {}
-
-    for artifact_identity, artifact_content in build_info.artifacts.items():
-        if is_url(artifact_content):
-            files.append({"name": artifact_identity, "url": artifact_content})
-        else:
-            files.append(
-                {
-                    "name": artifact_identity,
-                    "content": artifact_content,
-                }
-            )
-
-    analysis_request["files"] = files
-
-    if build_info.build_metadata:
-        analysis_request["build_metadata"] = build_info.build_metadata.model_dump()
+    inline_size = 0
+    artifact_urls = {}
 
     # If Log Detective server requires authorization
     if LD_TOKEN:
         headers["Authorization"] = f"Bearer {LD_TOKEN}"
+    headers["Content-Type"] = "application/json"
+    if LD_REQUEST_ENCODING != RequestEncoding.identity:
+        headers["Content-Encoding"] = LD_REQUEST_ENCODING.value
     try:
-        response = await http_client.post(
-            url=LD_URL,
-            headers=headers,
-            json=analysis_request,
+        with stage("payload"):
+            for artifact_identity, artifact_content in build_info.artifacts.items():
+                if is_url(artifact_content):
+                    files.append({"name": artifact_identity, "url": artifact_content})
+                    artifact_urls[artifact_identity] = artifact_content
+                else:
+                    # Large artifacts are read back from the spool only now
+                    if artifact_spool.is_spooled(
+                        log_detective_analysis_id, artifact_identity
+                    ):
+                        artifact_content = await asyncio.to_thread(
+                            artifact_spool.read,
+                            log_detective_analysis_id,
+                            artifact_identity,
+                        )
+                    inline_size += len(artifact_content)
+                    files.append(
+                        {
+                            "name": artifact_identity,
+                            "content": artifact_content,
+                        }
+                    )
+
+            analysis_request["files"] = files
+
+            if build_info.build_metadata:
+                analysis_request["build_metadata"] = (
+                    build_info.build_metadata.model_dump()
+                )
+
+            # Request is encoded once, for its digest and for all attempts to send it
+            if inline_size > THREAD_ENCODING_SIZE:
+                request_key, body = await asyncio.to_thread(
+                    encode_analysis_request, analysis_request, LD_REQUEST_ENCODING
+                )
+            else:
+                request_key, body = encode_analysis_request(
+                    analysis_request, LD_REQUEST_ENCODING
+                )
+        # Contents of artifacts are kept only in the encoded body from now on
+        del analysis_request, files
+        response = result_cache.get(request_key) if result_cache is not None else None
+        cached = response is not None
+        if result_cache is not None:
+            metrics.RESULT_CACHE_REQUESTS.labels("hit" if cached else "miss").inc()
+        try:
+            if not cached:
+                # Don't let Log Detective find out the artifacts are gone after waiting in line
+                if url_preflight is not None and artifact_urls:
+                    await url_preflight.check(preflight_client, artifact_urls)
+                # Analyses of identical artifacts share a single request
+                response = await _log_detective_requests.run(
+                    request_key,
+                    lambda: request_shared(
+                        body,
+                        headers,
+                        log_detective_scheduler.classify(build_info),
+                        request_key,
+                    ),
+                    on_start=partial(
+                        analysis_started,
+                        build_info,
+                        log_detective_analysis_id,
+                        log_detective_analysis_start,
+                    ),
+                )
+            # Message is validated as it is built, so that invalid response is reported
+            with stage("message"):
+                message = LogDetectiveMessage.complete(
+                    log_detective_response=response,
+                    target_build=build_info.target_build,
+                    build_system=build_info.build_system,
+                    log_detective_analysis_id=log_detective_analysis_id,
+                    log_detective_analysis_start=str(log_detective_analysis_start),
+                    project_url=build_info.project_url,
+                    pr_id=build_info.pr_id,
+                    commit_sha=build_info.commit_sha,
+                )
+            # Only responses making a valid message are cached
+            if result_cache is not None and not cached:
+                result_cache.set(request_key, response)
+        finally:
+            # Response is stored by now, for workers waiting for the identical request
+            if not cached and result_cache is not None and result_cache.shared:
+                shared_state.release_request(request_key)
+    except ArtifactUnreachableError as ex:
+        LOG.warning("Analysis %s failed: %s", log_detective_analysis_id, ex)
+        message = build_error_message(
+            log_detective_analysis_id=log_detective_analysis_id,
+            log_detective_analysis_start=log_detective_analysis_start,
+            build_info=build_info,
+            error_msg=str(ex),
         )
-        response.raise_for_status()
+        await finish_analysis(message)
+        raise ex
+    except ArtifactMissingError as ex:
+        LOG.error("Analysis %s failed: %s", log_detective_analysis_id, ex)
+        message = build_error_message(
+            log_detective_analysis_id=log_detective_analysis_id,
+            log_detective_analysis_start=log_detective_analysis_start,
+            build_info=build_info,
+            error_msg=str(ex),
+        )
+        await finish_analysis(message)
+        raise ex
     except HTTPStatusError as ex:
-        msg = f"Request to Log Detective API at {LD_URL} failed with HTTP status error: {ex}"
+        msg = f"Request to Log Detective API{failed_server(ex)} failed with HTTP status error: {ex}"
 
         LOG.error(msg=msg)
         message = build_error_message(
@@ -141,10 +936,10 @@ async def call_log_detective(
             build_info=build_info,
             error_msg=msg,
         )
-        await publish_message(message)
+        await finish_analysis(message)
         raise ex
-    except Exception as ex:
-        msg = f"Request to Log Detective API at {LD_URL} failed with {ex}"
+    except jsonschema.ValidationError as ex:
+        msg = f"Response from Log Detective API is invalid: {ex.message}"
         LOG.error(msg=msg)
         message = build_error_message(
             log_detective_analysis_id=log_detective_analysis_id,
@@ -152,11 +947,8 @@ async def call_log_detective(
             build_info=build_info,
             error_msg=msg,
         )
-        await publish_message(message)
+        await finish_analysis(message)
         raise ex
-
-    try:
-        response = response.json()
     except JSONDecodeError as ex:
         msg = f"Decoding response from Log Detective API failed with {ex}"
         LOG.error(msg=msg)
@@ -166,22 +958,59 @@ async def call_log_detective(
             build_info=build_info,
             error_msg=msg,
         )
-        await publish_message(message)
+        await finish_analysis(message)
+        raise ex
+    except asyncio.CancelledError:
+        # Without durable queue, interrupted analysis can't be replayed
+        if analysis_queue is None:
+            message = build_error_message(
+                log_detective_analysis_id=log_detective_analysis_id,
+                log_detective_analysis_start=log_detective_analysis_start,
+                build_info=build_info,
+                error_msg="Analysis was interrupted by shutdown of the server",
+            )
+            await finish_analysis(message)
+        raise
+    except Exception as ex:
+        msg = f"Request to Log Detective API{failed_server(ex)} failed with {ex}"
+        LOG.error(msg=msg)
+        message = build_error_message(
+            log_detective_analysis_id=log_detective_analysis_id,
+            log_detective_analysis_start=log_detective_analysis_start,
+            build_info=build_info,
+            error_msg=msg,
+        )
+        await finish_analysis(message)
         raise ex
+    await finish_analysis(message)
 
-    response = {
-        "status": LogDetectiveResult.complete,
-        "log_detective_response": response,
-        "target_build": build_info.target_build,
-        "build_system": build_info.build_system,
-        "log_detective_analysis_id": log_detective_analysis_id,
-        "log_detective_analysis_start": str(log_detective_analysis_start),
-        "project_url": build_info.project_url,
-        "pr_id": build_info.pr_id,
-        "commit_sha": build_info.commit_sha,
-    }
-    message = LogDetectiveMessage(body=response)
-    await publish_message(message)
+
+def analysis_metrics_callback(
+    build_info: BuildInfo, log_detective_analysis_start: datetime
+):
+    """Create callback recording outcome and duration of finished analysis."""
+
+    def callback(task: asyncio.Task):
+        metrics.ANALYSES_IN_FLIGHT.dec()
+        update_spool_metrics()
+        if task.cancelled():
+            return
+        result = (
+            LogDetectiveResult.error
+            if task.exception()
+            else LogDetectiveResult.complete
+        )
+        metrics.ANALYSES_FINISHED.labels(build_info.build_system, result.value).inc()
+        metrics.ANALYSIS_DURATION.labels(result.value).observe(
+            (datetime.now(timezone.utc) - log_detective_analysis_start).total_seconds()
+        )
+
+    return callback
+
+
+def update_spool_metrics():
+    metrics.SPOOLED_BYTES.set(artifact_spool.spooled_bytes)
+    metrics.IN_MEMORY_ARTIFACTS_BYTES.set(artifact_spool.memory_bytes)
 
 
 def analysis_task_callback(task: asyncio.Task):
@@ -194,14 +1023,58 @@ def analysis_task_callback(task: asyncio.Task):
         sentry_sdk.capture_exception(cancelled_error)
 
 
-@app.post("/analyze", response_model=Response)
-async def analyze_build(
+def analysis_queue_callback(log_detective_analysis_id: str):
+    """Create callback removing finished analysis from the durable queue.
+    Cancelled analyses are kept, so they can be replayed by the next worker."""
+
+    def callback(task: asyncio.Task):
+        if not task.cancelled():
+            analysis_queue.remove(log_detective_analysis_id)
+
+    return callback
+
+
+async def submit_analysis(
     build_info: BuildInfo,
-    credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)],
-):
-    """Submit given build to Log Detective server for analysis.
-    Only the first log URL is used for now. Request is made in a separate task."""
+    log_detective_analysis_id: str,
+    log_detective_analysis_start: datetime,
+) -> asyncio.Task:
+    """Start analysis in a separate task and keep track of it.
+    Large inline artifacts are kept on disk while the analysis is pending."""
+    build_info = await artifact_spool.spool(log_detective_analysis_id, build_info)
+    update_spool_metrics()
+    task = asyncio.create_task(
+        traced_analysis(
+            call_log_detective(
+                build_info,
+                log_detective_analysis_id,
+                log_detective_analysis_start=log_detective_analysis_start,
+            ),
+            name="call_log_detective",
+        )
+    )
+    _log_detective_call_tasks.add(task)
+
+    # Verify that task was completed and remove it from set of running tasks
+    task.add_done_callback(analysis_task_callback)
+    task.add_done_callback(_log_detective_call_tasks.discard)
+    task.add_done_callback(
+        lambda task: artifact_spool.release(log_detective_analysis_id)
+    )
+    metrics.ANALYSES_IN_FLIGHT.inc()
+    task.add_done_callback(
+        analysis_metrics_callback(build_info, log_detective_analysis_start)
+    )
+    task.add_done_callback(lambda task: shared_state.release(log_detective_analysis_id))
+    task.add_done_callback(lambda task: stop_heartbeat(log_detective_analysis_id))
+    if analysis_queue is not None:
+        task.add_done_callback(analysis_queue_callback(log_detective_analysis_id))
 
+    return task
+
+
+def verify_token(credentials: HTTPAuthorizationCredentials):
+    """Check that client is authorized with `LD_PACKIT_TOKEN`."""
     if credentials.credentials != LD_PACKIT_TOKEN:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -209,22 +1082,341 @@ async def analyze_build(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    log_detective_analysis_id = str(uuid.uuid4())
-    log_detective_analysis_start = datetime.now(timezone.utc)
-    task = asyncio.create_task(
-        call_log_detective(
-            build_info,
-            log_detective_analysis_id,
-            log_detective_analysis_start=log_detective_analysis_start,
+
+def check_capacity(build_infos: list[BuildInfo]):
+    """Shed load here, instead of letting requests time out in the queue."""
+    if draining:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is shutting down, try again later.",
+            headers={"Retry-After": str(LD_RETRY_AFTER)},
+        )
+    pending = len(_log_detective_call_tasks)
+    if pending + len(build_infos) > LD_MAX_CONCURRENT_CALLS + LD_MAX_QUEUED_CALLS:
+        LOG.warning(
+            "Rejecting analysis of %s, %d analyses are already pending",
+            ", ".join(build_info.target_build for build_info in build_infos),
+            pending,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pending analyses, try again later.",
+            headers={"Retry-After": str(LD_RETRY_AFTER)},
         )
+
+
+def check_batch_size(items: list[Any]):
+    """Reject batch which could never be accepted, retrying it wouldn't help."""
+    max_size = min(LD_MAX_BATCH_SIZE, LD_MAX_CONCURRENT_CALLS + LD_MAX_QUEUED_CALLS)
+    if LD_MAX_PENDING_ANALYSES:
+        max_size = min(max_size, LD_MAX_PENDING_ANALYSES)
+    if len(items) > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"Batch of {len(items)} builds is larger than {max_size}, split it.",
+        )
+
+
+def check_rate_limit(build_infos: list[BuildInfo], credentials: str) -> Counter:
+    """Charge submissions to their buckets, rejecting them all when any bucket is empty.
+    Return number of tokens taken from each bucket."""
+    if rate_limiter is None:
+        return Counter()
+    counts = Counter(
+        rate_limiter.bucket(build_info, credentials) for build_info in build_infos
     )
-    _log_detective_call_tasks.add(task)
+    try:
+        wait = rate_limiter.acquire(counts)
+    except BurstExceededError as ex:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many analyses submitted at once: {ex}",
+        ) from ex
+    if wait:
+        LOG.warning(
+            "Rate limiting analysis of %s",
+            ", ".join(build_info.target_build for build_info in build_infos),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded, try again later.",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+    return counts
 
-    # Verify that task was completed and remove it from set of running tasks
-    task.add_done_callback(analysis_task_callback)
-    task.add_done_callback(_log_detective_call_tasks.discard)
 
-    return Response(
-        log_detective_analysis_id=log_detective_analysis_id,
-        creation_time=log_detective_analysis_start,
+def refund_rate_limit(counts: Counter):
+    """Return tokens charged for submissions which weren't accepted."""
+    if rate_limiter is not None:
+        rate_limiter.refund(counts)
+
+
+def admit_charged_analyses(
+    analyses: list[tuple[str, datetime, BuildInfo]], charged: Counter
+):
+    """Admit analyses, refunding their submissions if they are rejected."""
+    try:
+        admit_analyses(analyses)
+    except HTTPException:
+        refund_rate_limit(charged)
+        raise
+
+
+def new_analyses(
+    build_infos: list[BuildInfo],
+) -> list[tuple[str, datetime, BuildInfo]]:
+    return [
+        (str(uuid.uuid4()), datetime.now(timezone.utc), build_info)
+        for build_info in build_infos
+    ]
+
+
+def admit_analyses(analyses: list[tuple[str, datetime, BuildInfo]]):
+    """Take leases of analyses, within the limit of analyses pending in all workers."""
+    analysis_ids = [
+        log_detective_analysis_id for log_detective_analysis_id, _, _ in analyses
+    ]
+    if not shared_state.admit(analysis_ids, LD_MAX_PENDING_ANALYSES or None):
+        LOG.warning(
+            "Rejecting analysis of %s, %d analyses are already pending in all workers",
+            ", ".join(build_info.target_build for _, _, build_info in analyses),
+            LD_MAX_PENDING_ANALYSES,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pending analyses, try again later.",
+            headers={"Retry-After": str(LD_RETRY_AFTER)},
+        )
+
+
+async def accept_analyses(
+    analyses: list[tuple[str, datetime, BuildInfo]],
+) -> list[Response]:
+    """Enqueue admitted analyses and start them."""
+    # Persist the analyses before responding, so they aren't lost with the worker
+    if analysis_queue is not None:
+        analysis_queue.put_many(analyses)
+    status_store.queued_many(analyses)
+
+    responses = []
+    for log_detective_analysis_id, log_detective_analysis_start, build_info in analyses:
+        metrics.ANALYSES_ACCEPTED.labels(build_info.build_system).inc()
+        metrics.ARTIFACTS_SIZE.observe(inline_artifacts_size(build_info.artifacts))
+        await submit_analysis(
+            build_info, log_detective_analysis_id, log_detective_analysis_start
+        )
+        responses.append(
+            Response(
+                log_detective_analysis_id=log_detective_analysis_id,
+                creation_time=log_detective_analysis_start,
+            )
+        )
+
+    return responses
+
+
+def parse_build_info(item: Any) -> BuildInfo:
+    """Validate submitted build, timed as a stage of its analysis.
+    Errors are reported the same way as of any other request body."""
+    with stage("validation"):
+        try:
+            return BuildInfo.model_validate(item)
+        except pydantic.ValidationError as ex:
+            raise RequestValidationError(
+                [
+                    dict(error, loc=("body", *error["loc"]))
+                    for error in ex.errors(include_url=False)
+                ],
+                body=item,
+            ) from ex
+
+
+@app.post(
+    "/analyze",
+    response_model=Response,
+    openapi_extra={
+        "requestBody": {"content": {"application/json": {"schema": BUILD_INFO_SCHEMA}}}
+    },
+)
+async def analyze_build(
+    item: Annotated[Any, Body()],
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)],
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+):
+    """Submit given build to Log Detective server for analysis.
+    Only the first log URL is used for now. Request is made in a separate task."""
+
+    verify_token(credentials)
+    build_info = parse_build_info(item)
+
+    # Redelivered submission of analysis which is still in progress, in any worker
+    if idempotency_key:
+        response = shared_state.find_idempotency_key(idempotency_key)
+        if response is not None:
+            return response
+
+    check_capacity([build_info])
+    charged = check_rate_limit([build_info], credentials.credentials)
+    analyses = new_analyses([build_info])
+    admit_charged_analyses(analyses, charged)
+
+    if idempotency_key:
+        log_detective_analysis_id, log_detective_analysis_start, _ = analyses[0]
+        response = shared_state.claim_idempotency_key(
+            idempotency_key,
+            Response(
+                log_detective_analysis_id=log_detective_analysis_id,
+                creation_time=log_detective_analysis_start,
+            ),
+        )
+        # Another worker accepted the same submission meanwhile
+        if response.log_detective_analysis_id != log_detective_analysis_id:
+            shared_state.release(log_detective_analysis_id)
+            refund_rate_limit(charged)
+            return response
+
+    [response] = await accept_analyses(analyses)
+    return response
+
+
+@app.post(
+    "/analyze/batch",
+    response_model=list[BatchItemResponse],
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "items": BUILD_INFO_SCHEMA,
+                        "maxItems": LD_MAX_BATCH_SIZE,
+                    }
+                }
+            }
+        }
+    },
+)
+async def analyze_builds(
+    items: Annotated[list[Any], Body()],
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)],
+):
+    """Submit multiple builds for analysis at once.
+    Results are returned in order of the submitted items, each with either ID
+    of the analysis, or errors of its validation. Valid items are accepted
+    only if there is room for all of them."""
+
+    verify_token(credentials)
+    check_batch_size(items)
+
+    results: list[Optional[BatchItemResponse]] = []
+    build_infos = []
+    with stage("validation"):
+        for item in items:
+            try:
+                build_infos.append(BuildInfo.model_validate(item))
+                results.append(None)
+            except pydantic.ValidationError as ex:
+                results.append(
+                    BatchItemResponse(
+                        errors=ex.errors(
+                            include_url=False,
+                            include_context=False,
+                            include_input=False,
+                        )
+                    )
+                )
+
+    check_capacity(build_infos)
+    charged = check_rate_limit(build_infos, credentials.credentials)
+    analyses = new_analyses(build_infos)
+    admit_charged_analyses(analyses, charged)
+    accepted = iter(await accept_analyses(analyses))
+
+    return [
+        BatchItemResponse(**next(accepted).model_dump()) if result is None else result
+        for result in results
+    ]
+
+
+@app.get("/analyze", response_model=list[AnalysisStatusResponse])
+async def find_analyses(
+    target_build: str,
+    build_system: str,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)],
+):
+    """Return recent analyses of given build, the most recent first."""
+    verify_token(credentials)
+    return status_store.find(target_build, build_system)
+
+
+@app.get("/analyze/{log_detective_analysis_id}", response_model=AnalysisStatusResponse)
+async def get_analysis(
+    log_detective_analysis_id: str,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)],
+):
+    """Return state of analysis, and its result once it is finished."""
+    verify_token(credentials)
+    analysis = status_store.get(log_detective_analysis_id)
+    if analysis is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Analysis {log_detective_analysis_id} not found.",
+        )
+    return analysis
+
+
+@app.get("/results/{digest}")
+def get_result(digest: str, accept_encoding: Annotated[str, Header()] = ""):
+    """Serve Log Detective response referenced by published message."""
+    blob = result_blobs.get(digest) if result_blobs is not None else None
+    if blob is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Result not found."
+        )
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    if "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+    else:
+        blob = gzip.decompress(blob)
+    return HTTPResponse(blob, media_type="application/json", headers=headers)
+
+
+@app.get("/health/ready")
+def get_readiness():
+    """Report whether the worker accepts analyses, for load balancers."""
+    if draining:
+        return JSONResponse(
+            {"status": "draining"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Expose Prometheus metrics of all workers."""
+    content, content_type = metrics.render_metrics()
+    return HTTPResponse(content=content, media_type=content_type)
+
+
+@app.get("/debug/profile")
+async def get_profile(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)],
+    seconds: Annotated[float, Query(gt=0)] = 10,
+):
+    """Sample stacks of all threads of the worker handling the request for given
+    number of seconds, at most `LD_PROFILE_MAX_SECONDS`. Stacks are returned
+    in collapsed format of flame graph tools."""
+    verify_token(credentials)
+    if _profiling.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Worker is already being profiled.",
+        )
+    async with _profiling:
+        profile = await asyncio.to_thread(
+            sample_stacks, min(seconds, LD_PROFILE_MAX_SECONDS)
+        )
+    return HTTPResponse(
+        content=profile,
+        media_type="text/plain",
+        headers={"X-Worker-PID": str(os.getpid())},
     )
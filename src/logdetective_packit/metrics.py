@@ -0,0 +1,155 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+PREFIX = "logdetective_packit"
+
+# Seconds, covering both quick failures and analyses taking several minutes
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, float("inf"))
+# Seconds, for operations expected to finish within a second
+FAST_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, float("inf"))
+# Bytes, from small snippets to logs of tens of megabytes
+SIZE_BUCKETS = tuple(4**exponent for exponent in range(5, 14)) + (float("inf"),)
+
+ANALYSES_IN_FLIGHT = Gauge(
+    f"{PREFIX}_analyses_in_flight",
+    "Analyses accepted and not finished yet",
+    multiprocess_mode="livesum",
+)
+ANALYSES_ACCEPTED = Counter(
+    f"{PREFIX}_analyses_accepted",
+    "Analyses accepted on /analyze",
+    ["build_system"],
+)
+ANALYSES_FINISHED = Counter(
+    f"{PREFIX}_analyses_finished",
+    "Analyses which published their result",
+    ["build_system", "status"],
+)
+ANALYSIS_DURATION = Histogram(
+    f"{PREFIX}_analysis_duration_seconds",
+    "Time from accepting analysis to publishing its result",
+    ["status"],
+    buckets=DURATION_BUCKETS,
+)
+LD_REQUEST_DURATION = Histogram(
+    f"{PREFIX}_ld_request_duration_seconds",
+    "Duration of requests to Log Detective API",
+    ["backend"],
+    buckets=DURATION_BUCKETS,
+)
+LD_POOL_WAIT_DURATION = Histogram(
+    f"{PREFIX}_ld_pool_wait_duration_seconds",
+    "Time requests to Log Detective API waited for a connection from the pool",
+    ["backend"],
+    buckets=FAST_DURATION_BUCKETS,
+)
+LD_CONNECT_DURATION = Histogram(
+    f"{PREFIX}_ld_connect_duration_seconds",
+    "Time spent opening connections to Log Detective API, including TLS handshake",
+    ["backend"],
+    buckets=FAST_DURATION_BUCKETS,
+)
+LD_RESPONSE_DECODE_DURATION = Histogram(
+    f"{PREFIX}_ld_response_decode_duration_seconds",
+    "Time spent decoding JSON responses of Log Detective API",
+    buckets=FAST_DURATION_BUCKETS,
+)
+PUBLISH_DURATION = Histogram(
+    f"{PREFIX}_publish_duration_seconds",
+    "Time from submitting message for publishing to its confirmation",
+    buckets=FAST_DURATION_BUCKETS,
+)
+ARTIFACTS_SIZE = Histogram(
+    f"{PREFIX}_artifacts_size_bytes",
+    "Size of inline artifacts of accepted analysis",
+    buckets=SIZE_BUCKETS,
+)
+LD_RESPONSE_SIZE = Histogram(
+    f"{PREFIX}_ld_response_size_bytes",
+    "Size of responses of Log Detective API",
+    buckets=SIZE_BUCKETS,
+)
+RESULT_CACHE_REQUESTS = Counter(
+    f"{PREFIX}_result_cache_requests",
+    "Lookups in the result cache",
+    ["result"],
+)
+BACKEND_OUTSTANDING = Gauge(
+    f"{PREFIX}_backend_outstanding_requests",
+    "Requests in progress per Log Detective server",
+    ["backend"],
+    multiprocess_mode="livesum",
+)
+BACKEND_EJECTED = Gauge(
+    f"{PREFIX}_backend_ejected",
+    "Whether the Log Detective server is ejected by circuit breaker of a worker",
+    ["backend"],
+    multiprocess_mode="livemax",
+)
+SPOOLED_BYTES = Gauge(
+    f"{PREFIX}_spooled_artifacts_bytes",
+    "Size of inline artifacts kept on disk",
+    multiprocess_mode="livesum",
+)
+IN_MEMORY_ARTIFACTS_BYTES = Gauge(
+    f"{PREFIX}_in_memory_artifacts_bytes",
+    "Size of inline artifacts of pending analyses kept in memory",
+    multiprocess_mode="livesum",
+)
+PUBLISH_PENDING = Gauge(
+    f"{PREFIX}_publish_pending_messages",
+    "Messages waiting for confirmation by the broker",
+    multiprocess_mode="livesum",
+)
+ANALYSES_WAITING = Gauge(
+    f"{PREFIX}_analyses_waiting",
+    "Analyses waiting for a free slot, per scheduling class",
+    ["scheduling_class"],
+    multiprocess_mode="livesum",
+)
+LD_QUEUE_WAIT_DURATION = Histogram(
+    f"{PREFIX}_queue_wait_duration_seconds",
+    "Time analyses waited for a free slot, per scheduling class",
+    ["scheduling_class"],
+    buckets=DURATION_BUCKETS,
+)
+
+STAGE_DURATION = Histogram(
+    f"{PREFIX}_stage_duration_seconds",
+    "Time spent in stages of the analysis pipeline",
+    ["stage"],
+    # Stages range from validation taking milliseconds to waiting for Log Detective
+    buckets=sorted(set(FAST_DURATION_BUCKETS + DURATION_BUCKETS)),
+)
+
+OUTBOX_MESSAGES = Gauge(
+    f"{PREFIX}_outbox_messages",
+    "Results waiting in the outbox for confirmation by the broker",
+    multiprocess_mode="livesum",
+)
+OUTBOX_AGE = Gauge(
+    f"{PREFIX}_outbox_oldest_message_age_seconds",
+    "Time the oldest result in the outbox has been waiting",
+    multiprocess_mode="livemax",
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Return current metrics in Prometheus text format and their content type.
+    With `PROMETHEUS_MULTIPROC_DIR` set, metrics of all gunicorn workers are aggregated."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,4 +1,5 @@
 from datetime import datetime
+import enum
 from typing import Optional
 from pydantic import BaseModel, Field
 
@@ -52,3 +53,45 @@ class Response(BaseModel):
         description="UUID of the analysis which will be used to retrieve the results from messages"
     )
     creation_time: datetime = Field(description="Time of Log Detective analysis start")
+
+
+class BatchItemResponse(BaseModel):
+    log_detective_analysis_id: Optional[str] = Field(
+        description="UUID of the analysis, if the item was accepted", default=None
+    )
+    creation_time: Optional[datetime] = Field(
+        description="Time of Log Detective analysis start", default=None
+    )
+    errors: Optional[list[dict]] = Field(
+        description="Validation errors, if the item was rejected", default=None
+    )
+
+
+class AnalysisStatus(str, enum.Enum):
+    """State of analysis, as tracked by this server."""
+
+    queued = "queued"
+    running = "running"
+    complete = "complete"
+    error = "error"
+
+
+class AnalysisStatusResponse(BaseModel):
+    log_detective_analysis_id: str = Field(description="UUID of the analysis")
+    status: AnalysisStatus = Field(description="Current state of the analysis")
+    target_build: str = Field(description="Identifier of the analyzed build")
+    build_system: str = Field(description="System where the build was launched")
+    creation_time: datetime = Field(description="Time the analysis was accepted")
+    start_time: Optional[datetime] = Field(
+        description="Time the request to Log Detective was started", default=None
+    )
+    finish_time: Optional[datetime] = Field(
+        description="Time the result was available", default=None
+    )
+    log_detective_response: Optional[dict] = Field(
+        description="Response of Log Detective, if the analysis is complete",
+        default=None,
+    )
+    error_msg: Optional[str] = Field(
+        description="Reason of the failure, if the analysis failed", default=None
+    )
@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from logdetective_packit.serialization import encode_json
+from logdetective_packit.utils import open_sqlite, pid_alive
+
+# Most messages published by the flusher at once
+FLUSH_BATCH_SIZE = 100
+
+
+class Outbox:
+    """Durable outbox of result messages, stored in SQLite database in WAL mode.
+
+    Messages are appended before they are published and removed once the broker
+    confirms them, so that results aren't lost when publishing fails, or with
+    the worker. Their IDs and headers are kept, so that a message published again
+    is the same message for consumers. Messages of the same analysis are published
+    one at a time, in order they were appended. Every entry is owned by the worker
+    which appended it, entries of workers which are no longer running are taken
+    over on startup.
+
+    Entries being published are held by the worker until their publishing
+    is confirmed or fails, however long they wait for the publisher."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        # Sequence numbers of entries being published by this worker
+        self._held: set[int] = set()
+        self._connection = open_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                analysis_id TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt REAL NOT NULL,
+                owner INTEGER NOT NULL
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_analysis ON messages (analysis_id)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_owner ON messages (owner, next_attempt)"
+        )
+
+    def _transaction(self, function, *args):
+        with self._lock:
+            try:
+                self._connection.execute("BEGIN IMMEDIATE")
+                result = function(*args)
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+        return result
+
+    def append(self, message_id: str, headers: dict, body: dict) -> Optional[int]:
+        """Store message with given ID, headers and body, owned by the current process.
+
+        Return sequence number of the message, held for publishing right away,
+        or None if earlier message of the same analysis is still waiting,
+        the message is then published by the flusher after it."""
+        analysis_id = body["log_detective_analysis_id"]
+        encoded_headers = encode_json(headers).decode()
+        encoded_body = encode_json(body).decode()
+
+        def append():
+            now = time.time()
+            (earlier,) = self._connection.execute(
+                "SELECT COUNT(*) FROM messages WHERE analysis_id = ?", (analysis_id,)
+            ).fetchone()
+            seq = self._connection.execute(
+                "INSERT INTO messages (analysis_id, message_id, headers, body, "
+                "created, attempts, next_attempt, owner) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                (
+                    analysis_id,
+                    message_id,
+                    encoded_headers,
+                    encoded_body,
+                    now,
+                    now,
+                    os.getpid(),
+                ),
+            ).lastrowid
+            if earlier:
+                return None
+            self._held.add(seq)
+            return seq
+
+        return self._transaction(append)
+
+    def hold_due(self) -> list[tuple[int, str, dict, dict, int]]:
+        """Hold messages of the current process due for publishing, the oldest
+        message of each analysis only, unless it is being published already.
+        Return their sequence numbers, IDs, headers, bodies and numbers
+        of failed attempts to publish them."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT seq, message_id, headers, body, attempts "
+                "FROM messages AS message "
+                "WHERE owner = ? AND next_attempt <= ? AND seq = "
+                "(SELECT MIN(seq) FROM messages WHERE analysis_id = message.analysis_id) "
+                "ORDER BY seq LIMIT ?",
+                (os.getpid(), time.time(), FLUSH_BATCH_SIZE + len(self._held)),
+            ).fetchall()
+            rows = [row for row in rows if row[0] not in self._held][:FLUSH_BATCH_SIZE]
+            self._held.update(seq for seq, _, _, _, _ in rows)
+        return [
+            (seq, message_id, json.loads(headers), json.loads(body), attempts)
+            for seq, message_id, headers, body, attempts in rows
+        ]
+
+    def remove(self, seq: int) -> None:
+        """Remove message confirmed by the broker."""
+        with self._lock:
+            self._connection.execute("DELETE FROM messages WHERE seq = ?", (seq,))
+            self._held.discard(seq)
+
+    def retry(self, seq: int, delay: float) -> None:
+        """Publish message which failed to be published again after `delay` seconds."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE messages SET attempts = attempts + 1, next_attempt = ? "
+                "WHERE seq = ?",
+                (time.time() + delay, seq),
+            )
+            self._held.discard(seq)
+
+    def analysis_ids(self) -> set[str]:
+        """IDs of analyses with messages waiting for publishing."""
+        with self._lock:
+            return {
+                analysis_id
+                for (analysis_id,) in self._connection.execute(
+                    "SELECT DISTINCT analysis_id FROM messages"
+                )
+            }
+
+    def stats(self) -> tuple[int, float]:
+        """Number of messages of the current process, and age of the oldest one in seconds."""
+        with self._lock:
+            count, oldest = self._connection.execute(
+                "SELECT COUNT(*), MIN(created) FROM messages WHERE owner = ?",
+                (os.getpid(),),
+            ).fetchone()
+        return count, 0.0 if oldest is None else time.time() - oldest
+
+    def claim_orphaned(self, include_own: bool = True) -> int:
+        """Take over messages left behind by processes which are no longer running,
+        to be published right away. Return their number.
+
+        Messages owned by current process are claimed too when `include_own` is set,
+        on startup, since the process may have reused PID of a previous worker."""
+        pid = os.getpid()
+
+        def claim():
+            owners = [
+                owner
+                for (owner,) in self._connection.execute(
+                    "SELECT DISTINCT owner FROM messages"
+                ).fetchall()
+                if (owner == pid and include_own)
+                or (owner != pid and not pid_alive(owner))
+            ]
+            return sum(
+                self._connection.execute(
+                    "UPDATE messages SET owner = ?, next_attempt = 0 WHERE owner = ?",
+                    (pid, owner),
+                ).rowcount
+                for owner in owners
+            )
+
+        return self._transaction(claim)
@@ -0,0 +1,78 @@
+import asyncio
+from collections import OrderedDict
+import time
+from typing import Optional
+
+from httpx import AsyncClient, HTTPError, codes
+
+from logdetective_packit.coalescing import RequestCoalescer
+
+# Most URLs whose reachability is remembered
+MAX_ENTRIES = 10000
+
+
+class ArtifactUnreachableError(Exception):
+    """Artifact URL can't be retrieved, so Log Detective couldn't analyze it."""
+
+
+class URLPreflight:
+    """Check that artifact URLs can be retrieved, before Log Detective is asked to.
+
+    URLs are probed with HEAD request, or with GET of the first byte, if the server
+    doesn't allow HEAD. Reachable URLs, and those the server refused with client error,
+    are remembered for `ttl` seconds. Concurrent checks of the same URL share the probe."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._results: OrderedDict[str, tuple[float, Optional[str]]] = OrderedDict()
+        self._probes = RequestCoalescer()
+
+    async def _probe(self, http_client: AsyncClient, url: str) -> Optional[str]:
+        """Return reason why the URL is unreachable, or None if it is reachable."""
+        try:
+            response = await http_client.head(url)
+            if response.status_code in (
+                codes.METHOD_NOT_ALLOWED,
+                codes.NOT_IMPLEMENTED,
+            ):
+                async with http_client.stream(
+                    "GET", url, headers={"Range": "bytes=0-0"}
+                ) as response:
+                    pass
+        except HTTPError as ex:
+            return f"{type(ex).__name__}: {ex}"
+
+        if response.is_success:
+            error = None
+        else:
+            error = f"{response.status_code} {response.reason_phrase}"
+        if response.is_success or response.is_client_error:
+            self._results[url] = (time.monotonic() + self.ttl, error)
+            self._results.move_to_end(url)
+            while len(self._results) > MAX_ENTRIES:
+                self._results.popitem(last=False)
+        return error
+
+    async def check_url(self, http_client: AsyncClient, url: str) -> Optional[str]:
+        if (result := self._results.get(url)) is not None:
+            expires, error = result
+            if expires > time.monotonic():
+                return error
+            del self._results[url]
+        return await self._probes.run(url, lambda: self._probe(http_client, url))
+
+    async def check(self, http_client: AsyncClient, urls: dict[str, str]) -> None:
+        """Check all artifact URLs, given by artifact names, in parallel.
+        Raises `ArtifactUnreachableError` naming every unreachable artifact."""
+        errors = await asyncio.gather(
+            *(self.check_url(http_client, url) for url in urls.values())
+        )
+        unreachable = [
+            f"{name} at {url} ({error})"
+            for (name, url), error in zip(urls.items(), errors)
+            if error is not None
+        ]
+        if unreachable:
+            raise ArtifactUnreachableError(
+                f"Artifacts are unreachable: {', '.join(unreachable)}"
+            )
@@ -0,0 +1,108 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import random
+import sys
+import threading
+import time
+from typing import Awaitable, Optional, TypeVar
+
+import sentry_sdk
+
+from logdetective_packit import metrics
+
+T = TypeVar("T")
+
+# Operation of transactions spanning whole analyses, sampled by their outcome
+ANALYSIS_OP = "analysis"
+# Statuses of transactions which failed on the side of this server or Log Detective
+FAILED_STATUSES = frozenset(
+    (
+        "internal_error",
+        "unknown_error",
+        "deadline_exceeded",
+        "unavailable",
+        "data_loss",
+        "aborted",
+    )
+)
+# Seconds between samples of the stacks of the worker
+PROFILE_INTERVAL = 0.005
+
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the analysis pipeline, as a metric and as a span of the current trace."""
+    start = time.perf_counter()
+    try:
+        with sentry_sdk.start_span(op=f"{ANALYSIS_OP}.{name}", name=name):
+            yield
+    finally:
+        metrics.STAGE_DURATION.labels(name).observe(time.perf_counter() - start)
+
+
+async def traced_analysis(analysis: Awaitable[T], name: str) -> T:
+    """Run analysis in its own transaction, in a scope isolated from other analyses."""
+    with sentry_sdk.new_scope():
+        with sentry_sdk.start_transaction(op=ANALYSIS_OP, name=name):
+            return await analysis
+
+
+def timestamp(value: datetime | str) -> datetime:
+    """Timestamps of events are serialized before they are passed to hooks."""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class TailSampler:
+    """Sample transactions of analyses by their outcome, once they are finished.
+
+    Transactions of analyses are always recorded, and those which failed or took
+    at least `slow_threshold` seconds are always sent. Other transactions, including
+    those of HTTP requests, which are sampled as they start, are kept with `sample_rate`."""
+
+    def __init__(self, sample_rate: float, slow_threshold: float):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    def traces_sampler(self, sampling_context: dict) -> float:
+        if sampling_context["transaction_context"].get("op") == ANALYSIS_OP:
+            return 1.0
+        return self.sample_rate
+
+    def before_send_transaction(self, event: dict, hint: dict) -> Optional[dict]:
+        trace = event.get("contexts", {}).get("trace", {})
+        if trace.get("op") != ANALYSIS_OP:
+            return event
+        if trace.get("status") in FAILED_STATUSES:
+            return event
+        duration = (
+            timestamp(event["timestamp"]) - timestamp(event["start_timestamp"])
+        ).total_seconds()
+        if duration >= self.slow_threshold or random.random() < self.sample_rate:
+            return event
+        return None
+
+
+def sample_stacks(duration: float, interval: float = PROFILE_INTERVAL) -> str:
+    """Sample stacks of all other threads of the process for `duration` seconds.
+
+    Return them in collapsed format accepted by flame graph tools, a line for every
+    distinct stack, with its frames from the outermost one separated by semicolons,
+    followed by the number of samples. Stacks start with the name of their thread."""
+    own_thread = threading.get_ident()
+    stacks: Counter[str] = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_qualname} ({code.co_filename})")
+                frame = frame.f_back
+            frames.append(thread_names.get(thread_id, str(thread_id)))
+            stacks[";".join(reversed(frames))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,28 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class MessagePublisher:
+    """Publish messages from a dedicated, bounded pool of threads.
+
+    fedora-messaging keeps one persistent broker connection per process,
+    its blocking `publish` call only waits for the broker to confirm the message.
+    Up to `concurrency` confirmations are awaited at the same time, further messages
+    wait in the queue of the pool, so that neither the number of threads
+    nor the default executor of the event loop depend on the volume of results."""
+
+    def __init__(self, concurrency: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="publisher"
+        )
+
+    async def submit(self, publish_call: Callable[[], None]) -> None:
+        """Run blocking publish call in the pool and wait for the confirmation,
+        any exception raised by the call is raised to the caller."""
+        await asyncio.get_running_loop().run_in_executor(self._executor, publish_call)
+
+    async def close(self) -> None:
+        """Wait for messages still being published and stop the threads,
+        without blocking the event loop meanwhile."""
+        await asyncio.to_thread(self._executor.shutdown, wait=True)
@@ -0,0 +1,133 @@
+import enum
+import hashlib
+import sqlite3
+import threading
+import time
+
+from logdetective_packit.models import BuildInfo
+from logdetective_packit.utils import open_sqlite
+
+# Number of acquisitions between removals of full buckets
+PRUNE_INTERVAL = 1000
+
+
+class RateLimitKey(str, enum.Enum):
+    project_url = "project_url"
+    build_system = "build_system"
+    token = "token"
+
+
+class BurstExceededError(Exception):
+    """Request needs more tokens than the bucket can ever hold."""
+
+
+class RateLimiter:
+    """Token buckets refilled with `rate` tokens per second, holding at most `burst` tokens.
+
+    Buckets are stored in SQLite database and updated in a single transaction,
+    so that they are shared by worker processes. Bucket is read and written
+    by its primary key, full buckets are removed."""
+
+    def __init__(self, path: str, key: RateLimitKey, rate: float, burst: int):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._acquired = 0
+        self._connection = open_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+
+    def bucket(self, build_info: BuildInfo, credentials: str) -> str:
+        """Name of the bucket the submission of given build is charged to.
+        Builds without `project_url` are charged to a bucket of their build system."""
+        if self.key == RateLimitKey.token:
+            # Don't keep the secret itself in the database
+            return hashlib.sha256(credentials.encode()).hexdigest()
+        if self.key == RateLimitKey.project_url and not build_info.project_url:
+            return f"build_system:{build_info.build_system}"
+        return getattr(build_info, self.key.value)
+
+    def _available(self, bucket: str, now: float) -> float:
+        row = self._connection.execute(
+            "SELECT tokens, updated FROM buckets WHERE key = ?", (bucket,)
+        ).fetchone()
+        if row is None:
+            return float(self.burst)
+        tokens, updated = row
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def _transaction(self, function, *args):
+        with self._lock:
+            try:
+                self._connection.execute("BEGIN IMMEDIATE")
+                result = function(*args)
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+        return result
+
+    def acquire(self, counts: dict[str, int]) -> float:
+        """Take given number of tokens from each bucket, all of them or none.
+
+        Return 0 if the tokens were taken, or seconds after which there will be
+        enough tokens in all the buckets."""
+        if not counts:
+            return 0.0
+        if any(count > self.burst for count in counts.values()):
+            raise BurstExceededError(
+                f"Request needs more than {self.burst} tokens of a bucket"
+            )
+        now = time.time()
+
+        def acquire():
+            available = {bucket: self._available(bucket, now) for bucket in counts}
+            wait = max(
+                (counts[bucket] - tokens) / self.rate
+                for bucket, tokens in available.items()
+            )
+            if wait <= 0:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                    [
+                        (bucket, tokens - counts[bucket], now)
+                        for bucket, tokens in available.items()
+                    ],
+                )
+                self._acquired += 1
+                if self._acquired % PRUNE_INTERVAL == 0:
+                    self._prune(now)
+            return wait
+
+        return max(self._transaction(acquire), 0.0)
+
+    def refund(self, counts: dict[str, int]) -> None:
+        """Return tokens taken for submissions which weren't accepted after all."""
+        if not counts:
+            return
+        now = time.time()
+
+        def refund():
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                [
+                    (
+                        bucket,
+                        min(self.burst, self._available(bucket, now) + count),
+                        now,
+                    )
+                    for bucket, count in counts.items()
+                ],
+            )
+
+        self._transaction(refund)
+
+    def _prune(self, now: float) -> None:
+        full = now - self.burst / self.rate
+        self._connection.execute("DELETE FROM buckets WHERE updated < ?", (full,))
@@ -0,0 +1,130 @@
+import enum
+import logging
+import random
+import time
+from typing import Optional
+
+from httpx import (
+    ConnectError,
+    ConnectTimeout,
+    HTTPStatusError,
+    PoolTimeout,
+    RemoteProtocolError,
+    TransportError,
+)
+
+LOG = logging.getLogger("LogDetectivePackit")
+
+# Responses signalling that the server is temporarily unable to handle the request
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+# Errors raised before the request could have been processed by the server
+RETRYABLE_TRANSPORT_ERRORS = (
+    ConnectError,
+    ConnectTimeout,
+    PoolTimeout,
+    RemoteProtocolError,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a server which is considered unavailable."""
+
+
+class CircuitState(str, enum.Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+def is_retryable(ex: Exception) -> bool:
+    """Check whether the failed request can be repeated."""
+    if isinstance(ex, HTTPStatusError):
+        return ex.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(ex, RETRYABLE_TRANSPORT_ERRORS)
+
+
+def is_server_failure(ex: Exception) -> bool:
+    """Check whether the failure indicates problem of the server, rather than of the request."""
+    if isinstance(ex, HTTPStatusError):
+        return ex.response.status_code in RETRYABLE_STATUS_CODES | {500}
+    return isinstance(ex, TransportError)
+
+
+def retry_delay(
+    attempt: int, ex: Exception, backoff: float, max_backoff: float
+) -> float:
+    """Seconds to wait before repeating failed request, using exponential backoff
+    with full jitter. `Retry-After` header sent by the server takes precedence."""
+    if isinstance(ex, HTTPStatusError):
+        retry_after = ex.response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), max_backoff)
+    return random.uniform(0, min(max_backoff, backoff * 2**attempt))
+
+
+class CircuitBreaker:
+    """Stop calling a server after `failure_threshold` consecutive failures.
+
+    While the circuit is open, calls fail immediately. After `reset_timeout` seconds
+    a single probe call is let through, the circuit closes again if it succeeds."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.closed
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+    def _change_state(self, state: CircuitState) -> None:
+        LOG.warning(
+            "Circuit breaker of %s changed from %s to %s",
+            self.name,
+            self.state.value,
+            state.value,
+        )
+        self.state = state
+
+    def check(self) -> None:
+        """Raise `CircuitOpenError` if the call should not be made."""
+        if self.state == CircuitState.open:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    f"{self.name} is unavailable, circuit breaker is open"
+                )
+            self._change_state(CircuitState.half_open)
+        if self.state == CircuitState.half_open:
+            now = time.monotonic()
+            # Probe which never reported its result is replaced after a while
+            if (
+                self._probe_started is not None
+                and now - self._probe_started < self.reset_timeout
+            ):
+                raise CircuitOpenError(
+                    f"{self.name} is unavailable, waiting for probe request"
+                )
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        self._probe_started = None
+        self.failures = 0
+        if self.state != CircuitState.closed:
+            self._change_state(CircuitState.closed)
+
+    def record_failure(self, ex: Optional[Exception] = None) -> None:
+        """Count failed call, failures not caused by the server are ignored."""
+        self._probe_started = None
+        if ex is not None and not is_server_failure(ex):
+            # The server responded, it's the request which is wrong
+            if self.state == CircuitState.half_open:
+                self.record_success()
+            return
+        self.failures += 1
+        if (
+            self.state == CircuitState.half_open
+            or self.failures >= self.failure_threshold
+        ):
+            if self.state != CircuitState.open:
+                self._change_state(CircuitState.open)
+            self._opened_at = time.monotonic()
@@ -0,0 +1,178 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import time
+from typing import Optional
+
+from logdetective_packit.metrics import ANALYSES_WAITING, LD_QUEUE_WAIT_DURATION
+from logdetective_packit.models import BuildInfo
+
+# Attributes of build which analyses can be classified by
+SCHEDULING_KEYS = ("build_system", "project_url", "pr_id")
+# Most classes with metrics of their own, besides configured ones,
+# others are reported together, so projects don't multiply the series
+METRIC_CLASSES = 20
+OTHER_METRIC_CLASS = "other"
+
+
+class _Waiter:
+    def __init__(self, tag: float, future: asyncio.Future):
+        self.tag = tag
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class SchedulingClass:
+    """Analyses sharing values of the scheduling keys."""
+
+    def __init__(self, name: str, label: str, weight: float, cap: int):
+        self.name = name
+        self.label = label
+        self.weight = weight
+        self.cap = cap
+        self.running = 0
+        self.finish_tag = 0.0
+        self.waiters: deque[_Waiter] = deque()
+
+
+class FairScheduler:
+    """Weighted fair queuing of requests to Log Detective.
+
+    At most `concurrency` requests are in progress, and at most the cap
+    of each class among them. Free slots are handed out in order of start tags
+    of start-time fair queuing, so that backlogged classes are served
+    in proportion to their weights, regardless of how many analyses they queued."""
+
+    def __init__(
+        self,
+        concurrency: int,
+        keys: list[str],
+        weights: Optional[dict[str, float]] = None,
+        caps: Optional[dict[str, int]] = None,
+    ):
+        unknown = set(keys) - set(SCHEDULING_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown scheduling keys: {', '.join(sorted(unknown))}")
+        if any(weight <= 0 for weight in (weights or {}).values()):
+            raise ValueError("Weights of scheduling classes must be positive")
+        self.concurrency = concurrency
+        self.keys = keys
+        self.weights = weights or {}
+        self.caps = caps or {}
+        self.running = 0
+        self._virtual_time = 0.0
+        self._classes: dict[str, SchedulingClass] = {}
+        # Classes with metric labels of their own
+        self._labeled: set[str] = set()
+
+    def classify(self, build_info: BuildInfo) -> str:
+        """Name of the class of the analysis, values of its keys joined by `/`."""
+        values = []
+        for key in self.keys:
+            if key == "pr_id":
+                values.append("push" if build_info.pr_id is None else "pr")
+            else:
+                values.append(getattr(build_info, key) or "")
+        return "/".join(values) or "default"
+
+    def _metric_label(self, name: str) -> str:
+        if name in self.weights or name in self.caps or name in self._labeled:
+            return name
+        if len(self._labeled) < METRIC_CLASSES:
+            self._labeled.add(name)
+            return name
+        return OTHER_METRIC_CLASS
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(cls.waiters) for cls in self._classes.values())
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        """Wait for a free slot for analysis of given class."""
+        await self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    async def acquire(self, name: str) -> None:
+        cls = self._classes.get(name)
+        if cls is None:
+            cls = self._classes[name] = SchedulingClass(
+                name,
+                self._metric_label(name),
+                self.weights.get(name, 1.0),
+                self.caps.get(name, self.concurrency),
+            )
+        start_tag = max(self._virtual_time, cls.finish_tag)
+        cls.finish_tag = start_tag + 1 / cls.weight
+        waiter = _Waiter(start_tag, asyncio.get_running_loop().create_future())
+        cls.waiters.append(waiter)
+        ANALYSES_WAITING.labels(cls.label).inc()
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted, but the waiting task was cancelled meanwhile
+                self.release(name)
+            else:
+                cls.waiters.remove(waiter)
+                ANALYSES_WAITING.labels(cls.label).dec()
+                self._forget_idle()
+            raise
+
+    def release(self, name: str) -> None:
+        cls = self._classes[name]
+        cls.running -= 1
+        self.running -= 1
+        self._dispatch()
+        self._forget_idle()
+
+    def _dispatch(self) -> None:
+        while self.running < self.concurrency:
+            eligible = [
+                cls
+                for cls in self._classes.values()
+                if cls.waiters and cls.running < cls.cap
+            ]
+            if not eligible:
+                return
+            cls = min(eligible, key=lambda cls: cls.waiters[0].tag)
+            waiter = cls.waiters.popleft()
+            self._virtual_time = waiter.tag
+            cls.running += 1
+            self.running += 1
+            waiter.future.set_result(None)
+            ANALYSES_WAITING.labels(cls.label).dec()
+            LD_QUEUE_WAIT_DURATION.labels(cls.label).observe(
+                time.monotonic() - waiter.enqueued
+            )
+
+    def _forget_idle(self) -> None:
+        """Drop idle classes which have no service ahead of others left,
+        or all idle classes once no analysis waits, so that classes
+        of past projects don't accumulate."""
+        backlogged = any(cls.waiters for cls in self._classes.values())
+        for cls in list(self._classes.values()):
+            if (
+                not cls.waiters
+                and not cls.running
+                and (not backlogged or cls.finish_tag <= self._virtual_time)
+            ):
+                del self._classes[cls.name]
+
+
+def parse_class_settings(settings: Optional[str], value_type: type) -> dict:
+    """Parse comma separated `class=value` pairs."""
+    parsed = {}
+    for setting in (settings or "").split(","):
+        if not setting.strip():
+            continue
+        name, _, value = setting.rpartition("=")
+        if not name:
+            raise ValueError(f"Invalid scheduling class setting: {setting!r}")
+        parsed[name.strip()] = value_type(value)
+    return parsed
@@ -0,0 +1,73 @@
+import enum
+import gzip
+import hashlib
+import json
+
+from logdetective_packit.decompression import ZSTD_STDLIB, zstd
+
+# Requests with more inline artifacts than this many characters are encoded
+# in a thread, so that the event loop isn't blocked
+THREAD_ENCODING_SIZE = 256 * 1024
+
+
+class RequestEncoding(str, enum.Enum):
+    """Compression of requests sent to Log Detective."""
+
+    identity = ""
+    gzip = "gzip"
+    zstd = "zstd"
+
+
+def request_encoding(value: str) -> RequestEncoding:
+    """Parse compression of requests, raise `ValueError` if it isn't available,
+    so that the worker doesn't start rather than failing every analysis."""
+    encoding = RequestEncoding(value)
+    if encoding == RequestEncoding.zstd and zstd is None:
+        raise ValueError(
+            "Zstd compression requires Python 3.14 or the zstandard package"
+        )
+    return encoding
+
+
+def encode_json(value) -> bytes:
+    """Encode value as compact JSON."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def compress(body: bytes, encoding: RequestEncoding) -> bytes:
+    if encoding == RequestEncoding.gzip:
+        # Fixed mtime keeps compressed body reproducible
+        return gzip.compress(body, compresslevel=5, mtime=0)
+    if encoding == RequestEncoding.zstd:
+        if zstd is None:
+            raise ValueError("Zstd compression requires the zstandard package")
+        if ZSTD_STDLIB:
+            return zstd.compress(body)
+        return zstd.ZstdCompressor().compress(body)
+    return body
+
+
+def encode_analysis_request(
+    analysis_request: dict, encoding: RequestEncoding
+) -> tuple[str, bytes]:
+    """Encode analysis request to Log Detective, only once for all its uses.
+
+    Files are encoded one by one and sent in their original order, the digest
+    is computed from them sorted, so that it identifies the request regardless
+    of order of the artifacts. Return the digest and the body, compressed with
+    given encoding."""
+    files = [encode_json(file) for file in analysis_request["files"]]
+    other_fields = encode_json(
+        {key: value for key, value in analysis_request.items() if key != "files"}
+    )
+    digest = hashlib.sha256(other_fields)
+    for file in sorted(files):
+        digest.update(hashlib.sha256(file).digest())
+
+    parts = [b'{"files":[']
+    for index, file in enumerate(files):
+        if index:
+            parts.append(b",")
+        parts.append(file)
+    parts.append(b"]}" if other_fields == b"{}" else b"]," + other_fields[1:])
+    return digest.hexdigest(), compress(b"".join(parts), encoding)
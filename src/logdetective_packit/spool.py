@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+from typing import Optional
+
+from logdetective_packit.models import BuildInfo
+from logdetective_packit.utils import is_url, pid_alive
+
+LOG = logging.getLogger("LogDetectivePackit")
+
+
+class ArtifactMissingError(Exception):
+    """Spooled artifact can't be read back, so Log Detective couldn't analyze it."""
+
+
+class ArtifactSpool:
+    """Keep inline artifacts of pending analyses on disk, instead of in memory.
+
+    Artifacts larger than `threshold` characters are always spooled, smaller ones
+    only if keeping them in memory would exceed `memory_budget` of the worker.
+    Spooled artifacts are read back only when the request to Log Detective is made.
+    Every worker uses its own subdirectory, those of dead workers are removed."""
+
+    def __init__(self, directory: str, threshold: int, memory_budget: int):
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.threshold = threshold
+        self.memory_budget = memory_budget
+        self.memory_bytes = 0
+        self.spooled_bytes = 0
+        self.spooled_files = 0
+        self._memory_usage: dict[str, int] = {}
+        # Size of spooled artifacts of every analysis, and their names
+        self._spooled_usage: dict[str, tuple[int, set[str]]] = {}
+        os.makedirs(self.directory, exist_ok=True)
+        for entry in os.listdir(directory):
+            if (
+                entry.isdigit()
+                and int(entry) != os.getpid()
+                and not pid_alive(int(entry))
+            ):
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+    def _path(self, log_detective_analysis_id: str, artifact_identity: str) -> str:
+        # Artifact names come from the client, don't use them as file names
+        name = hashlib.sha256(artifact_identity.encode()).hexdigest()
+        return os.path.join(self.directory, log_detective_analysis_id, name)
+
+    async def spool(
+        self, log_detective_analysis_id: str, build_info: BuildInfo
+    ) -> BuildInfo:
+        """Write inline artifacts to disk in a thread, returning build info without
+        their content. Spooled artifacts are left in place with empty content,
+        to keep their order."""
+        artifacts = {}
+        spooled = {}
+        memory_bytes = 0
+        for artifact_identity, artifact_content in build_info.artifacts.items():
+            size = len(artifact_content)
+            if is_url(artifact_content):
+                artifacts[artifact_identity] = artifact_content
+                continue
+            if (
+                size <= self.threshold
+                and self.memory_bytes + memory_bytes + size <= self.memory_budget
+            ):
+                artifacts[artifact_identity] = artifact_content
+                memory_bytes += size
+                continue
+            spooled[artifact_identity] = artifact_content
+            artifacts[artifact_identity] = ""
+
+        self.memory_bytes += memory_bytes
+        self._memory_usage[log_detective_analysis_id] = memory_bytes
+        if not spooled:
+            return build_info
+
+        try:
+            spooled_bytes = await asyncio.to_thread(
+                self._write, log_detective_analysis_id, spooled
+            )
+        except BaseException:
+            shutil.rmtree(
+                os.path.join(self.directory, log_detective_analysis_id),
+                ignore_errors=True,
+            )
+            self.release(log_detective_analysis_id)
+            raise
+        self.spooled_bytes += spooled_bytes
+        self.spooled_files += len(spooled)
+        self._spooled_usage[log_detective_analysis_id] = (spooled_bytes, set(spooled))
+        return build_info.model_copy(update={"artifacts": artifacts})
+
+    def _write(self, log_detective_analysis_id: str, artifacts: dict[str, str]) -> int:
+        """Write artifacts to disk, returning their size."""
+        size = 0
+        for artifact_identity, artifact_content in artifacts.items():
+            path = self._path(log_detective_analysis_id, artifact_identity)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as artifact_file:
+                artifact_file.write(artifact_content)
+            size += os.path.getsize(path)
+        return size
+
+    def is_spooled(
+        self, log_detective_analysis_id: str, artifact_identity: str
+    ) -> bool:
+        _, spooled = self._spooled_usage.get(log_detective_analysis_id, (0, set()))
+        return artifact_identity in spooled
+
+    def read(
+        self, log_detective_analysis_id: str, artifact_identity: str
+    ) -> Optional[str]:
+        """Return content of spooled artifact, or None if it wasn't spooled.
+        Raises `ArtifactMissingError` if the artifact can't be read back."""
+        if not self.is_spooled(log_detective_analysis_id, artifact_identity):
+            return None
+        try:
+            with open(
+                self._path(log_detective_analysis_id, artifact_identity),
+                encoding="utf-8",
+            ) as artifact_file:
+                return artifact_file.read()
+        except OSError as ex:
+            raise ArtifactMissingError(
+                f"Spooled artifact {artifact_identity} can't be read: {ex}"
+            ) from ex
+
+    def release(self, log_detective_analysis_id: str) -> None:
+        """Forget artifacts of finished analysis and remove them from disk."""
+        self.memory_bytes -= self._memory_usage.pop(log_detective_analysis_id, 0)
+        spooled_bytes, spooled = self._spooled_usage.pop(
+            log_detective_analysis_id, (0, set())
+        )
+        if not spooled:
+            return
+        self.spooled_bytes -= spooled_bytes
+        self.spooled_files -= len(spooled)
+        shutil.rmtree(
+            os.path.join(self.directory, log_detective_analysis_id), ignore_errors=True
+        )
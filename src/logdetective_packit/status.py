@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta, timezone
+import json
+import sqlite3
+import threading
+from typing import Optional
+
+from logdetective_packit.models import (
+    AnalysisStatus,
+    AnalysisStatusResponse,
+    BuildInfo,
+)
+from logdetective_packit.utils import open_sqlite
+
+# Number of stored analyses between removals of expired ones
+PRUNE_INTERVAL = 100
+
+
+class AnalysisStatusStore:
+    """State of recent analyses, indexed by ID and by build.
+
+    Analyses older than `retention` seconds are removed, and at most
+    `max_entries` most recent analyses are kept."""
+
+    def __init__(self, path: str, retention: int, max_entries: int):
+        self.retention = retention
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stored = 0
+        self._connection = open_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                analysis_id TEXT PRIMARY KEY,
+                target_build TEXT NOT NULL,
+                build_system TEXT NOT NULL,
+                status TEXT NOT NULL,
+                creation_time TEXT NOT NULL,
+                start_time TEXT,
+                finish_time TEXT,
+                log_detective_response TEXT,
+                error_msg TEXT
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS analyses_build "
+            "ON analyses (build_system, target_build, creation_time)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS analyses_creation_time "
+            "ON analyses (creation_time)"
+        )
+
+    def queued(
+        self,
+        log_detective_analysis_id: str,
+        log_detective_analysis_start: datetime,
+        build_info: BuildInfo,
+    ) -> None:
+        """Record accepted analysis."""
+        self.queued_many(
+            [(log_detective_analysis_id, log_detective_analysis_start, build_info)]
+        )
+
+    def queued_many(self, analyses: list[tuple[str, datetime, BuildInfo]]) -> None:
+        """Record accepted analyses in a single transaction."""
+        rows = [
+            (
+                log_detective_analysis_id,
+                build_info.target_build,
+                build_info.build_system,
+                AnalysisStatus.queued.value,
+                log_detective_analysis_start.isoformat(),
+            )
+            for log_detective_analysis_id, log_detective_analysis_start, build_info in analyses
+        ]
+        with self._lock:
+            try:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO analyses "
+                    "(analysis_id, target_build, build_system, status, creation_time) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+            previous = self._stored
+            self._stored += len(rows)
+            if self._stored // PRUNE_INTERVAL != previous // PRUNE_INTERVAL:
+                self._prune()
+
+    def running(self, log_detective_analysis_id: str) -> None:
+        """Record start of the request to Log Detective."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE analyses SET status = ?, start_time = ? "
+                "WHERE analysis_id = ? AND status = ?",
+                (
+                    AnalysisStatus.running.value,
+                    datetime.now(timezone.utc).isoformat(),
+                    log_detective_analysis_id,
+                    AnalysisStatus.queued.value,
+                ),
+            )
+
+    def finished(self, body: dict) -> None:
+        """Record result of analysis, from body of the published message."""
+        response = body.get("log_detective_response")
+        with self._lock:
+            self._connection.execute(
+                "UPDATE analyses SET status = ?, finish_time = ?, "
+                "log_detective_response = ?, error_msg = ? WHERE analysis_id = ?",
+                (
+                    AnalysisStatus(body["status"]).value,
+                    datetime.now(timezone.utc).isoformat(),
+                    None if response is None else json.dumps(response),
+                    body.get("error_msg"),
+                    body["log_detective_analysis_id"],
+                ),
+            )
+
+    def get(self, log_detective_analysis_id: str) -> Optional[AnalysisStatusResponse]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM analyses WHERE analysis_id = ?",
+                (log_detective_analysis_id,),
+            ).fetchone()
+        return None if row is None else self._to_response(row)
+
+    def find(
+        self, target_build: str, build_system: str, limit: int = 10
+    ) -> list[AnalysisStatusResponse]:
+        """Return analyses of given build, the most recent first."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM analyses WHERE build_system = ? AND target_build = ? "
+                "ORDER BY creation_time DESC LIMIT ?",
+                (build_system, target_build, limit),
+            ).fetchall()
+        return [self._to_response(row) for row in rows]
+
+    def _prune(self) -> None:
+        expired = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        self._connection.execute(
+            "DELETE FROM analyses WHERE creation_time < ?", (expired.isoformat(),)
+        )
+        self._connection.execute(
+            "DELETE FROM analyses WHERE analysis_id IN ("
+            "SELECT analysis_id FROM analyses "
+            "ORDER BY creation_time DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    @staticmethod
+    def _to_response(row: tuple) -> AnalysisStatusResponse:
+        (
+            analysis_id,
+            target_build,
+            build_system,
+            status,
+            creation_time,
+            start_time,
+            finish_time,
+            log_detective_response,
+            error_msg,
+        ) = row
+        return AnalysisStatusResponse(
+            log_detective_analysis_id=analysis_id,
+            status=status,
+            target_build=target_build,
+            build_system=build_system,
+            creation_time=creation_time,
+            start_time=start_time,
+            finish_time=finish_time,
+            log_detective_response=None
+            if log_detective_response is None
+            else json.loads(log_detective_response),
+            error_msg=error_msg,
+        )
@@ -1,3 +1,5 @@
+import os
+import sqlite3
 from urllib.parse import urlparse
 
 
@@ -7,3 +9,36 @@ def is_url(url):
         return all([result.scheme, result.netloc])
     except ValueError:
         return False
+
+
+def inline_artifacts_size(artifacts: dict[str, str]) -> int:
+    """Total length of artifacts submitted as content, rather than as URL."""
+    return sum(
+        len(artifact_content)
+        for artifact_content in artifacts.values()
+        if not is_url(artifact_content)
+    )
+
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    """Open SQLite database in WAL mode, shared by worker processes.
+    Transactions are managed explicitly by the caller."""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(
+        path, timeout=30, check_same_thread=False, isolation_level=None
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def pid_alive(pid: int) -> bool:
+    """Check whether process with given PID is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,121 @@
+from datetime import datetime
+import os
+import sqlite3
+import threading
+
+from logdetective_packit.models import BuildInfo
+from logdetective_packit.utils import open_sqlite, pid_alive
+
+
+class AnalysisQueue:
+    """Durable journal of accepted analyses, stored in SQLite database in WAL mode.
+
+    Analyses are written before `/analyze` responds and removed once they
+    are finished. Every entry is owned by the worker process which accepted it,
+    entries of workers which are no longer running are replayed on startup."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = open_sqlite(path)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                analysis_id TEXT PRIMARY KEY,
+                analysis_start TEXT NOT NULL,
+                build_info TEXT NOT NULL,
+                owner INTEGER NOT NULL
+            )"""
+        )
+
+    def put(
+        self,
+        log_detective_analysis_id: str,
+        log_detective_analysis_start: datetime,
+        build_info: BuildInfo,
+    ) -> None:
+        """Store accepted analysis, owned by the current process."""
+        self.put_many(
+            [(log_detective_analysis_id, log_detective_analysis_start, build_info)]
+        )
+
+    def put_many(self, analyses: list[tuple[str, datetime, BuildInfo]]) -> None:
+        """Store accepted analyses in a single transaction."""
+        pid = os.getpid()
+        rows = [
+            (
+                log_detective_analysis_id,
+                log_detective_analysis_start.isoformat(),
+                build_info.model_dump_json(),
+                pid,
+            )
+            for log_detective_analysis_id, log_detective_analysis_start, build_info in analyses
+        ]
+        with self._lock:
+            try:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?)", rows
+                )
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def remove(self, log_detective_analysis_id: str) -> None:
+        """Remove finished analysis from the queue."""
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM analyses WHERE analysis_id = ?",
+                (log_detective_analysis_id,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            count = self._connection.execute("SELECT COUNT(*) FROM analyses")
+            return count.fetchone()[0]
+
+    def claim_orphaned(
+        self, include_own: bool = True
+    ) -> list[tuple[str, datetime, BuildInfo]]:
+        """Take over analyses left behind by processes which are no longer running.
+
+        Entries owned by current process are claimed too when `include_own` is set,
+        on startup, since the process may have reused PID of a previous worker."""
+        pid = os.getpid()
+        with self._lock:
+            try:
+                self._connection.execute("BEGIN IMMEDIATE")
+                owners = [
+                    owner
+                    for (owner,) in self._connection.execute(
+                        "SELECT DISTINCT owner FROM analyses"
+                    )
+                    if (owner == pid and include_own)
+                    or (owner != pid and not pid_alive(owner))
+                ]
+                rows = []
+                for owner in owners:
+                    rows.extend(
+                        self._connection.execute(
+                            "SELECT analysis_id, analysis_start, build_info "
+                            "FROM analyses WHERE owner = ?",
+                            (owner,),
+                        ).fetchall()
+                    )
+                    self._connection.execute(
+                        "UPDATE analyses SET owner = ? WHERE owner = ?", (pid, owner)
+                    )
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        return [
+            (
+                analysis_id,
+                datetime.fromisoformat(analysis_start),
+                BuildInfo.model_validate_json(build_info),
+            )
+            for analysis_id, analysis_start, build_info in sorted(
+                rows, key=lambda row: row[1]
+            )
+        ]
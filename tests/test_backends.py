@@ -0,0 +1,93 @@
+import pytest
+from httpx import ConnectError, Request, Response
+
+from logdetective_packit.backends import (
+    BackendPool,
+    ConnectionTrace,
+    BalancingStrategy,
+    parse_backend_urls,
+)
+from logdetective_packit.retry import CircuitOpenError
+
+URLS = ["http://ld-1.example.com/analyze", "http://ld-2.example.com/analyze"]
+
+
+def test_parse_backend_urls():
+    assert parse_backend_urls(None) == []
+    assert parse_backend_urls(URLS[0]) == URLS[:1]
+    assert parse_backend_urls(f"{URLS[0]}, {URLS[1]}") == URLS
+
+
+def test_backend_pool_least_outstanding():
+    pool = BackendPool(URLS)
+    pool.backends[0].outstanding = 3
+    pool.backends[1].outstanding = 1
+
+    assert pool.select().url == URLS[1]
+
+
+def test_backend_pool_ewma():
+    pool = BackendPool(URLS, strategy=BalancingStrategy.ewma)
+    pool.backends[0].observe_latency(10.0)
+    pool.backends[1].observe_latency(2.0)
+    pool.backends[1].outstanding = 2
+
+    # 10 * 1 for the first backend is more than 2 * 3 for the second one
+    assert pool.select().url == URLS[1]
+
+
+@pytest.mark.asyncio
+async def test_backend_pool_ejects_failing_backend(mocker):
+    """Failing backend is skipped, until health check finds it recovered."""
+    pool = BackendPool(URLS, failure_threshold=1, reset_timeout=60)
+    http_client = mocker.AsyncMock()
+    http_client.post.side_effect = ConnectError("Connection refused")
+
+    backend = pool.select()
+    with pytest.raises(ConnectError):
+        await backend.post(http_client, json={})
+    assert backend.failures == 1
+    assert backend.outstanding == 0
+
+    other_backend = pool.select()
+    assert other_backend is not backend
+
+    other_backend.breaker.record_failure(ConnectError("Connection refused"))
+    with pytest.raises(CircuitOpenError):
+        pool.select()
+
+    http_client.get.return_value = Response(
+        200, request=Request("GET", "http://ld-1.example.com/")
+    )
+    await pool.check_health(http_client, "/")
+    assert {pool.select().url, pool.select().url} <= set(URLS)
+    assert all(backend.breaker.failures == 0 for backend in pool.backends)
+
+
+@pytest.mark.asyncio
+async def test_connection_trace(mocker):
+    """Waiting for the pool is told apart from opening the connection."""
+    now = mocker.patch("logdetective_packit.backends.time.monotonic", return_value=10.0)
+    trace = ConnectionTrace()
+
+    now.return_value = 12.0
+    await trace("connection.connect_tcp.started", {})
+    now.return_value = 12.5
+    await trace("connection.start_tls.complete", {})
+    await trace("http11.send_request_headers.started", {})
+
+    assert trace.pool_wait == 2.0
+    assert trace.connect == 0.5
+
+
+@pytest.mark.asyncio
+async def test_backend_pool_prewarm(mocker):
+    """Connections are opened to every backend, failures don't eject it."""
+    pool = BackendPool(URLS, failure_threshold=1)
+    http_client = mocker.AsyncMock()
+    http_client.get.side_effect = ConnectError("Connection refused")
+
+    await pool.prewarm(http_client, "/", connections=2, timeout=1)
+
+    assert http_client.get.call_count == 4
+    assert pool.select() is not None
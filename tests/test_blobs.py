@@ -0,0 +1,41 @@
+import gzip
+import os
+
+from logdetective_packit.blobs import BlobStore
+
+
+def test_blob_store_put_and_get(tmp_path):
+    """Blobs are stored compressed, once per content."""
+    store = BlobStore(str(tmp_path / "results"), retention=3600)
+
+    digest = store.put(b'{"explanation": "Missing dependency"}')
+
+    assert store.put(b'{"explanation": "Missing dependency"}') == digest
+    assert (
+        gzip.decompress(store.get(digest)) == b'{"explanation": "Missing dependency"}'
+    )
+    assert store.get("0" * 64) is None
+    assert store.get("../../etc/passwd") is None
+
+
+def test_blob_store_prune(tmp_path):
+    """Blobs not stored again within the retention are removed."""
+    store = BlobStore(str(tmp_path / "results"), retention=3600)
+    expired = store.put(b"old")
+    fresh = store.put(b"new")
+    os.utime(store._path(expired), (0, 0))
+
+    store.prune()
+
+    assert store.get(expired) is None
+    assert store.get(fresh) is not None
+
+
+def test_blob_store_pruned_meanwhile(tmp_path, mocker):
+    """Blob removed by another worker as it is stored again is written anew."""
+    store = BlobStore(str(tmp_path / "results"), retention=3600)
+    digest = store.put(b"response")
+    mocker.patch("logdetective_packit.blobs.os.utime", side_effect=FileNotFoundError)
+
+    assert store.put(b"response") == digest
+    assert gzip.decompress(store.get(digest)) == b"response"
@@ -0,0 +1,58 @@
+import pytest
+
+from logdetective_packit.cache import (
+    DiskResultCache,
+    MemoryResultCache,
+    create_result_cache,
+)
+
+
+@pytest.fixture(params=["memory", "disk"])
+def result_cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryResultCache(ttl=60, max_size=2)
+    return DiskResultCache(str(tmp_path / "cache.sqlite"), ttl=60, max_size=2)
+
+
+def test_result_cache_hits_and_misses(result_cache):
+    assert result_cache.get("first") is None
+    result_cache.set("first", {"explanation": "first"})
+    assert result_cache.get("first") == {"explanation": "first"}
+
+    assert result_cache.hits == 1
+    assert result_cache.misses == 1
+
+
+def test_result_cache_evicts_least_recently_used(result_cache, mocker):
+    time = mocker.patch("logdetective_packit.cache.time.time", return_value=1000.0)
+    result_cache.set("first", {"explanation": "first"})
+    time.return_value = 1001.0
+    result_cache.set("second", {"explanation": "second"})
+    time.return_value = 1002.0
+    # Access makes "first" more recent than "second"
+    result_cache.get("first")
+    time.return_value = 1003.0
+    result_cache.set("third", {"explanation": "third"})
+
+    assert len(result_cache) == 2
+    assert result_cache.get("second") is None
+    assert result_cache.get("first") is not None
+    assert result_cache.get("third") is not None
+
+
+def test_result_cache_expires(result_cache, mocker):
+    time = mocker.patch("logdetective_packit.cache.time.time", return_value=1000.0)
+    result_cache.set("first", {"explanation": "first"})
+
+    time.return_value = 1061.0
+    assert result_cache.get("first") is None
+
+
+def test_create_result_cache():
+    assert create_result_cache("", "", 60, 10) is None
+    assert isinstance(create_result_cache("memory", "", 60, 10), MemoryResultCache)
+
+    with pytest.raises(ValueError):
+        create_result_cache("disk", "", 60, 10)
+    with pytest.raises(ValueError):
+        create_result_cache("redis", "", 60, 10)
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from logdetective_packit.coalescing import RequestCoalescer
+
+
+@pytest.mark.asyncio
+async def test_request_coalescer_shares_result():
+    """Concurrent calls with the same key are performed only once."""
+    coalescer = RequestCoalescer()
+    calls = []
+    release = asyncio.Event()
+
+    async def call():
+        calls.append(None)
+        await release.wait()
+        return {"explanation": "shared"}
+
+    waiters = [asyncio.ensure_future(coalescer.run("same", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert "same" in coalescer
+    release.set()
+
+    assert await asyncio.gather(*waiters) == [{"explanation": "shared"}] * 3
+    assert len(calls) == 1
+    assert len(coalescer) == 0
+
+
+@pytest.mark.asyncio
+async def test_request_coalescer_shares_exception():
+    """Exception of the shared call is raised to every caller."""
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+
+    async def call():
+        await release.wait()
+        raise ConnectionError("Log Detective is down")
+
+    waiters = [asyncio.ensure_future(coalescer.run("same", call)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(coalescer) == 0
+
+
+@pytest.mark.asyncio
+async def test_request_coalescer_notifies_start():
+    """Callers are notified once the shared call starts, also when they join later."""
+    coalescer = RequestCoalescer()
+    started = []
+    release = asyncio.Event()
+
+    async def call():
+        await asyncio.sleep(0)
+        coalescer.started("same")
+        await release.wait()
+        return "done"
+
+    first = asyncio.ensure_future(
+        coalescer.run("same", call, on_start=lambda: started.append("first"))
+    )
+    await asyncio.sleep(0)
+    assert started == []
+    await asyncio.sleep(0)
+    assert started == ["first"]
+
+    second = asyncio.ensure_future(
+        coalescer.run("same", call, on_start=lambda: started.append("second"))
+    )
+    await asyncio.sleep(0)
+    assert started == ["first", "second"]
+
+    release.set()
+    assert await asyncio.gather(first, second) == ["done", "done"]
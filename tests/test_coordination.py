@@ -0,0 +1,84 @@
+import os
+from datetime import datetime
+
+from logdetective_packit.coordination import SharedState
+from logdetective_packit.models import Response
+
+START = datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00")
+
+
+def test_shared_state_global_limit(tmp_path):
+    """Limit applies to analyses admitted by all workers together."""
+    path = str(tmp_path / "shared.sqlite")
+    first_worker = SharedState(path)
+    second_worker = SharedState(path)
+
+    assert first_worker.admit(["first", "second"], limit=3)
+    assert not second_worker.admit(["third", "fourth"], limit=3)
+    assert second_worker.admit(["third"], limit=3)
+    assert len(first_worker) == 3
+
+    first_worker.release("first")
+    assert len(second_worker) == 2
+
+
+def test_shared_state_drops_dead_workers(tmp_path, mocker):
+    """Analyses of workers which are no longer running don't count."""
+    worker_pid = os.getpid()
+    path = str(tmp_path / "shared.sqlite")
+
+    mocker.patch("logdetective_packit.coordination.os.getpid", return_value=1001)
+    SharedState(path).admit(["dead"])
+    mocker.patch("logdetective_packit.coordination.os.getpid", return_value=worker_pid)
+    mocker.patch(
+        "logdetective_packit.coordination.pid_alive",
+        side_effect=lambda pid: pid == worker_pid,
+    )
+
+    shared_state = SharedState(path)
+    assert shared_state.admit(["alive"], limit=1)
+    assert len(shared_state) == 1
+
+
+def test_shared_state_idempotency_key(tmp_path):
+    """Idempotency key belongs to the first analysis, until it is finished."""
+    path = str(tmp_path / "shared.sqlite")
+    first_worker = SharedState(path)
+    second_worker = SharedState(path)
+    first = Response(log_detective_analysis_id="first", creation_time=START)
+    second = Response(log_detective_analysis_id="second", creation_time=START)
+
+    first_worker.admit(["first"])
+    second_worker.admit(["second"])
+    assert first_worker.claim_idempotency_key("key", first) == first
+    assert second_worker.claim_idempotency_key("key", second) == first
+    assert second_worker.find_idempotency_key("key") == first
+
+    first_worker.release("first")
+    assert second_worker.find_idempotency_key("key") is None
+
+
+def test_shared_state_request_claim(tmp_path, mocker):
+    """Request is claimed by a single worker, until it is released or the worker dies."""
+    worker_pid = os.getpid()
+    path = str(tmp_path / "shared.sqlite")
+    alive = {1001, worker_pid}
+    mocker.patch(
+        "logdetective_packit.coordination.pid_alive", side_effect=alive.__contains__
+    )
+
+    mocker.patch("logdetective_packit.coordination.os.getpid", return_value=1001)
+    other_worker = SharedState(path)
+    assert other_worker.claim_request("request")
+    mocker.patch("logdetective_packit.coordination.os.getpid", return_value=worker_pid)
+    shared_state = SharedState(path)
+
+    assert not shared_state.claim_request("request")
+    # Only the owner releases the claim
+    shared_state.release_request("request")
+    assert not shared_state.claim_request("request")
+
+    alive.remove(1001)
+    assert shared_state.claim_request("request")
+    shared_state.release_request("request")
+    assert shared_state.claim_request("request")
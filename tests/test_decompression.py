@@ -0,0 +1,136 @@
+import gzip
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.responses import PlainTextResponse
+
+from logdetective_packit.decompression import (
+    ZSTD_BLOCK_SIZE_MAX,
+    RequestDecompressionMiddleware,
+    ZstdDecoder,
+)
+
+from tests.utils import (
+    MINIMAL_BUILD_INFO,
+    mock_create_task_call,
+    mock_env_vars,
+    mock_external_calls,
+)
+
+HEADERS = {"Authorization": "Bearer secret-123", "Content-Type": "application/json"}
+INLINE_BUILD_INFO = dict(
+    MINIMAL_BUILD_INFO, artifacts={"builder-live.log": "error: " * 10000}
+)
+
+
+async def post_analyze(body: bytes, headers: dict):
+    from logdetective_packit.main import app
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        return await client.post("/analyze", content=body, headers=headers)
+
+
+@pytest.fixture
+def secret_token(monkeypatch):
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+
+
+@pytest.mark.asyncio
+async def test_analyze_gzip_body(
+    secret_token, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    body = gzip.compress(json.dumps(INLINE_BUILD_INFO).encode())
+    response = await post_analyze(body, HEADERS | {"Content-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    await mock_create_task_call["task_catcher"].created_task
+    files = json.loads(
+        mock_external_calls["mock_async_client"].post.call_args.kwargs["content"]
+    )
+    assert (
+        files["files"][0]["content"]
+        == INLINE_BUILD_INFO["artifacts"]["builder-live.log"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_analyze_zstd_body(
+    secret_token, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    zstd = pytest.importorskip("zstandard")
+    body = zstd.ZstdCompressor().compress(json.dumps(INLINE_BUILD_INFO).encode())
+    response = await post_analyze(body, HEADERS | {"Content-Encoding": "zstd"})
+
+    assert response.status_code == 200
+
+
+async def chunks(body: bytes):
+    """Stream body in chunks, so that it is sent without `Content-Length`."""
+    for start in range(0, len(body), 100):
+        yield body[start : start + 100]
+
+
+@pytest.mark.asyncio
+async def test_body_too_large():
+    """Bodies exceeding the limit after decompression are rejected."""
+
+    async def echo_app(scope, receive, send):
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            size += len(message["body"])
+            more_body = message["more_body"]
+        await PlainTextResponse(str(size))(scope, receive, send)
+
+    middleware = RequestDecompressionMiddleware(echo_app, max_size=1000)
+    body = json.dumps(INLINE_BUILD_INFO).encode()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=middleware), base_url="http://test"
+    ) as client:
+        compressed = await client.post(
+            "/", content=gzip.compress(body), headers={"Content-Encoding": "gzip"}
+        )
+        plain = await client.post("/", content=body)
+        chunked = await client.post("/", content=chunks(body))
+        small = await client.post(
+            "/",
+            content=gzip.compress(body[:1000]),
+            headers={"Content-Encoding": "gzip"},
+        )
+
+    assert len(gzip.compress(body)) < 1000
+    assert compressed.status_code == plain.status_code == chunked.status_code == 413
+    assert small.status_code == 200
+    assert small.text == "1000"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "encoding, body, status_code",
+    [("br", b"whatever", 415), ("gzip", b"not gzip", 400), ("gzip", b"\x1f\x8b", 400)],
+)
+async def test_analyze_invalid_encoding(
+    secret_token, mock_env_vars, mock_external_calls, encoding, body, status_code
+):
+    response = await post_analyze(body, HEADERS | {"Content-Encoding": encoding})
+
+    assert response.status_code == status_code
+    mock_external_calls["mock_async_client"].post.assert_not_called()
+
+
+def test_zstd_decoder_bounds_output():
+    """Output of each chunk is bounded even for highly compressed zstd content."""
+    zstandard = pytest.importorskip("zstandard")
+    decoder = ZstdDecoder()
+    decompressed = b"x" * 100 * 1024**2
+    bomb = zstandard.ZstdCompressor().compress(decompressed)
+
+    output = decoder.decompress(bomb, max_length=1024**2)
+
+    assert 1024**2 <= len(output) <= 1024**2 + ZSTD_BLOCK_SIZE_MAX
+    assert decompressed.startswith(output)
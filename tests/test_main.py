@@ -1,4 +1,12 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
 import pytest
+import uvicorn
 
 from datetime import datetime
 from fedora_messaging.api import Message
@@ -8,7 +16,7 @@ from fedora_messaging.exceptions import (
     PublishTimeout,
     PublishReturned,
 )
-from httpx import HTTPStatusError, AsyncClient, ASGITransport
+from httpx import HTTPStatusError, AsyncClient, ASGITransport, ConnectError, Request
 from logdetective_packit_message import LogDetectiveResult, LogDetectiveMessage
 
 from logdetective_packit.models import BuildInfo
@@ -23,6 +31,7 @@ from logdetective_packit.utils import is_url
 
 from tests.utils import (
     MINIMAL_BUILD_INFO,
+    MULTIARTIFACT_BUILD_INFO,
     DUMMY_MESSAGE_BODY,
     mock_env_vars,
     mock_external_calls,
@@ -158,6 +167,40 @@ async def test_call_log_detective_request_exception(
         mock_external_calls["mock_async_client"].post.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_call_log_detective_failed_server(
+    monkeypatch, mock_env_vars, mock_external_calls
+):
+    """Error message names the server the failed request was sent to."""
+    from logdetective_packit.backends import BackendPool
+
+    monkeypatch.setattr("logdetective_packit.main.LD_URL", "http://ld-1,http://ld-2")
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_RETRIES", 0)
+    monkeypatch.setattr(
+        "logdetective_packit.main.log_detective_backends",
+        BackendPool(["http://ld-1", "http://ld-2"]),
+    )
+
+    async def refused_post(url, **kwargs):
+        raise ConnectError("Connection refused", request=Request("POST", url))
+
+    mock_external_calls["mock_async_client"].post.side_effect = refused_post
+
+    with pytest.raises(ConnectError):
+        await call_log_detective(
+            build_info=BuildInfo(**MINIMAL_BUILD_INFO),
+            log_detective_analysis_id="analysis-1",
+            log_detective_analysis_start=datetime.fromisoformat(
+                "2025-12-10 10:57:57.341695+00:00"
+            ),
+        )
+
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["error_msg"] == (
+        "Request to Log Detective API at http://ld-1 failed with Connection refused"
+    )
+
+
 @pytest.mark.asyncio
 async def test_analyze_build_skeleton(
     monkeypatch, mocker, mock_env_vars, mock_external_calls, mock_create_task_call
@@ -170,6 +213,7 @@ async def test_analyze_build_skeleton(
     # Mock the return value of requests.post().json()
     mock_response = mocker.Mock()
     mock_response.json.return_value = {"status": "analysis_started", "id": "fake-id"}
+    mock_response.content = b'{"status": "analysis_started", "id": "fake-id"}'
     mock_response.raise_for_status = mocker.Mock()
     mock_external_calls["mock_async_client"].post.return_value = mock_response
 
@@ -200,7 +244,10 @@ async def test_analyze_build_skeleton(
     await mock_create_task_call["task_catcher"].created_task
 
     # Check that requests.post was called correctly
-    expected_headers = {"Authorization": "Bearer test-token-123"}
+    expected_headers = {
+        "Authorization": "Bearer test-token-123",
+        "Content-Type": "application/json",
+    }
     # The code only takes the first log URL
     expected_data = {
         "files": [
@@ -214,9 +261,12 @@ async def test_analyze_build_skeleton(
     mock_is_url.assert_called_once_with("http://example.com/builder-live.log")
     mock_external_calls["mock_async_client"].post.assert_called_once_with(
         url="http://mock-ld-server.com/api",
-        json=expected_data,
+        extensions={"trace": mocker.ANY},
+        content=mocker.ANY,
         headers=expected_headers,
     )
+    post_kwargs = mock_external_calls["mock_async_client"].post.call_args.kwargs
+    assert json.loads(post_kwargs["content"]) == expected_data
 
     # Check that fedora-messaging.api.publish was called
     mock_external_calls["mock_publish"].assert_called_once()
@@ -250,3 +300,832 @@ async def test_analyze_build_skeleton_no_token(
 
     # Check that fedora-messaging.api.publish was not called
     mock_external_calls["mock_publish"].assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_analyze_build_invalid(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Invalid submission is rejected, after its validation is timed."""
+    from logdetective_packit.main import app
+    from logdetective_packit.metrics import STAGE_DURATION
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    validations = STAGE_DURATION.labels("validation")._sum.get()
+    payload = dict(MINIMAL_BUILD_INFO)
+    del payload["target_build"]
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/analyze", json=payload, headers={"Authorization": "Bearer secret-123"}
+        )
+
+    assert response.status_code == 422
+    [error] = response.json()["detail"]
+    assert error["loc"] == ["body", "target_build"]
+    assert STAGE_DURATION.labels("validation")._sum.get() > validations
+    assert mock_create_task_call["task_catcher"].created_task is None
+
+
+def test_openapi_build_info_schema():
+    """Schema of submitted builds is documented, although endpoints validate them."""
+    from logdetective_packit.main import app
+
+    schema = app.openapi()
+
+    request_body = schema["paths"]["/analyze"]["post"]["requestBody"]
+    body_schema = request_body["content"]["application/json"]["schema"]
+    assert body_schema["$ref"] == "#/components/schemas/BuildInfo"
+    request_body = schema["paths"]["/analyze/batch"]["post"]["requestBody"]
+    items_schema = request_body["content"]["application/json"]["schema"]["items"]
+    assert items_schema["$ref"] == "#/components/schemas/BuildInfo"
+    build_info = schema["components"]["schemas"]["BuildInfo"]
+    assert "target_build" in build_info["required"]
+    assert "BuildMetadata" in schema["components"]["schemas"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_build_queue_full(
+    monkeypatch, mocker, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Submissions are rejected with 503 and `Retry-After`, when the queue is full."""
+    from logdetective_packit.main import app
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_CONCURRENT_CALLS", 1)
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_QUEUED_CALLS", 1)
+    monkeypatch.setattr("logdetective_packit.main.LD_RETRY_AFTER", 42)
+    monkeypatch.setattr(
+        "logdetective_packit.main._log_detective_call_tasks",
+        {mocker.Mock(), mocker.Mock()},
+    )
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/analyze",
+            json=MINIMAL_BUILD_INFO,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "42"
+    assert mock_create_task_call["task_catcher"].created_task is None
+    mock_external_calls["mock_async_client"].post.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_analyze_build_idempotency_key(
+    monkeypatch, mocker, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Redelivered submission with the same `Idempotency-Key` receives the original ID."""
+    from logdetective_packit.main import app
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    headers = {
+        "Authorization": "Bearer secret-123",
+        "Idempotency-Key": "copr-12345-attempt",
+    }
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        first = await client.post("/analyze", json=MINIMAL_BUILD_INFO, headers=headers)
+        second = await client.post("/analyze", json=MINIMAL_BUILD_INFO, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    mock_create_task_call["mock_create_task"].assert_called_once()
+
+    await mock_create_task_call["task_catcher"].created_task
+    mock_external_calls["mock_async_client"].post.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_call_log_detective_cached(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_server_logger
+):
+    """Repeated analysis of identical artifacts is served from the result cache."""
+    from logdetective_packit.cache import MemoryResultCache
+
+    result_cache = MemoryResultCache(ttl=60, max_size=10)
+    monkeypatch.setattr("logdetective_packit.main.result_cache", result_cache)
+    build_info = BuildInfo(**MINIMAL_BUILD_INFO)
+    start = datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00")
+
+    await call_log_detective(build_info, "first-analysis", start)
+    await call_log_detective(build_info, "second-analysis", start)
+
+    mock_external_calls["mock_async_client"].post.assert_called_once()
+    assert mock_external_calls["mock_publish"].call_count == 2
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["status"] == LogDetectiveResult.complete
+    assert message.body["log_detective_analysis_id"] == "second-analysis"
+    assert message.body["log_detective_response"] == {"status": "success"}
+    assert result_cache.hits == 1
+    assert result_cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_call_log_detective_shared_request(
+    tmp_path,
+    mocker,
+    monkeypatch,
+    mock_env_vars,
+    mock_external_calls,
+    mock_server_logger,
+):
+    """Identical request in progress in another worker isn't repeated,
+    its response is taken from the shared cache once it is stored."""
+    from logdetective_packit.cache import DiskResultCache
+    from logdetective_packit.coordination import SharedState
+
+    result_cache = DiskResultCache(str(tmp_path / "cache.sqlite"), ttl=60, max_size=10)
+    shared_state = SharedState(str(tmp_path / "shared.sqlite"))
+    monkeypatch.setattr("logdetective_packit.main.result_cache", result_cache)
+    monkeypatch.setattr("logdetective_packit.main.shared_state", shared_state)
+    monkeypatch.setattr("logdetective_packit.main.SHARED_REQUEST_POLL_INTERVAL", 0.01)
+    claim_request = mocker.patch.object(
+        shared_state, "claim_request", return_value=False
+    )
+
+    analysis = asyncio.ensure_future(
+        call_log_detective(
+            BuildInfo(**MINIMAL_BUILD_INFO), "waiting-analysis", datetime.now()
+        )
+    )
+    await asyncio.sleep(0.05)
+    assert not analysis.done()
+    [request_key] = {call.args[0] for call in claim_request.call_args_list}
+    result_cache.set(request_key, {"explanation": "From another worker"})
+    await analysis
+
+    mock_external_calls["mock_async_client"].post.assert_not_called()
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["log_detective_response"] == {
+        "explanation": "From another worker"
+    }
+
+
+@pytest.mark.asyncio
+async def test_call_log_detective_invalid_response(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_server_logger
+):
+    """Response which doesn't make a valid message is reported as failed analysis."""
+    import jsonschema
+    from logdetective_packit.cache import MemoryResultCache
+
+    result_cache = MemoryResultCache(ttl=60, max_size=10)
+    monkeypatch.setattr("logdetective_packit.main.result_cache", result_cache)
+    mock_external_calls["mock_async_client"].post.return_value.json.return_value = [
+        "not",
+        "object",
+    ]
+    build_info = BuildInfo(**MINIMAL_BUILD_INFO)
+
+    with pytest.raises(jsonschema.ValidationError):
+        await call_log_detective(build_info, "invalid-analysis", datetime.now())
+
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["status"] == LogDetectiveResult.error
+    assert "Response from Log Detective API is invalid" in message.body["error_msg"]
+    # Invalid response isn't served to other analyses
+    assert len(result_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_call_log_detective_retry(
+    monkeypatch, mocker, mock_env_vars, mock_external_calls, mock_server_logger
+):
+    """Transient failures of Log Detective API are retried."""
+    from httpx import Request, Response
+
+    request = Request("POST", "http://mock-ld-server.com/api")
+    unavailable = Response(503, request=request)
+    available = Response(200, json={"explanation": "ok"}, request=request)
+    mock_external_calls["mock_async_client"].post.side_effect = [
+        unavailable,
+        unavailable,
+        available,
+    ]
+    mock_sleep = mocker.patch("logdetective_packit.main.asyncio.sleep")
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_RETRIES", 2)
+
+    await call_log_detective(
+        BuildInfo(**MINIMAL_BUILD_INFO),
+        "8052517e-cf69-11f0-9b27-9a478821d0e2",
+        datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00"),
+    )
+
+    assert mock_external_calls["mock_async_client"].post.call_count == 3
+    assert mock_sleep.call_count == 2
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["status"] == LogDetectiveResult.complete
+    assert message.body["log_detective_response"] == {"explanation": "ok"}
+
+
+@pytest.mark.asyncio
+async def test_analysis_status_lookup(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """State and result of the analysis can be looked up by ID and by build."""
+    from logdetective_packit.main import app
+    from logdetective_packit.status import AnalysisStatusStore
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr(
+        "logdetective_packit.main.status_store",
+        AnalysisStatusStore(":memory:", retention=3600, max_entries=100),
+    )
+    headers = {"Authorization": "Bearer secret-123"}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        submitted = await client.post(
+            "/analyze", json=MINIMAL_BUILD_INFO, headers=headers
+        )
+        analysis_id = submitted.json()["log_detective_analysis_id"]
+
+        queued = await client.get(f"/analyze/{analysis_id}", headers=headers)
+        assert queued.json()["status"] == "queued"
+
+        await mock_create_task_call["task_catcher"].created_task
+        complete = await client.get(f"/analyze/{analysis_id}", headers=headers)
+        found = await client.get(
+            "/analyze",
+            params={"target_build": "12345", "build_system": "copr"},
+            headers=headers,
+        )
+        missing = await client.get("/analyze/unknown", headers=headers)
+        unauthorized = await client.get(
+            f"/analyze/{analysis_id}", headers={"Authorization": "Bearer wrong"}
+        )
+
+    assert complete.status_code == 200
+    assert complete.json()["status"] == "complete"
+    assert complete.json()["log_detective_response"] == {"status": "success"}
+    assert complete.json()["start_time"] is not None
+    assert [analysis["log_detective_analysis_id"] for analysis in found.json()] == [
+        analysis_id
+    ]
+    assert missing.status_code == 404
+    assert unauthorized.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_analyze_batch(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Valid items of the batch are accepted, invalid ones report their errors."""
+    from logdetective_packit.main import app, _log_detective_call_tasks
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/analyze/batch",
+            json=[
+                MINIMAL_BUILD_INFO,
+                {"target_build": "12345"},
+                MULTIARTIFACT_BUILD_INFO,
+            ],
+            headers={"Authorization": "Bearer secret-123"},
+        )
+
+    assert response.status_code == 200
+    first, invalid, last = response.json()
+    assert first["log_detective_analysis_id"] is not None
+    assert last["log_detective_analysis_id"] is not None
+    assert first["errors"] is None
+    assert invalid["log_detective_analysis_id"] is None
+    assert {error["loc"][0] for error in invalid["errors"]} == {
+        "artifacts",
+        "build_system",
+    }
+    # Submitted data isn't echoed back
+    assert all("input" not in error for error in invalid["errors"])
+
+    assert mock_create_task_call["mock_create_task"].call_count == 2
+    await asyncio.gather(*_log_detective_call_tasks)
+    assert mock_external_calls["mock_publish"].call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_analyze_batch_over_capacity(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Batch which doesn't fit into the queue now is rejected as a whole,
+    batch which never could is rejected as too large."""
+    from logdetective_packit.main import app
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_CONCURRENT_CALLS", 1)
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_QUEUED_CALLS", 2)
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_BATCH_SIZE", 10)
+    monkeypatch.setattr(
+        "logdetective_packit.main._log_detective_call_tasks", {"pending-task"}
+    )
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        busy = await client.post(
+            "/analyze/batch",
+            json=[MINIMAL_BUILD_INFO] * 3,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+        too_large = await client.post(
+            "/analyze/batch",
+            json=[MINIMAL_BUILD_INFO] * 4,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+
+    assert busy.status_code == 503
+    assert "Retry-After" in busy.headers
+    assert too_large.status_code == 413
+    assert "Retry-After" not in too_large.headers
+    mock_create_task_call["mock_create_task"].assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_analyze_build_rate_limited(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Submissions over the rate limit are rejected with 429 and Retry-After."""
+    from logdetective_packit.main import app
+    from logdetective_packit.rate_limit import RateLimiter, RateLimitKey
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr(
+        "logdetective_packit.main.rate_limiter",
+        RateLimiter(":memory:", RateLimitKey.build_system, 0.1, 1),
+    )
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        responses = [
+            await client.post(
+                "/analyze",
+                json=MINIMAL_BUILD_INFO,
+                headers={"Authorization": "Bearer secret-123"},
+            )
+            for _ in range(2)
+        ]
+
+    assert responses[0].status_code == 200
+    assert responses[1].status_code == 429
+    assert 9 <= int(responses[1].headers["Retry-After"]) <= 10
+    assert mock_create_task_call["mock_create_task"].call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_analyze_build_global_limit(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Analyses pending in other workers count towards the global limit.
+    Rejected submissions aren't charged to the rate limit."""
+    from logdetective_packit.main import app
+    from logdetective_packit.coordination import SharedState
+    from logdetective_packit.rate_limit import RateLimiter, RateLimitKey
+
+    shared_state = SharedState(":memory:")
+    shared_state.admit(["pending-in-another-worker"])
+    rate_limiter = RateLimiter(":memory:", RateLimitKey.build_system, 0.001, 1)
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.LD_MAX_PENDING_ANALYSES", 1)
+    monkeypatch.setattr("logdetective_packit.main.shared_state", shared_state)
+    monkeypatch.setattr("logdetective_packit.main.rate_limiter", rate_limiter)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/analyze",
+            json=MINIMAL_BUILD_INFO,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    mock_create_task_call["mock_create_task"].assert_not_called()
+    assert rate_limiter.acquire({"copr": 1}) == 0
+
+
+@pytest.mark.asyncio
+async def test_drain(monkeypatch, mock_env_vars, mock_external_calls):
+    """Terminated worker refuses analyses while it still serves requests,
+    and interrupts those not finished in time."""
+    from logdetective_packit import main
+    from logdetective_packit.outbox import Outbox
+    from logdetective_packit.publisher import MessagePublisher
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.LD_DRAIN_DELAY", 0.5)
+    monkeypatch.setattr("logdetective_packit.main.LD_DRAIN_TIMEOUT", 0.5)
+    monkeypatch.setattr("logdetective_packit.main.LD_PREWARM_CONNECTIONS", 0)
+    monkeypatch.setattr("logdetective_packit.main.LD_HEALTH_CHECK_INTERVAL", 0)
+    monkeypatch.setattr("logdetective_packit.main.draining", False)
+    monkeypatch.setattr("logdetective_packit.main._drain_task", None)
+    monkeypatch.setattr("logdetective_packit.main.analysis_queue", None)
+    monkeypatch.setattr("logdetective_packit.main.result_outbox", Outbox(":memory:"))
+    monkeypatch.setattr("logdetective_packit.main.publisher", MessagePublisher(1))
+
+    async def hanging_post(**kwargs):
+        await asyncio.Event().wait()
+
+    mock_external_calls["mock_async_client"].post.side_effect = hanging_post
+    headers = {"Authorization": "Bearer secret-123"}
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning"))
+    # Server raises the signal again once it has shut down
+    previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: None)
+    try:
+        serving = asyncio.ensure_future(server.serve(sockets=[listener]))
+        while not server.started:
+            await asyncio.sleep(0.01)
+        async with AsyncClient(
+            base_url=f"http://127.0.0.1:{listener.getsockname()[1]}"
+        ) as client:
+            assert (await client.get("/health/ready")).status_code == 200
+            accepted = await client.post(
+                "/analyze", json=MINIMAL_BUILD_INFO, headers=headers
+            )
+            pending = set(main._log_detective_call_tasks)
+
+            os.kill(os.getpid(), signal.SIGTERM)
+            await asyncio.sleep(0.1)
+
+            ready = await client.get("/health/ready")
+            refused = await client.post(
+                "/analyze", json=MINIMAL_BUILD_INFO, headers=headers
+            )
+        await asyncio.wait_for(serving, 5)
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+
+    assert accepted.status_code == 200
+    assert ready.status_code == 503
+    assert ready.json() == {"status": "draining"}
+    assert refused.status_code == 503
+    assert pending and all(task.cancelled() for task in pending)
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["status"] == "error"
+    assert "interrupted" in message.body["error_msg"]
+    assert signal.getsignal(signal.SIGTERM) is previous_handler
+
+
+@pytest.mark.asyncio
+async def test_running_heartbeats(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Running messages are published from the start of the request to Log Detective,
+    and always before the result."""
+    from logdetective_packit.main import app
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.LD_PUBLISH_RUNNING", True)
+    monkeypatch.setattr("logdetective_packit.main.LD_HEARTBEAT_INTERVAL", 0.01)
+    release = asyncio.Event()
+    response = mock_external_calls["mock_async_client"].post.return_value
+
+    async def slow_post(**kwargs):
+        await release.wait()
+        return response
+
+    mock_external_calls["mock_async_client"].post.side_effect = slow_post
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post(
+            "/analyze",
+            json=MINIMAL_BUILD_INFO,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+    await asyncio.sleep(0.05)
+    release.set()
+    await mock_create_task_call["task_catcher"].created_task
+
+    messages = [
+        call.kwargs["message"]
+        for call in mock_external_calls["mock_publish"].call_args_list
+    ]
+    assert len(messages) > 2
+    assert [message.body["status"] for message in messages[:-1]] == [
+        LogDetectiveResult.running
+    ] * (len(messages) - 1)
+    assert messages[-1].body["status"] == LogDetectiveResult.complete
+    assert messages[0].body["elapsed_seconds"] == pytest.approx(0, abs=0.01)
+    assert messages[1].body["elapsed_seconds"] > 0
+    assert messages[0].body["queue_wait_seconds"] >= 0
+    for message in messages:
+        message.validate()
+
+
+@pytest.mark.asyncio
+async def test_large_response_offloaded(
+    tmp_path, monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Large response is published as reference, and served on /results."""
+    from logdetective_packit.blobs import BlobStore
+    from logdetective_packit.main import app
+
+    ld_response = {
+        "explanation": {"text": "Missing dependency " * 100, "logprobs": None},
+        "response_certainty": 90.0,
+        "snippets": [{"text": "error: missing"}] * 100,
+    }
+    mock_external_calls[
+        "mock_async_client"
+    ].post.return_value.json.return_value = ld_response
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.LD_BLOB_THRESHOLD", 1000)
+    monkeypatch.setattr("logdetective_packit.main.LD_BLOB_SUMMARY_LENGTH", 20)
+    monkeypatch.setattr(
+        "logdetective_packit.main.LD_PACKIT_PUBLIC_URL", "https://packit.example.com/"
+    )
+    monkeypatch.setattr(
+        "logdetective_packit.main.result_blobs",
+        BlobStore(str(tmp_path / "results"), retention=3600),
+    )
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post(
+            "/analyze",
+            json=MINIMAL_BUILD_INFO,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+        await mock_create_task_call["task_catcher"].created_task
+
+        message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+        reference = message.body["log_detective_response_ref"]
+        result = await client.get(f"/results/{reference['digest']}")
+        missing = await client.get(f"/results/{'0' * 64}")
+
+    message.validate()
+    assert "log_detective_response" not in message.body
+    assert (
+        reference["url"] == f"https://packit.example.com/results/{reference['digest']}"
+    )
+    assert message.body["log_detective_response_summary"] == {
+        "explanation": "Missing dependency M",
+        "response_certainty": 90.0,
+    }
+    assert result.status_code == 200
+    assert result.json() == ld_response
+    assert len(result.content) == reference["size"]
+    assert missing.status_code == 404
+
+
+def test_large_response_offload_requires_public_url():
+    """Worker doesn't start with references to responses consumers can't resolve."""
+    env = {
+        key: value for key, value in os.environ.items() if key != "LD_PACKIT_PUBLIC_URL"
+    }
+    env["LD_BLOB_THRESHOLD"] = "1000"
+
+    result = subprocess.run(
+        [sys.executable, "-c", "import logdetective_packit.main"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode != 0
+    assert "LD_PACKIT_PUBLIC_URL" in result.stderr
+
+
+@pytest.mark.asyncio
+async def test_large_response_inline_if_not_stored(
+    mocker, monkeypatch, mock_env_vars, mock_external_calls, mock_server_logger
+):
+    """Large response which can't be stored is published inline, rather than lost."""
+    ld_response = {"explanation": {"text": "Missing dependency " * 100}}
+    mock_external_calls[
+        "mock_async_client"
+    ].post.return_value.json.return_value = ld_response
+    monkeypatch.setattr("logdetective_packit.main.LD_BLOB_THRESHOLD", 1000)
+    result_blobs = mocker.Mock()
+    result_blobs.put.side_effect = OSError(28, "No space left on device")
+    monkeypatch.setattr("logdetective_packit.main.result_blobs", result_blobs)
+
+    await call_log_detective(
+        BuildInfo(**MINIMAL_BUILD_INFO), "large-analysis", datetime.now()
+    )
+
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["status"] == LogDetectiveResult.complete
+    assert message.body["log_detective_response"] == ld_response
+
+
+@pytest.mark.asyncio
+async def test_unreachable_artifact_fails_fast(
+    mocker, monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Analysis of unreachable artifact fails without asking Log Detective."""
+    from logdetective_packit.main import app
+    from logdetective_packit.metrics import ANALYSES_FINISHED
+    from logdetective_packit.preflight import ArtifactUnreachableError, URLPreflight
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.url_preflight", URLPreflight(60))
+    preflight_client = mocker.AsyncMock()
+    preflight_client.head.return_value = mocker.MagicMock(
+        status_code=404,
+        reason_phrase="Not Found",
+        is_success=False,
+        is_client_error=True,
+    )
+    monkeypatch.setattr("logdetective_packit.main.preflight_client", preflight_client)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post(
+            "/analyze",
+            json=MINIMAL_BUILD_INFO,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+    failed = ANALYSES_FINISHED.labels("copr", "error")._value.get()
+    with pytest.raises(ArtifactUnreachableError):
+        await mock_create_task_call["task_catcher"].created_task
+
+    # Analysis is counted as failed
+    assert ANALYSES_FINISHED.labels("copr", "error")._value.get() == failed + 1
+    mock_external_calls["mock_async_client"].post.assert_not_called()
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["status"] == "error"
+    assert (
+        "builder-live.log at http://example.com/builder-live.log (404 Not Found)"
+        in (message.body["error_msg"])
+    )
+
+
+@pytest.mark.asyncio
+async def test_missing_spooled_artifact_fails(
+    tmp_path, monkeypatch, mock_env_vars, mock_external_calls
+):
+    """Analysis of spooled artifact which is gone fails, instead of sending it empty."""
+    from logdetective_packit.spool import ArtifactMissingError, ArtifactSpool
+
+    spool = ArtifactSpool(str(tmp_path), threshold=10, memory_budget=1000)
+    monkeypatch.setattr("logdetective_packit.main.artifact_spool", spool)
+    build_info = BuildInfo(
+        **dict(MINIMAL_BUILD_INFO, artifacts={"build.log": "error: " * 100})
+    )
+    build_info = await spool.spool("missing-analysis", build_info)
+    (tmp_path / spool._path("missing-analysis", "build.log")).unlink()
+
+    with pytest.raises(ArtifactMissingError):
+        await call_log_detective(build_info, "missing-analysis", datetime.now())
+
+    mock_external_calls["mock_async_client"].post.assert_not_called()
+    message = mock_external_calls["mock_publish"].call_args.kwargs["message"]
+    assert message.body["status"] == "error"
+    assert "build.log can't be read" in message.body["error_msg"]
+
+
+@pytest.mark.asyncio
+async def test_profile(monkeypatch, mock_env_vars):
+    """Profile of the worker is sampled for the requested time, one at a time."""
+    from logdetective_packit import main
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    monkeypatch.setattr("logdetective_packit.main.LD_PROFILE_MAX_SECONDS", 0.05)
+    headers = {"Authorization": "Bearer secret-123"}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=main.app), base_url="http://test"
+    ) as client:
+        unauthorized = await client.get(
+            "/debug/profile", headers={"Authorization": "Bearer wrong"}
+        )
+        response = await client.get("/debug/profile?seconds=30", headers=headers)
+        async with main._profiling:
+            busy = await client.get("/debug/profile", headers=headers)
+
+    assert unauthorized.status_code == 401
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "_run_once" in response.text
+    assert busy.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_call_log_detective_publish_failure(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_server_logger
+):
+    """Result which failed to be published is kept in the outbox, and published later."""
+    from logdetective_packit import main
+    from logdetective_packit.outbox import Outbox
+
+    outbox = Outbox(":memory:")
+    monkeypatch.setattr("logdetective_packit.main.result_outbox", outbox)
+    monkeypatch.setattr("logdetective_packit.main.PUBLISH_RETRY_BACKOFF", 0)
+    mock_publish = mock_external_calls["mock_publish"]
+    mock_publish.side_effect = [PublishTimeout, None]
+
+    await call_log_detective(
+        build_info=BuildInfo(**MINIMAL_BUILD_INFO),
+        log_detective_analysis_id="analysis-1",
+        log_detective_analysis_start=datetime.now(),
+    )
+
+    assert mock_publish.call_count == 1
+    first = mock_publish.call_args.kwargs["message"]
+    assert outbox.analysis_ids() == {"analysis-1"}
+
+    await main.flush_outbox()
+
+    assert mock_publish.call_count == 2
+    message = mock_publish.call_args.kwargs["message"]
+    # Consumers can tell it is the same message
+    assert message.id == first.id
+    assert message._headers == first._headers
+    assert message.body["status"] == LogDetectiveResult.complete
+    assert message.body["log_detective_response"] == {"status": "success"}
+    assert outbox.analysis_ids() == set()
+
+
+@pytest.mark.asyncio
+async def test_analyze_build_durable_queue(
+    tmp_path, monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Accepted analysis is kept in the durable queue until it finishes."""
+    from logdetective_packit.main import app
+    from logdetective_packit.work_queue import AnalysisQueue
+
+    queue = AnalysisQueue(str(tmp_path / "queue.sqlite"))
+    monkeypatch.setattr("logdetective_packit.main.analysis_queue", queue)
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+    release = asyncio.Event()
+    mock_async_client = mock_external_calls["mock_async_client"]
+    response = mock_async_client.post.return_value
+
+    async def post(*args, **kwargs):
+        await release.wait()
+        return response
+
+    mock_async_client.post.side_effect = post
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        accepted = await client.post(
+            "/analyze",
+            json=MINIMAL_BUILD_INFO,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+
+    assert accepted.status_code == 200
+    # A new worker opening the same database finds the pending analysis
+    assert len(AnalysisQueue(str(tmp_path / "queue.sqlite"))) == 1
+
+    release.set()
+    await mock_create_task_call["task_catcher"].created_task
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_claim_orphans_while_running(
+    tmp_path, monkeypatch, mocker, mock_env_vars, mock_external_calls
+):
+    """Running worker replays analyses of workers which exited after it started,
+    but not its own pending analyses."""
+    from logdetective_packit.coordination import SharedState
+    from logdetective_packit.main import claim_orphans
+    from logdetective_packit.outbox import Outbox
+    from logdetective_packit.work_queue import AnalysisQueue
+
+    queue = AnalysisQueue(str(tmp_path / "queue.sqlite"))
+    start = datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00")
+    queue.put("own", start, BuildInfo(**MINIMAL_BUILD_INFO))
+    worker_pid = os.getpid()
+    mocker.patch("logdetective_packit.work_queue.os.getpid", return_value=1001)
+    queue.put("orphaned", start, BuildInfo(**MULTIARTIFACT_BUILD_INFO))
+    mocker.patch("logdetective_packit.work_queue.os.getpid", return_value=worker_pid)
+    mocker.patch(
+        "logdetective_packit.work_queue.pid_alive", side_effect=lambda pid: pid != 1001
+    )
+    monkeypatch.setattr("logdetective_packit.main.analysis_queue", queue)
+    monkeypatch.setattr("logdetective_packit.main.result_outbox", Outbox(":memory:"))
+    monkeypatch.setattr(
+        "logdetective_packit.main.shared_state", SharedState(":memory:")
+    )
+    submit_analysis = mocker.patch("logdetective_packit.main.submit_analysis")
+
+    await claim_orphans(include_own=False)
+
+    submit_analysis.assert_awaited_once_with(
+        BuildInfo(**MULTIARTIFACT_BUILD_INFO), "orphaned", start
+    )
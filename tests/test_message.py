@@ -0,0 +1,91 @@
+import jsonschema
+import pytest
+from logdetective_packit_message import (
+    LogDetectiveMessage,
+    LogDetectiveResult,
+    compiled_validators,
+    validate_message,
+)
+from logdetective_packit_message.validation import check
+
+FIELDS = {
+    "target_build": "12345",
+    "build_system": "copr",
+    "log_detective_analysis_id": "analysis-1",
+    "log_detective_analysis_start": "2025-01-01 00:00:00+00:00",
+    "pr_id": 1,
+}
+
+
+def test_typed_constructors():
+    """Typed constructors build valid bodies of complete and error messages."""
+    complete = LogDetectiveMessage.complete(
+        log_detective_response={"explanation": {"text": "Missing dependency"}},
+        **FIELDS,
+    )
+    error = LogDetectiveMessage.error(error_msg="Timeout", **FIELDS)
+
+    assert complete.body["status"] == LogDetectiveResult.complete
+    assert error.body["status"] == LogDetectiveResult.error
+    assert error.body["error_msg"] == "Timeout"
+    assert complete == LogDetectiveMessage(body=dict(complete.body))
+    complete.validate()
+    error.validate()
+
+
+def test_typed_constructors_reject_invalid_fields():
+    """Fields violating the schema are rejected as the message is built."""
+    with pytest.raises(jsonschema.ValidationError):
+        LogDetectiveMessage.complete(log_detective_response=["not", "object"], **FIELDS)
+    with pytest.raises(jsonschema.ValidationError):
+        LogDetectiveMessage.error(**FIELDS | {"pr_id": "1"})
+
+
+def test_validate_message_headers():
+    """Compiled validation rejects invalid headers just like generic validation."""
+    message = LogDetectiveMessage.error(**FIELDS)
+    message._headers["sent-at"] = 1
+
+    with pytest.raises(jsonschema.ValidationError) as ex:
+        message.validate()
+    with pytest.raises(jsonschema.ValidationError) as compiled_ex:
+        validate_message(message)
+    assert compiled_ex.value.message == ex.value.message
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"status": "complete", "log_detective_response": {}} | FIELDS,
+        {"status": "complete", "log_detective_response": "text"} | FIELDS,
+        {"status": "finished"} | FIELDS,
+        {"status": "error"},
+        {
+            "status": "complete",
+            "log_detective_response_ref": {"digest": "abc", "size": 10},
+        }
+        | FIELDS,
+    ],
+)
+def test_validate_same_as_fedora_messaging(body):
+    """Compiled validators accept and reject the same bodies as generic validation."""
+    message = LogDetectiveMessage(body=body)
+    body_validators = compiled_validators(LogDetectiveMessage)[1]
+    try:
+        message.validate()
+    except jsonschema.ValidationError as ex:
+        with pytest.raises(jsonschema.ValidationError) as compiled_ex:
+            check(body_validators, body)
+        assert compiled_ex.value.message == ex.message
+        with pytest.raises(jsonschema.ValidationError):
+            validate_message(message)
+    else:
+        check(body_validators, body)
+        validate_message(message)
+
+
+def test_compiled_validators_cached():
+    """Schemas are compiled once per message class."""
+    assert compiled_validators(LogDetectiveMessage) is compiled_validators(
+        LogDetectiveMessage
+    )
@@ -0,0 +1,54 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from logdetective_packit.metrics import render_metrics
+from tests.utils import (
+    MINIMAL_BUILD_INFO,
+    mock_create_task_call,
+    mock_env_vars,
+    mock_external_calls,
+)
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(
+    monkeypatch, mock_env_vars, mock_external_calls, mock_create_task_call
+):
+    """Metrics of finished analysis are exposed on /metrics."""
+    from logdetective_packit.main import app
+
+    monkeypatch.setattr("logdetective_packit.main.LD_PACKIT_TOKEN", "secret-123")
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post(
+            "/analyze",
+            json=MINIMAL_BUILD_INFO,
+            headers={"Authorization": "Bearer secret-123"},
+        )
+        await mock_create_task_call["task_catcher"].created_task
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'logdetective_packit_analyses_accepted_total{build_system="copr"}'
+        in response.text
+    )
+    assert (
+        'logdetective_packit_analyses_finished_total{build_system="copr",status="complete"}'
+        in response.text
+    )
+    assert "logdetective_packit_ld_request_duration_seconds_bucket" in response.text
+    assert "logdetective_packit_publish_duration_seconds_count" in response.text
+
+
+def test_render_metrics_multiprocess(monkeypatch, tmp_path):
+    """Metrics are collected from the directory shared by gunicorn workers."""
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    content, content_type = render_metrics()
+
+    assert content == b""
+    assert content_type.startswith("text/plain")
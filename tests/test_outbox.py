@@ -0,0 +1,108 @@
+import os
+
+from logdetective_packit.outbox import Outbox
+
+HEADERS = {"fedora_messaging_schema": "logdetective.analysis"}
+
+
+def body(analysis_id: str, status: str = "complete") -> dict:
+    return {"log_detective_analysis_id": analysis_id, "status": status}
+
+
+def bodies(entries: list) -> list[dict]:
+    return [message_body for _, _, _, message_body, _ in entries]
+
+
+def test_outbox_append_and_remove(tmp_path):
+    """Messages are held as they are appended, and removed once confirmed."""
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+
+    seq = outbox.append("message-1", HEADERS, body("first"))
+
+    assert seq is not None
+    # Message is being published already
+    assert outbox.hold_due() == []
+    assert outbox.analysis_ids() == {"first"}
+    assert outbox.stats()[0] == 1
+
+    outbox.remove(seq)
+    assert outbox.stats() == (0, 0.0)
+
+
+def test_outbox_order_per_analysis(tmp_path):
+    """Later messages of an analysis wait until the earlier ones are published."""
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+    first = outbox.append("message-1", HEADERS, body("analysis", "running"))
+    outbox.retry(first, delay=0)
+
+    assert outbox.append("message-2", HEADERS, body("analysis", "complete")) is None
+    assert outbox.append("message-3", HEADERS, body("other")) is not None
+
+    [entry] = outbox.hold_due()
+    assert entry == (first, "message-1", HEADERS, body("analysis", "running"), 1)
+
+    outbox.remove(first)
+    [(_, message_id, _, message_body, attempts)] = outbox.hold_due()
+    assert (message_id, message_body, attempts) == (
+        "message-2",
+        body("analysis", "complete"),
+        0,
+    )
+
+
+def test_outbox_held_until_published(tmp_path):
+    """Message isn't published again while it waits for the publisher, however long."""
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+    outbox.retry(outbox.append("message-1", HEADERS, body("first")), delay=0)
+
+    [(seq, _, _, _, _)] = outbox.hold_due()
+    assert outbox.hold_due() == []
+
+    outbox.retry(seq, delay=0)
+    assert bodies(outbox.hold_due()) == [body("first")]
+
+
+def test_outbox_retry_backoff(tmp_path):
+    """Messages which failed to be published are due only after the backoff."""
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+    seq = outbox.append("message-1", HEADERS, body("first"))
+
+    outbox.retry(seq, delay=60)
+    assert outbox.hold_due() == []
+
+    outbox.retry(seq, delay=0)
+    assert bodies(outbox.hold_due()) == [body("first")]
+
+
+def test_outbox_claim_orphaned(tmp_path, mocker):
+    """Messages of dead workers are published by the new worker right away."""
+    worker_pid = os.getpid()
+    path = str(tmp_path / "outbox.sqlite")
+
+    mocker.patch("logdetective_packit.outbox.os.getpid", return_value=1001)
+    Outbox(path).append("message-1", HEADERS, body("orphaned"))
+    mocker.patch("logdetective_packit.outbox.os.getpid", return_value=1002)
+    Outbox(path).append("message-2", HEADERS, body("running"))
+
+    mocker.patch("logdetective_packit.outbox.os.getpid", return_value=worker_pid)
+    mocker.patch(
+        "logdetective_packit.outbox.pid_alive",
+        side_effect=lambda pid: pid in (1002, worker_pid),
+    )
+    outbox = Outbox(path)
+
+    assert outbox.claim_orphaned() == 1
+    assert bodies(outbox.hold_due()) == [body("orphaned")]
+    assert outbox.claim_orphaned() == 1
+    assert outbox.stats()[0] == 1
+
+
+def test_outbox_claim_orphaned_excluding_own(tmp_path, mocker):
+    """Running worker doesn't claim its own messages again, which would reset their backoff."""
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+    seq = outbox.append("message-1", HEADERS, body("own"))
+    outbox.retry(seq, delay=60)
+    mocker.patch("logdetective_packit.outbox.pid_alive", return_value=True)
+
+    assert outbox.claim_orphaned(include_own=False) == 0
+    assert outbox.hold_due() == []
@@ -0,0 +1,79 @@
+import pytest
+from httpx import AsyncClient, ConnectError, MockTransport, Response
+
+from logdetective_packit.preflight import ArtifactUnreachableError, URLPreflight
+
+
+def artifact_server(requests: list):
+    """Serve existing logs, reject HEAD on `/get-only/` URLs."""
+
+    def handler(request):
+        requests.append((request.method, request.url.path))
+        if request.url.host == "down.example.com":
+            raise ConnectError("Connection refused", request=request)
+        if request.url.path.startswith("/get-only/") and request.method == "HEAD":
+            return Response(405)
+        if request.url.path.endswith("/expired.log"):
+            return Response(404)
+        return Response(200)
+
+    return AsyncClient(transport=MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_preflight_reachable_urls():
+    """Reachable URLs are checked once, HEAD is replaced by GET if not allowed."""
+    requests = []
+    http_client = artifact_server(requests)
+    preflight = URLPreflight(ttl=60)
+    urls = {
+        "builder-live.log": "http://logs.example.com/builder-live.log",
+        "backend.log": "http://logs.example.com/get-only/backend.log",
+    }
+
+    await preflight.check(http_client, urls)
+    await preflight.check(http_client, urls)
+
+    assert requests == [
+        ("HEAD", "/builder-live.log"),
+        ("HEAD", "/get-only/backend.log"),
+        ("GET", "/get-only/backend.log"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_preflight_unreachable_urls():
+    """Every unreachable artifact is named, with the reason."""
+    requests = []
+    http_client = artifact_server(requests)
+    preflight = URLPreflight(ttl=60)
+
+    with pytest.raises(ArtifactUnreachableError) as ex:
+        await preflight.check(
+            http_client,
+            {
+                "builder-live.log": "http://logs.example.com/expired.log",
+                "backend.log": "http://down.example.com/backend.log",
+                "build.log": "http://logs.example.com/build.log",
+            },
+        )
+
+    assert "builder-live.log at http://logs.example.com/expired.log (404" in str(
+        ex.value
+    )
+    assert "backend.log at http://down.example.com/backend.log (ConnectError" in str(
+        ex.value
+    )
+    assert "build.log at" not in str(ex.value)
+
+    # Refused URL is remembered, connection failure is retried
+    with pytest.raises(ArtifactUnreachableError):
+        await preflight.check(
+            http_client,
+            {
+                "builder-live.log": "http://logs.example.com/expired.log",
+                "backend.log": "http://down.example.com/backend.log",
+            },
+        )
+    assert requests.count(("HEAD", "/expired.log")) == 1
+    assert requests.count(("HEAD", "/backend.log")) == 2
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+import threading
+
+from logdetective_packit.metrics import STAGE_DURATION
+from logdetective_packit.profiling import TailSampler, sample_stacks, stage
+
+
+def transaction_event(op: str, seconds: float, status: str = "ok") -> dict:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return {
+        "type": "transaction",
+        "contexts": {"trace": {"op": op, "status": status}},
+        # Timestamps are serialized before events reach the hook
+        "start_timestamp": start.isoformat(),
+        "timestamp": (start + timedelta(seconds=seconds)).isoformat(),
+    }
+
+
+def test_stage_records_duration():
+    """Duration of stage is recorded even if the stage fails."""
+    samples = STAGE_DURATION.labels("test")._sum.get()
+
+    try:
+        with stage("test"):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert STAGE_DURATION.labels("test")._sum.get() > samples
+
+
+def test_tail_sampler_keeps_slow_and_failed_analyses():
+    """Slow and failed analyses are sent regardless of the sample rate."""
+    sampler = TailSampler(sample_rate=0.0, slow_threshold=30)
+
+    assert sampler.traces_sampler({"transaction_context": {"op": "analysis"}}) == 1.0
+    assert sampler.traces_sampler({"transaction_context": {"op": "http.server"}}) == 0
+    slow = transaction_event("analysis", 45)
+    failed = transaction_event("analysis", 1, status="internal_error")
+    assert sampler.before_send_transaction(slow, {}) is slow
+    assert sampler.before_send_transaction(failed, {}) is failed
+    assert sampler.before_send_transaction(transaction_event("analysis", 1), {}) is None
+    # HTTP requests were sampled as they started already
+    request = transaction_event("http.server", 1)
+    assert sampler.before_send_transaction(request, {}) is request
+
+
+def test_tail_sampler_samples_other_analyses():
+    """Fast successful analyses are sent with the sample rate."""
+    sampler = TailSampler(sample_rate=1.0, slow_threshold=30)
+    event = transaction_event("analysis", 1)
+
+    assert sampler.before_send_transaction(event, {}) is event
+
+
+def test_sample_stacks():
+    """Stacks of other threads are collapsed and counted."""
+    stop = threading.Event()
+
+    def busy_function():
+        while not stop.is_set():
+            pass
+
+    thread = threading.Thread(target=busy_function, name="busy")
+    thread.start()
+    try:
+        profile = sample_stacks(0.05, interval=0.001)
+    finally:
+        stop.set()
+        thread.join()
+
+    stacks = dict(line.rsplit(" ", 1) for line in profile.splitlines())
+    busy_stacks = [stack for stack in stacks if stack.startswith("busy;")]
+    assert busy_stacks
+    # Thread may be sampled before it enters its target too
+    assert any(
+        "test_sample_stacks.<locals>.busy_function" in stack for stack in busy_stacks
+    )
+    assert all(int(count) > 0 for count in stacks.values())
+    # Sampling thread itself is left out
+    assert not any(
+        stack.startswith(f"{threading.current_thread().name};") for stack in stacks
+    )
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import pytest
+from fedora_messaging.exceptions import PublishTimeout
+
+from logdetective_packit.publisher import MessagePublisher
+
+
+@pytest.mark.asyncio
+async def test_message_publisher_bounds_threads():
+    """Messages are published from at most `concurrency` dedicated threads."""
+    publisher = MessagePublisher(concurrency=2)
+    threads = set()
+
+    def publish_call():
+        threads.add(threading.current_thread().name)
+
+    for _ in range(10):
+        await publisher.submit(publish_call)
+    await publisher.close()
+
+    assert 1 <= len(threads) <= 2
+    assert all(name.startswith("publisher") for name in threads)
+
+
+@pytest.mark.asyncio
+async def test_message_publisher_raises_failure():
+    """Failure of publishing is reported to the caller."""
+    publisher = MessagePublisher(concurrency=1)
+
+    def publish_call():
+        raise PublishTimeout("Publishing timed out")
+
+    with pytest.raises(PublishTimeout):
+        await publisher.submit(publish_call)
+    await publisher.close()
+
+
+@pytest.mark.asyncio
+async def test_message_publisher_close_doesnt_block_loop():
+    """Event loop keeps running while close waits for messages being published."""
+    publisher = MessagePublisher(concurrency=1)
+    confirmed = threading.Event()
+    publishing = asyncio.ensure_future(publisher.submit(confirmed.wait))
+    await asyncio.sleep(0.01)
+
+    closing = asyncio.ensure_future(publisher.close())
+    await asyncio.sleep(0.01)
+    assert not closing.done()
+    confirmed.set()
+
+    await asyncio.wait_for(asyncio.gather(publishing, closing), timeout=5)
@@ -0,0 +1,92 @@
+import pytest
+
+from logdetective_packit.models import BuildInfo
+from logdetective_packit.rate_limit import (
+    BurstExceededError,
+    RateLimiter,
+    RateLimitKey,
+)
+
+from tests.utils import MINIMAL_BUILD_INFO
+
+
+def test_rate_limiter_refills_bucket(tmp_path, mocker):
+    """Burst is allowed at once, further submissions wait for the refill."""
+    now = mocker.patch("logdetective_packit.rate_limit.time.time", return_value=100.0)
+    limiter = RateLimiter(
+        str(tmp_path / "rate_limit.sqlite"), RateLimitKey.project_url, 0.5, 2
+    )
+
+    assert limiter.acquire({"project": 1}) == 0
+    assert limiter.acquire({"project": 1}) == 0
+    assert limiter.acquire({"project": 1}) == pytest.approx(2.0)
+    assert limiter.acquire({"other": 1}) == 0
+
+    now.return_value = 101.0
+    assert limiter.acquire({"project": 1}) == pytest.approx(1.0)
+    now.return_value = 102.0
+    assert limiter.acquire({"project": 1}) == 0
+
+
+def test_rate_limiter_shared_by_workers(tmp_path, mocker):
+    """Buckets are shared by limiters opening the same database."""
+    mocker.patch("logdetective_packit.rate_limit.time.time", return_value=100.0)
+    path = str(tmp_path / "rate_limit.sqlite")
+    first = RateLimiter(path, RateLimitKey.project_url, 1, 1)
+    second = RateLimiter(path, RateLimitKey.project_url, 1, 1)
+
+    assert first.acquire({"project": 1}) == 0
+    assert second.acquire({"project": 1}) == pytest.approx(1.0)
+
+
+def test_rate_limiter_all_or_nothing(mocker):
+    """Tokens are taken from none of the buckets, when any of them is short."""
+    mocker.patch("logdetective_packit.rate_limit.time.time", return_value=100.0)
+    limiter = RateLimiter(":memory:", RateLimitKey.build_system, 1, 2)
+
+    assert limiter.acquire({"koji": 2}) == 0
+    assert limiter.acquire({"copr": 1, "koji": 1}) == pytest.approx(1.0)
+    assert limiter.acquire({"copr": 2}) == 0
+
+    with pytest.raises(BurstExceededError):
+        limiter.acquire({"koji": 3})
+
+
+def test_rate_limiter_bucket():
+    build_info = BuildInfo(**MINIMAL_BUILD_INFO)
+
+    assert (
+        RateLimiter(":memory:", RateLimitKey.build_system, 1, 1).bucket(
+            build_info, "secret"
+        )
+        == "copr"
+    )
+    token_bucket = RateLimiter(":memory:", RateLimitKey.token, 1, 1).bucket(
+        build_info, "secret"
+    )
+    assert "secret" not in token_bucket
+
+
+def test_rate_limiter_refund(mocker):
+    """Refunded tokens can be taken again, up to the burst."""
+    mocker.patch("logdetective_packit.rate_limit.time.time", return_value=100.0)
+    limiter = RateLimiter(":memory:", RateLimitKey.build_system, 0.001, 2)
+
+    assert limiter.acquire({"copr": 2}) == 0
+    limiter.refund({"copr": 1, "koji": 1})
+
+    assert limiter.acquire({"copr": 1}) == 0
+    assert limiter.acquire({"copr": 1}) > 0
+    assert limiter.acquire({"koji": 2}) == 0
+
+
+def test_rate_limiter_bucket_without_project_url():
+    """Builds without project are limited by their build system, not all together."""
+    limiter = RateLimiter(":memory:", RateLimitKey.project_url, 1, 1)
+    copr_build = BuildInfo(**dict(MINIMAL_BUILD_INFO, project_url=None))
+    koji_build = BuildInfo(
+        **dict(MINIMAL_BUILD_INFO, project_url=None, build_system="koji")
+    )
+
+    assert limiter.bucket(copr_build, "secret") != limiter.bucket(koji_build, "secret")
+    assert limiter.bucket(copr_build, "secret") != ""
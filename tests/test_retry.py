@@ -0,0 +1,91 @@
+import pytest
+from httpx import ConnectError, HTTPStatusError, Request, Response
+
+from logdetective_packit.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    is_retryable,
+    retry_delay,
+)
+
+REQUEST = Request("POST", "http://mock-ld-server.com/api")
+
+
+def status_error(status_code: int, headers: dict | None = None) -> HTTPStatusError:
+    return HTTPStatusError(
+        "Exception",
+        request=REQUEST,
+        response=Response(status_code, headers=headers, request=REQUEST),
+    )
+
+
+@pytest.mark.parametrize(
+    "exception, retryable",
+    [
+        (ConnectError("Connection refused"), True),
+        (status_error(503), True),
+        (status_error(429), True),
+        (status_error(400), False),
+        (status_error(500), False),
+        (ValueError("Unexpected"), False),
+    ],
+)
+def test_is_retryable(exception, retryable):
+    assert is_retryable(exception) == retryable
+
+
+def test_retry_delay():
+    """Backoff grows exponentially, `Retry-After` takes precedence."""
+    for attempt in range(5):
+        delay = retry_delay(attempt, ConnectError("refused"), 1, 10)
+        assert 0 <= delay <= min(10, 2**attempt)
+
+    assert retry_delay(0, status_error(429, {"Retry-After": "7"}), 1, 10) == 7
+    assert retry_delay(0, status_error(429, {"Retry-After": "70"}), 1, 10) == 10
+
+
+def test_circuit_breaker(mocker):
+    """Breaker opens after consecutive failures and closes after successful probe."""
+    monotonic = mocker.patch(
+        "logdetective_packit.retry.time.monotonic", return_value=100.0
+    )
+    breaker = CircuitBreaker("Log Detective API", failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure(status_error(503))
+    breaker.check()
+    # Failures caused by the request itself are not counted
+    breaker.record_failure(status_error(400))
+    assert breaker.state == CircuitState.closed
+
+    breaker.record_failure(ConnectError("refused"))
+    assert breaker.state == CircuitState.open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    # Only one probe is let through once the reset timeout passes
+    monotonic.return_value = 161.0
+    breaker.check()
+    assert breaker.state == CircuitState.half_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.closed
+    breaker.check()
+
+
+def test_circuit_breaker_failed_probe(mocker):
+    monotonic = mocker.patch(
+        "logdetective_packit.retry.time.monotonic", return_value=100.0
+    )
+    breaker = CircuitBreaker("Log Detective API", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure(status_error(502))
+
+    monotonic.return_value = 161.0
+    breaker.check()
+    breaker.record_failure(status_error(502))
+
+    assert breaker.state == CircuitState.open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from logdetective_packit.models import BuildInfo
+from logdetective_packit.scheduler import FairScheduler, parse_class_settings
+
+from tests.utils import MINIMAL_BUILD_INFO
+
+
+async def run_scheduled(scheduler: FairScheduler, classes: list[str]) -> list[str]:
+    """Queue analyses of given classes behind a held slot, and return
+    the order in which they were served."""
+    served = []
+    release = asyncio.Event()
+
+    async def analysis(name: str):
+        async with scheduler.slot(name):
+            served.append(name)
+            await asyncio.sleep(0)
+
+    async def blocker():
+        async with scheduler.slot("blocker"):
+            await release.wait()
+
+    holding = asyncio.ensure_future(blocker())
+    await asyncio.sleep(0)
+    waiting = [asyncio.ensure_future(analysis(name)) for name in classes]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holding, *waiting)
+    return served
+
+
+def test_fair_scheduler_classify():
+    """Class is named by values of the scheduling keys."""
+    scheduler = FairScheduler(1, ["build_system", "pr_id"])
+
+    assert scheduler.classify(BuildInfo(**MINIMAL_BUILD_INFO)) == "copr/pr"
+    assert (
+        scheduler.classify(BuildInfo(**MINIMAL_BUILD_INFO | {"pr_id": None}))
+        == "copr/push"
+    )
+    assert FairScheduler(1, []).classify(BuildInfo(**MINIMAL_BUILD_INFO)) == "default"
+
+    with pytest.raises(ValueError):
+        FairScheduler(1, ["owner"])
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_interleaves_classes():
+    """Flood of one class doesn't delay analyses of another class."""
+    scheduler = FairScheduler(1, ["build_system"])
+
+    served = await run_scheduled(scheduler, ["koji"] * 4 + ["copr"] * 2)
+
+    assert served == ["koji", "copr", "koji", "copr", "koji", "koji"]
+    assert scheduler.running == 0
+    assert scheduler.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_weights():
+    """Backlogged classes are served in proportion to their weights."""
+    scheduler = FairScheduler(1, ["build_system"], weights={"copr": 3})
+
+    served = await run_scheduled(scheduler, ["koji"] * 4 + ["copr"] * 6)
+
+    assert served[:8].count("copr") == 6
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_caps():
+    """Class doesn't take more slots than its cap."""
+    scheduler = FairScheduler(4, ["build_system"], caps={"koji": 1})
+    in_progress = {"koji": 0, "copr": 0}
+    most = {"koji": 0, "copr": 0}
+
+    async def analysis(name: str):
+        async with scheduler.slot(name):
+            in_progress[name] += 1
+            most[name] = max(most[name], in_progress[name])
+            await asyncio.sleep(0)
+            in_progress[name] -= 1
+
+    await asyncio.gather(*[analysis(name) for name in ["koji", "copr"] * 4])
+
+    assert most == {"koji": 1, "copr": 3}
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_cancelled_waiter():
+    """Cancelled analysis gives up its place in the queue."""
+    scheduler = FairScheduler(1, ["build_system"])
+    release = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot("copr"):
+            await release.wait()
+
+    async def analysis():
+        async with scheduler.slot("koji"):
+            pass
+
+    holding = asyncio.ensure_future(blocker())
+    waiting = asyncio.ensure_future(analysis())
+    await asyncio.sleep(0)
+    assert scheduler.waiting == 1
+
+    waiting.cancel()
+    await asyncio.sleep(0)
+    assert scheduler.waiting == 0
+
+    release.set()
+    await holding
+    assert scheduler.running == 0
+
+
+def test_parse_class_settings():
+    assert parse_class_settings("copr/pr=4, koji=0.5", float) == {
+        "copr/pr": 4.0,
+        "koji": 0.5,
+    }
+    assert parse_class_settings("", int) == {}
+    with pytest.raises(ValueError):
+        parse_class_settings("koji", int)
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_forgets_idle_classes(mocker):
+    """Classes of finished analyses are dropped, and their metrics share a label."""
+    mocker.patch("logdetective_packit.scheduler.METRIC_CLASSES", 2)
+    scheduler = FairScheduler(4, ["project_url"], weights={"configured": 2})
+
+    served = await run_scheduled(
+        scheduler, [f"project-{index}" for index in range(500)] + ["configured"]
+    )
+
+    assert len(served) == 501
+    assert scheduler._classes == {}
+    assert {
+        scheduler._metric_label(name) for name in ["project-499", "configured"]
+    } == {"other", "configured"}
@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import pytest
+
+from logdetective_packit import serialization
+from logdetective_packit.serialization import (
+    RequestEncoding,
+    encode_analysis_request,
+    request_encoding,
+)
+
+ANALYSIS_REQUEST = {
+    "files": [
+        {"name": "builder-live.log", "content": "error: ünmet dependency"},
+        {"name": "backend.log", "url": "http://example.com/backend.log"},
+    ],
+    "build_metadata": {"specfile": "Name: test"},
+}
+
+
+def test_encode_analysis_request_digest():
+    """Digest doesn't depend on order of the files, which are sent in their order."""
+    digest, body = encode_analysis_request(ANALYSIS_REQUEST, RequestEncoding.identity)
+    reordered = ANALYSIS_REQUEST | {"files": ANALYSIS_REQUEST["files"][::-1]}
+    reordered_digest, reordered_body = encode_analysis_request(
+        reordered, RequestEncoding.identity
+    )
+
+    assert reordered_digest == digest
+    assert json.loads(body) == ANALYSIS_REQUEST
+    assert json.loads(reordered_body) == reordered
+    other = ANALYSIS_REQUEST | {"build_metadata": {"specfile": "Name: other"}}
+    assert encode_analysis_request(other, RequestEncoding.identity)[0] != digest
+
+
+def test_encode_analysis_request_files_only():
+    request = {"files": ANALYSIS_REQUEST["files"]}
+    _, body = encode_analysis_request(request, RequestEncoding.identity)
+
+    assert json.loads(body) == request
+
+
+def test_encode_analysis_request_gzip():
+    digest, body = encode_analysis_request(ANALYSIS_REQUEST, RequestEncoding.gzip)
+
+    assert (
+        digest == encode_analysis_request(ANALYSIS_REQUEST, RequestEncoding.identity)[0]
+    )
+    assert json.loads(gzip.decompress(body))["files"][0]["name"] == "builder-live.log"
+
+
+def test_encode_analysis_request_zstd():
+    zstd = pytest.importorskip("zstandard")
+    _, body = encode_analysis_request(ANALYSIS_REQUEST, RequestEncoding.zstd)
+
+    decompressed = zstd.ZstdDecompressor().decompressobj().decompress(body)
+    assert len(json.loads(decompressed)["files"]) == 2
+
+
+def test_request_encoding_unavailable(monkeypatch):
+    """Worker doesn't start with compression it can't use."""
+    monkeypatch.setattr(serialization, "zstd", None)
+
+    assert request_encoding("gzip") == RequestEncoding.gzip
+    with pytest.raises(ValueError):
+        request_encoding("zstd")
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from logdetective_packit.models import BuildInfo
+from logdetective_packit.spool import ArtifactMissingError, ArtifactSpool
+
+from tests.utils import MINIMAL_BUILD_INFO
+
+INLINE_BUILD_INFO = dict(
+    MINIMAL_BUILD_INFO,
+    artifacts={
+        "builder-live.log": "http://example.com/builder-live.log",
+        "build.log": "error: " * 100,
+        "root.log": "ok",
+    },
+)
+
+
+@pytest.mark.asyncio
+async def test_artifact_spool_large_artifacts(tmp_path):
+    """Artifacts above threshold are kept on disk, until the analysis is released."""
+    spool = ArtifactSpool(str(tmp_path), threshold=10, memory_budget=1000)
+    build_info = BuildInfo(**INLINE_BUILD_INFO)
+
+    spooled = await spool.spool("analysis", build_info)
+
+    assert list(spooled.artifacts) == list(build_info.artifacts)
+    assert spooled.artifacts["build.log"] == ""
+    assert spooled.artifacts["root.log"] == "ok"
+    assert spool.read("analysis", "build.log") == "error: " * 100
+    assert spool.read("analysis", "root.log") is None
+    assert spool.spooled_files == 1
+    assert spool.spooled_bytes == 700
+    assert spool.memory_bytes == len("ok")
+
+    spool.release("analysis")
+    assert spool.spooled_files == spool.spooled_bytes == spool.memory_bytes == 0
+    assert os.listdir(spool.directory) == []
+
+
+@pytest.mark.asyncio
+async def test_artifact_spool_memory_budget(tmp_path):
+    """Small artifacts are spooled too, once the memory budget is used up."""
+    spool = ArtifactSpool(str(tmp_path), threshold=1000, memory_budget=1000)
+    build_info = BuildInfo(**INLINE_BUILD_INFO)
+
+    assert await spool.spool("first", build_info) is build_info
+    spooled = await spool.spool("second", build_info)
+
+    assert spooled.artifacts["build.log"] == ""
+    assert spool.read("second", "build.log") == "error: " * 100
+    assert spool.memory_bytes == 2 * 702 - 700
+
+
+@pytest.mark.asyncio
+async def test_artifact_spool_missing_artifact(tmp_path):
+    """Spooled artifact which can't be read back isn't mistaken for an empty one."""
+    spool = ArtifactSpool(str(tmp_path), threshold=10, memory_budget=1000)
+    await spool.spool("analysis", BuildInfo(**INLINE_BUILD_INFO))
+    os.remove(spool._path("analysis", "build.log"))
+
+    with pytest.raises(ArtifactMissingError):
+        spool.read("analysis", "build.log")
+
+
+def test_artifact_spool_removes_dead_workers(tmp_path, mocker):
+    os.makedirs(tmp_path / "1001")
+    mocker.patch("logdetective_packit.spool.pid_alive", return_value=False)
+
+    spool = ArtifactSpool(str(tmp_path), threshold=10, memory_budget=1000)
+
+    assert os.listdir(tmp_path) == [os.path.basename(spool.directory)]
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+from logdetective_packit.models import AnalysisStatus, BuildInfo
+from logdetective_packit.status import AnalysisStatusStore
+
+from tests.utils import MINIMAL_BUILD_INFO
+
+
+def test_analysis_status_store_lifecycle():
+    """Analyses move from queued through running to their final state."""
+    store = AnalysisStatusStore(":memory:", retention=3600, max_entries=100)
+    start = datetime.now(timezone.utc)
+
+    store.queued("analysis", start, BuildInfo(**MINIMAL_BUILD_INFO))
+    assert store.get("analysis").status == AnalysisStatus.queued
+    assert store.get("analysis").creation_time == start
+
+    store.running("analysis")
+    assert store.get("analysis").status == AnalysisStatus.running
+    assert store.get("analysis").start_time is not None
+
+    store.finished(
+        {
+            "status": "complete",
+            "log_detective_analysis_id": "analysis",
+            "log_detective_response": {"explanation": "Missing dependency"},
+        }
+    )
+    analysis = store.get("analysis")
+    assert analysis.status == AnalysisStatus.complete
+    assert analysis.log_detective_response == {"explanation": "Missing dependency"}
+    assert analysis.finish_time is not None
+
+    assert store.get("unknown") is None
+
+
+def test_analysis_status_store_find():
+    """Analyses of a build are listed newest first."""
+    store = AnalysisStatusStore(":memory:", retention=3600, max_entries=100)
+    start = datetime.now(timezone.utc)
+    build_info = BuildInfo(**MINIMAL_BUILD_INFO)
+
+    store.queued("older", start, build_info)
+    store.queued("newer", start + timedelta(seconds=1), build_info)
+    store.queued(
+        "other", start, BuildInfo(**MINIMAL_BUILD_INFO | {"target_build": "1"})
+    )
+
+    found = store.find(build_info.target_build, build_info.build_system)
+    assert [analysis.log_detective_analysis_id for analysis in found] == [
+        "newer",
+        "older",
+    ]
+    assert store.find(build_info.target_build, "koji") == []
+
+
+def test_analysis_status_store_retention(mocker):
+    """Expired and surplus entries are pruned."""
+    mocker.patch("logdetective_packit.status.PRUNE_INTERVAL", 1)
+    store = AnalysisStatusStore(":memory:", retention=3600, max_entries=2)
+    start = datetime.now(timezone.utc)
+    build_info = BuildInfo(**MINIMAL_BUILD_INFO)
+
+    store.queued("expired", start - timedelta(hours=2), build_info)
+    store.queued("first", start, build_info)
+    assert store.get("expired") is None
+
+    store.queued("second", start + timedelta(seconds=1), build_info)
+    store.queued("third", start + timedelta(seconds=2), build_info)
+    assert store.get("first") is None
+    assert store.get("third") is not None
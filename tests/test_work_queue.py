@@ -0,0 +1,77 @@
+import os
+from datetime import datetime
+
+from logdetective_packit.models import BuildInfo
+from logdetective_packit.work_queue import AnalysisQueue
+
+from tests.utils import MINIMAL_BUILD_INFO, MULTIARTIFACT_BUILD_INFO
+
+
+def test_analysis_queue_put_and_remove(tmp_path):
+    """Finished analyses are removed from the queue."""
+    queue = AnalysisQueue(str(tmp_path / "queue.sqlite"))
+    start = datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00")
+
+    queue.put("first", start, BuildInfo(**MINIMAL_BUILD_INFO))
+    queue.put("second", start, BuildInfo(**MULTIARTIFACT_BUILD_INFO))
+    assert len(queue) == 2
+
+    queue.remove("first")
+    assert len(queue) == 1
+
+
+def test_analysis_queue_claim_orphaned(tmp_path, mocker):
+    """Analyses of dead workers are replayed, those of running workers are not."""
+    worker_pid = os.getpid()
+    path = str(tmp_path / "queue.sqlite")
+    queue = AnalysisQueue(path)
+    start = datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00")
+
+    mocker.patch("logdetective_packit.work_queue.os.getpid", return_value=1001)
+    queue.put("orphaned", start, BuildInfo(**MINIMAL_BUILD_INFO))
+    mocker.patch("logdetective_packit.work_queue.os.getpid", return_value=1002)
+    queue.put("running", start, BuildInfo(**MULTIARTIFACT_BUILD_INFO))
+
+    mocker.patch("logdetective_packit.work_queue.os.getpid", return_value=worker_pid)
+    mocker.patch(
+        "logdetective_packit.work_queue.pid_alive",
+        side_effect=lambda pid: pid in (1002, worker_pid),
+    )
+
+    # A new worker opens the same database
+    claimed = AnalysisQueue(path).claim_orphaned()
+
+    assert len(claimed) == 1
+    analysis_id, analysis_start, build_info = claimed[0]
+    assert analysis_id == "orphaned"
+    assert analysis_start == start
+    assert build_info == BuildInfo(**MINIMAL_BUILD_INFO)
+
+    # Claimed analyses are owned by the new worker, and aren't claimed twice
+    mocker.patch("logdetective_packit.work_queue.os.getpid", return_value=1003)
+    assert AnalysisQueue(path).claim_orphaned() == []
+
+
+def test_analysis_queue_claim_orphaned_excluding_own(tmp_path, mocker):
+    """Running worker doesn't claim its own analyses again."""
+    queue = AnalysisQueue(str(tmp_path / "queue.sqlite"))
+    start = datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00")
+    queue.put("own", start, BuildInfo(**MINIMAL_BUILD_INFO))
+    mocker.patch("logdetective_packit.work_queue.pid_alive", return_value=True)
+
+    assert queue.claim_orphaned(include_own=False) == []
+    assert [claimed[0] for claimed in queue.claim_orphaned()] == ["own"]
+
+
+def test_analysis_queue_put_many(tmp_path):
+    """Analyses of a batch are stored together."""
+    queue = AnalysisQueue(str(tmp_path / "queue.sqlite"))
+    start = datetime.fromisoformat("2025-12-10 10:57:57.341695+00:00")
+
+    queue.put_many(
+        [
+            ("first", start, BuildInfo(**MINIMAL_BUILD_INFO)),
+            ("second", start, BuildInfo(**MULTIARTIFACT_BUILD_INFO)),
+        ]
+    )
+    assert len(queue) == 2
@@ -2,6 +2,8 @@ import asyncio
 
 import pytest
 
+from logdetective_packit.backends import BackendPool
+
 MINIMAL_BUILD_INFO = {
     "artifacts": {"builder-live.log": "http://example.com/builder-live.log"},
     "target_build": "12345",
@@ -76,6 +78,10 @@ def mock_external_calls(mocker):
     mock_async_client.__aenter__.return_value = mock_async_client
 
     mocker.patch("logdetective_packit.main.http_client", mock_async_client)
+    mocker.patch(
+        "logdetective_packit.main.log_detective_backends",
+        BackendPool(["http://mock-ld-server.com/api"]),
+    )
     mock_publish = mocker.patch("logdetective_packit.main.publish")
 
     return {"mock_publish": mock_publish, "mock_async_client": mock_async_client}